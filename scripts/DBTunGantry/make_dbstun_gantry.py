@@ -19,13 +19,23 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 import os
 import re
+import sys
 import configparser
-import pyffeditc
-import shapeio
+from typing import List
 from pathlib import Path
 from shapeio.shape import Shape
 from shapeedit import ShapeEditor
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common import catalog, editing, pipeline
+from common.jobs import ShapeJob, run_script_jobs
+
+
+# Shapes in the input folder that this script converts.
+MATCH_FILES = ["DB1s_a1t10mStrtRndTun_g.s", "DB1s_a1t10mStrtTun_g.s"]
+IGNORE_FILES = ["*.sd"]
+
 
 def process_trackshape(trackshape: Shape):
     """
@@ -67,55 +77,65 @@ def process_trackshape(trackshape: Shape):
                         vertex.point.z -= 7.0
                         adjusted.add(vertex._vertex.point_index)
 
+    # Drop the vertices, points, UV points and normals of the removed triangles.
+    editing.compact_geometry(trackshape)
 
 
-if __name__ == "__main__":
-    print(f"Running ./scripts/DBTunGantry/make_dbstun_gantry.py")
-    
-    config = configparser.ConfigParser()
-    config.read("scripts/config.ini")
+def make_jobs(config: configparser.ConfigParser) -> List[ShapeJob]:
+    """
+    Finds the DB1s Tun and RndTun shapes to take the gantry from.
 
-    ffeditc_path = Path(config["utilities"]["ffeditc_path"])
+    Args:
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        List[ShapeJob]: One job for each shape to create.
+    """
     input_path = Path(config["shapes"]["input_path"])
     output_path = Path(config["shapes"]["output_path"])
 
     load_path = input_path
     processed_path = output_path / "DBTunGantry"
 
-    match_files = ["DB1s_a1t10mStrtRndTun_g.s", "DB1s_a1t10mStrtTun_g.s"]
-    ignore_files = ["*.sd"]
-    
     os.makedirs(processed_path, exist_ok=True)
 
-    shape_names = shapeio.find_directory_files(load_path, match_files, ignore_files)
+    input_catalog = catalog.open_input_catalog(config)
+    shape_names = input_catalog.find(MATCH_FILES, IGNORE_FILES)
+    jobs = []
 
-    for idx, sfile_name in enumerate(shape_names):
+    for sfile_name in shape_names:
         new_sfile_name = sfile_name.replace("a1t10mStrtRndTun_g.s", "RndTunGantry.s")
         new_sfile_name = new_sfile_name.replace("a1t10mStrtTun_g.s", "TunGantry.s")
         new_sfile_name = new_sfile_name.replace("DB1s_", "DBs_")
 
-        print(f"\tCreating {new_sfile_name} ({idx + 1} of {len(shape_names)})...")
+        jobs.append(ShapeJob(load_path / sfile_name, processed_path / new_sfile_name))
+
+    return jobs
 
-        # Process .s file
-        shape_path = load_path / sfile_name
-        new_shape_path = processed_path / new_sfile_name
 
-        shapeio.copy(shape_path, new_shape_path)
+def run_job(job: ShapeJob, config: configparser.ConfigParser):
+    """
+    Creates the .s and .sd files of a single job.
+
+    Args:
+        job (ShapeJob): The job to run.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        None
+    """
+    # Process .s file
+    pipeline.make_shape(job, process_trackshape, config)
 
-        pyffeditc.decompress(ffeditc_path, new_shape_path)
-        trackshape = shapeio.load(new_shape_path)
+    # Process .sd file
+    pipeline.make_sd(job)
 
-        process_trackshape(trackshape)
-        
-        shapeio.dump(trackshape, new_shape_path)
-        pyffeditc.compress(ffeditc_path, new_shape_path)
 
-        # Process .sd file
-        sdfile_name = sfile_name.replace(".s", ".sd")
-        new_sdfile_name = new_sfile_name.replace(".s", ".sd")
 
-        sdfile_path = load_path / sdfile_name
-        new_sdfile_path = processed_path / new_sdfile_name
+if __name__ == "__main__":
+    print(f"Running ./scripts/DBTunGantry/make_dbstun_gantry.py")
+    
+    config = configparser.ConfigParser()
+    config.read("scripts/config.ini")
 
-        shapeio.copy(sdfile_path, new_sdfile_path)
-        shapeio.replace_ignorecase(new_sdfile_path, sfile_name, new_sfile_name)
\ No newline at end of file
+    run_script_jobs(__file__, make_jobs, run_job, process_trackshape, config)
@@ -19,13 +19,23 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 import os
 import re
+import sys
 import configparser
-import pyffeditc
-import shapeio
+from typing import List
 from pathlib import Path
 from shapeio.shape import Shape
 from shapeedit import ShapeEditor
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common import catalog, editing, pipeline
+from common.jobs import ShapeJob, run_script_jobs
+
+
+# Shapes in the input folder that this script converts.
+MATCH_FILES = ["DB1s_*Tun*.s"]
+IGNORE_FILES = ["*Pnt*", "*Frog*", "*Xover*", "*Slip*", "*DKW*", "*.sd", "*_g.s*", "*6m.s*"]
+
 
 def process_trackshape(trackshape: Shape):
     """
@@ -58,54 +68,64 @@ def process_trackshape(trackshape: Shape):
                 for primitive in sub_object.primitives(prim_state_name=prim_state_name):
                     primitive.remove_all_triangles()
 
+    # Drop the vertices, points, UV points and normals of the removed triangles.
+    editing.compact_geometry(trackshape)
 
 
-if __name__ == "__main__":
-    print(f"Running ./scripts/DBTunNoTracks/make_dbstun_notracks.py")
-    
-    config = configparser.ConfigParser()
-    config.read("scripts/config.ini")
+def make_jobs(config: configparser.ConfigParser) -> List[ShapeJob]:
+    """
+    Finds the DB1s Tun and RndTun shapes to remove the tracks from.
 
-    ffeditc_path = Path(config["utilities"]["ffeditc_path"])
+    Args:
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        List[ShapeJob]: One job for each shape to create.
+    """
     input_path = Path(config["shapes"]["input_path"])
     output_path = Path(config["shapes"]["output_path"])
 
     load_path = input_path
     processed_path = output_path / "DBTunNoTracks"
 
-    match_files = ["DB1s_*Tun*.s"]
-    ignore_files = ["*Pnt*", "*Frog*", "*Xover*", "*Slip*", "*DKW*", "*.sd", "*_g.s*", "*6m.s*"]
-    
     os.makedirs(processed_path, exist_ok=True)
 
-    shape_names = shapeio.find_directory_files(load_path, match_files, ignore_files)
+    input_catalog = catalog.open_input_catalog(config)
+    shape_names = input_catalog.find(MATCH_FILES, IGNORE_FILES)
+    jobs = []
 
-    for idx, sfile_name in enumerate(shape_names):
+    for sfile_name in shape_names:
         new_sfile_name = sfile_name.replace(".s", "_nt.s")
         new_sfile_name = new_sfile_name.replace("DB1s_", "DBs_")
 
-        print(f"\tCreating {new_sfile_name} ({idx + 1} of {len(shape_names)})...")
+        jobs.append(ShapeJob(load_path / sfile_name, processed_path / new_sfile_name))
+
+    return jobs
 
-        # Process .s file
-        shape_path = load_path / sfile_name
-        new_shape_path = processed_path / new_sfile_name
 
-        shapeio.copy(shape_path, new_shape_path)
+def run_job(job: ShapeJob, config: configparser.ConfigParser):
+    """
+    Creates the .s and .sd files of a single job.
+
+    Args:
+        job (ShapeJob): The job to run.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        None
+    """
+    # Process .s file
+    pipeline.make_shape(job, process_trackshape, config)
 
-        pyffeditc.decompress(ffeditc_path, new_shape_path)
-        trackshape = shapeio.load(new_shape_path)
+    # Process .sd file
+    pipeline.make_sd(job)
 
-        process_trackshape(trackshape)
-        
-        shapeio.dump(trackshape, new_shape_path)
-        pyffeditc.compress(ffeditc_path, new_shape_path)
 
-        # Process .sd file
-        sdfile_name = sfile_name.replace(".s", ".sd")
-        new_sdfile_name = new_sfile_name.replace(".s", ".sd")
 
-        sdfile_path = load_path / sdfile_name
-        new_sdfile_path = processed_path / new_sdfile_name
+if __name__ == "__main__":
+    print(f"Running ./scripts/DBTunNoTracks/make_dbstun_notracks.py")
+    
+    config = configparser.ConfigParser()
+    config.read("scripts/config.ini")
 
-        shapeio.copy(sdfile_path, new_sdfile_path)
-        shapeio.replace_ignorecase(new_sdfile_path, sfile_name, new_sfile_name)
\ No newline at end of file
+    run_script_jobs(__file__, make_jobs, run_job, process_trackshape, config)
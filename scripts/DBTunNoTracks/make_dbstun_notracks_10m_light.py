@@ -19,15 +19,31 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 import os
 import re
+import sys
 import configparser
-import pyffeditc
-import shapeio
-import tempfile
-import subprocess
+from typing import List
 from pathlib import Path
 from shapeio.shape import Shape
 from shapeedit import ShapeEditor
-from PIL import Image, ImageChops
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common import catalog, editing, pipeline, textures
+from common.jobs import ShapeJob, run_script_jobs
+
+
+# Shapes in the input folder that this script converts.
+MATCH_FILES = ["DB1s_a1t10mStrtRndTun.s", "DB1s_a2t10mStrtRndTun.s", "DB1s_a1t10mStrtTun.s", "DB1s_a2t10mStrtTun.s"]
+IGNORE_FILES = ["*Pnt*", "*Frog*", "*Xover*", "*Slip*", "*DKW*", "*.sd", "*_g.s*", "*6m.s*"]
+
+# Textures this script creates from the textures in the input folder.
+TEXTURE_DERIVATIONS = [
+    # Tunnel light contained within the 10m track piece, moved left by 160 pixels.
+    textures.TextureDerivation("DB_TunWallSFS1.ace", "DB_TunWallSFS1L.ace", (textures.Offset(-160, 0),)),
+]
+
+# Textures in the input folder that this script reads.
+INPUT_TEXTURES = [derivation.texture_name for derivation in TEXTURE_DERIVATIONS]
 
 
 def process_trackshape(trackshape: Shape):
@@ -40,9 +56,9 @@ def process_trackshape(trackshape: Shape):
     Returns:
         None
     """
-    trackshape_editor = ShapeEditor(trackshape)
+    editing.replace_texture_images(trackshape, {"DB_TunWallSFS1.ace": "DB_TunWallSFS1L.ace"})
 
-    trackshape_editor.replace_texture_image("DB_TunWallSFS1.ace", "DB_TunWallSFS1L.ace")
+    trackshape_editor = ShapeEditor(trackshape)
 
     lod_control = trackshape_editor.lod_control(0)
 
@@ -63,103 +79,67 @@ def process_trackshape(trackshape: Shape):
                 for primitive in sub_object.primitives(prim_state_name=prim_state_name):
                     primitive.remove_all_triangles()
 
+    # Drop the vertices, points, UV points and normals of the removed triangles.
+    editing.compact_geometry(trackshape)
+
 
-def process_texture(png_path: str):
+def make_jobs(config: configparser.ConfigParser) -> List[ShapeJob]:
     """
-    Creates the modified texture where the tunnel light is contained within the 10m track piece.
+    Finds the 10m DB1s Tun and RndTun shapes to remove the tracks from.
 
     Args:
-        png_path (str): Path of the .png image to modify.
+        config (configparser.ConfigParser): The configuration read from config.ini.
 
     Returns:
-        None
+        List[ShapeJob]: One job for each shape to create.
     """
-    with Image.open(png_path) as image:
-
-        # Move left by 160 pixels
-        shifted = ImageChops.offset(image, -160, 0)
-
-        shifted.save(png_path)
-
-
-
-if __name__ == "__main__":
-    print(f"Running ./scripts/DBTunNoTracks/make_dbstun_notracks.py")
-    
-    config = configparser.ConfigParser()
-    config.read("scripts/config.ini")
-
-    ffeditc_path = Path(config["utilities"]["ffeditc_path"])
     input_path = Path(config["shapes"]["input_path"])
     output_path = Path(config["shapes"]["output_path"])
 
     load_path = input_path
     processed_path = output_path / "DBTunNoTracks"
 
-    match_files = ["DB1s_a1t10mStrtRndTun.s", "DB1s_a2t10mStrtRndTun.s", "DB1s_a1t10mStrtTun.s", "DB1s_a2t10mStrtTun.s"]
-    ignore_files = ["*Pnt*", "*Frog*", "*Xover*", "*Slip*", "*DKW*", "*.sd", "*_g.s*", "*6m.s*"]
-    
     os.makedirs(processed_path, exist_ok=True)
 
-    shape_names = shapeio.find_directory_files(load_path, match_files, ignore_files)
+    input_catalog = catalog.open_input_catalog(config)
+    shape_names = input_catalog.find(MATCH_FILES, IGNORE_FILES)
+    jobs = []
 
-    for idx, sfile_name in enumerate(shape_names):
+    for sfile_name in shape_names:
         new_sfile_name = sfile_name.replace(".s", "_l_nt.s")
         new_sfile_name = new_sfile_name.replace("DB1s_", "DBs_")
 
-        print(f"\tCreating {new_sfile_name} ({idx + 1} of {len(shape_names)})...")
+        jobs.append(ShapeJob(load_path / sfile_name, processed_path / new_sfile_name))
 
-        # Process .s file
-        shape_path = load_path / sfile_name
-        new_shape_path = processed_path / new_sfile_name
+    return jobs
 
-        shapeio.copy(shape_path, new_shape_path)
 
-        pyffeditc.decompress(ffeditc_path, new_shape_path)
-        trackshape = shapeio.load(new_shape_path)
+def run_job(job: ShapeJob, config: configparser.ConfigParser):
+    """
+    Creates the .s and .sd files of a single job.
 
-        process_trackshape(trackshape)
-        
-        shapeio.dump(trackshape, new_shape_path)
-        pyffeditc.compress(ffeditc_path, new_shape_path)
+    Args:
+        job (ShapeJob): The job to run.
+        config (configparser.ConfigParser): The configuration read from config.ini.
 
-        # Process .sd file
-        sdfile_name = sfile_name.replace(".s", ".sd")
-        new_sdfile_name = new_sfile_name.replace(".s", ".sd")
+    Returns:
+        None
+    """
+    # Process .s file
+    pipeline.make_shape(job, process_trackshape, config)
+
+    # Process .sd file
+    pipeline.make_sd(job)
 
-        sdfile_path = load_path / sdfile_name
-        new_sdfile_path = processed_path / new_sdfile_name
 
-        shapeio.copy(sdfile_path, new_sdfile_path)
-        shapeio.replace_ignorecase(new_sdfile_path, sfile_name, new_sfile_name)
 
-    # Create the modified texture
-    aceit_path = Path(config["utilities"]["aceit_path"])
-    ace2png_path = Path(config["utilities"]["ace2png_path"])
-    texture_input_path = Path(config["textures"]["input_path"])
-    texture_output_path = Path(config["textures"]["output_path"])
+if __name__ == "__main__":
+    print(f"Running ./scripts/DBTunNoTracks/make_dbstun_notracks.py")
     
-    os.makedirs(texture_output_path, exist_ok=True)
-
-    print(f"\tCreating DB_TunWallSFS1L.ace...")
-
-    with tempfile.TemporaryDirectory() as temp_dir:
-        ace_input_path = texture_input_path / "DB_TunWallSFS1.ace"
-        ace_output_path = texture_output_path / "DB_TunWallSFS1L.ace"
-        png_temp_path = os.path.join(temp_dir, "DB_TunWallSFS1.png")
-
-        subprocess.run(
-            [str(ace2png_path), "-o", temp_dir, str(ace_input_path)],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=True
-        )
-
-        process_texture(png_temp_path)
-
-        subprocess.run(
-            [str(aceit_path), png_temp_path, str(ace_output_path), "-q"],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=True
-        )
\ No newline at end of file
+    config = configparser.ConfigParser()
+    config.read("scripts/config.ini")
+
+    run_script_jobs(__file__, make_jobs, run_job, process_trackshape, config)
+
+    # Create the modified textures
+    textures.make_textures(__file__, TEXTURE_DERIVATIONS, config)
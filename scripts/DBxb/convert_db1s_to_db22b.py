@@ -19,13 +19,34 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 import os
 import re
+import sys
 import configparser
-import pyffeditc
-import shapeio
+from typing import Dict, List, Optional
 from pathlib import Path
 from shapeio.shape import Shape
 from shapeedit import ShapeEditor
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common import catalog, editing, pipeline, shapetext
+from common.jobs import ShapeJob, run_script_jobs
+
+
+# Shapes in the input folder that this script converts.
+MATCH_FILES = ["DB1s_*.s"]
+IGNORE_FILES = ["*Tun*", "*Pnt*", "*Frog*"]
+
+# Shapes in the input folder that are checked for, to skip shapes that already exist.
+CHECKED_FILES = ["DB22b_*.s"]
+
+# Texture images swapped by process_trackshape.
+TEXTURE_REPLACEMENTS = {
+    "DB_TrackSfs1.ace": "DB_Track22.ace",
+    "DB_TrackSfs1s.ace": "DB_Track22s.ace",
+    "DB_TrackSfs1w.ace": "DB_Track22w.ace",
+    "DB_TrackSfs1sw.ace": "DB_Track22sw.ace",
+}
+
 
 def process_trackshape(trackshape: Shape):
     """
@@ -39,80 +60,117 @@ def process_trackshape(trackshape: Shape):
     Returns:
         None
     """
-    trackshape_editor = ShapeEditor(trackshape)
+    editing.replace_texture_images(trackshape, TEXTURE_REPLACEMENTS)
 
-    trackshape_editor.replace_texture_image("DB_TrackSfs1.ace", "DB_Track22.ace")
-    trackshape_editor.replace_texture_image("DB_TrackSfs1s.ace", "DB_Track22s.ace")
-    trackshape_editor.replace_texture_image("DB_TrackSfs1w.ace", "DB_Track22w.ace")
-    trackshape_editor.replace_texture_image("DB_TrackSfs1sw.ace", "DB_Track22sw.ace")
+    trackshape_editor = ShapeEditor(trackshape)
 
     lod_control = trackshape_editor.lod_control(0)
 
+    num_removed_triangles = 0
+
     for lod_dlevel in lod_control.distance_levels():
         for sub_object in lod_dlevel.sub_objects():
             for primitive in sub_object.primitives():
-                for vertex in primitive.vertices():
-                    if vertex.point.y == 0.133: # Side vertices of LZB cable.
-                        primitive.remove_triangles_connected_to(vertex)
-                    elif vertex.point.y == 0.145: # Top vertices of LZB cable.
-                        primitive.remove_triangles_connected_to(vertex)
+                # Side (y == 0.133) and top (y == 0.145) vertices of LZB cable.
+                arrays = editing.PrimitiveArrays(primitive)
+                vertex_heights = arrays.points[arrays.vertex_points, 1]
+                num_removed_triangles += editing.remove_triangles_where(
+                    primitive,
+                    arrays.triangles_with_vertices((vertex_heights == 0.133) | (vertex_heights == 0.145))
+                )
             
             for primitive in sub_object.primitives(prim_state_name="mt_cwire"):
-                for vertex in primitive.vertices():
-                    primitive.remove_triangles_connected_to(vertex)
+                num_removed_triangles += len(primitive.triangles())
+                primitive.remove_all_triangles()
 
+    # Shapes where no triangles were removed are left as they are, the same as
+    # the texture-only path of `texture_only_replacements` leaves them.
+    if num_removed_triangles:
+        editing.compact_geometry(trackshape)
 
 
-if __name__ == "__main__":
-    print(f"Running ./scripts/DBxb/convert_db1s_to_db22b.py")
-    
-    config = configparser.ConfigParser()
-    config.read("scripts/config.ini")
+def texture_only_replacements(text: str) -> Optional[Dict[str, str]]:
+    """
+    Checks whether `process_trackshape` would only swap the textures of a DB1s shape.
+
+    That is the case for shapes without LZB cable and overhead wires, which can then be
+    converted without modifying the parsed shape, see `pipeline.make_shape_variants`.
+
+    Args:
+        text (str): The decompressed text of the DB1s shape.
+
+    Returns:
+        Optional[Dict[str, str]]: The texture replacements, or None if the shape needs more changes.
+    """
+    # Side (y == 0.133) and top (y == 0.145) vertices of LZB cable.
+    point_heights = shapetext.point_heights(text)
+
+    if ((point_heights == 0.133) | (point_heights == 0.145)).any() or "mt_cwire" in text:
+        return None
+
+    return TEXTURE_REPLACEMENTS
 
-    ffeditc_path = Path(config["utilities"]["ffeditc_path"])
+
+def make_jobs(config: configparser.ConfigParser) -> List[ShapeJob]:
+    """
+    Finds the DB1s shapes to convert to DB22b.
+
+    Shapes that already exist in the original DBTracks packages are skipped.
+
+    Args:
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        List[ShapeJob]: One job for each shape to create.
+    """
     input_path = Path(config["shapes"]["input_path"])
     output_path = Path(config["shapes"]["output_path"])
 
     load_path = input_path
     processed_path = output_path / "DB22b"
 
-    match_files = ["DB1s_*.s"]
-    ignore_files = ["*Tun*", "*Pnt*", "*Frog*"]
-    
     os.makedirs(processed_path, exist_ok=True)
 
-    shape_names = shapeio.find_directory_files(load_path, match_files, ignore_files)
+    input_catalog = catalog.open_input_catalog(config)
+    shape_names = input_catalog.find(MATCH_FILES, IGNORE_FILES)
+    jobs = []
 
-    for idx, sfile_name in enumerate(shape_names):
+    for sfile_name in shape_names:
         new_sfile_name = sfile_name.replace("DB1s", "DB22b")
 
         # Skip if it already exists in the original DBTracks packages.
-        if os.path.exists(load_path / new_sfile_name):
-            print(f"\tSkipping {new_sfile_name} ({idx + 1} of {len(shape_names)}), already exists in the original packages...")
+        if input_catalog.exists(new_sfile_name):
+            print(f"\tSkipping {new_sfile_name}, already exists in the original packages...")
             continue
 
-        print(f"\tCreating {new_sfile_name} ({idx + 1} of {len(shape_names)})...")
+        jobs.append(ShapeJob(load_path / sfile_name, processed_path / new_sfile_name))
+
+    return jobs
+
 
-        # Process .s file
-        shape_path = load_path / sfile_name
-        new_shape_path = processed_path / new_sfile_name
+def run_job(job: ShapeJob, config: configparser.ConfigParser):
+    """
+    Creates the .s and .sd files of a single job.
+
+    Args:
+        job (ShapeJob): The job to run.
+        config (configparser.ConfigParser): The configuration read from config.ini.
 
-        shapeio.copy(shape_path, new_shape_path)
+    Returns:
+        None
+    """
+    # Process .s file
+    pipeline.make_shape(job, process_trackshape, config, texture_only_replacements)
 
-        pyffeditc.decompress(ffeditc_path, new_shape_path)
-        trackshape = shapeio.load(new_shape_path)
+    # Process .sd file
+    pipeline.make_sd(job)
 
-        process_trackshape(trackshape)
-        
-        shapeio.dump(trackshape, new_shape_path)
-        pyffeditc.compress(ffeditc_path, new_shape_path)
 
-        # Process .sd file
-        sdfile_name = sfile_name.replace(".s", ".sd")
-        new_sdfile_name = new_sfile_name.replace(".s", ".sd")
 
-        sdfile_path = load_path / sdfile_name
-        new_sdfile_path = processed_path / new_sdfile_name
+if __name__ == "__main__":
+    print(f"Running ./scripts/DBxb/convert_db1s_to_db22b.py")
+    
+    config = configparser.ConfigParser()
+    config.read("scripts/config.ini")
 
-        shapeio.copy(sdfile_path, new_sdfile_path)
-        shapeio.replace_ignorecase(new_sdfile_path, sfile_name, new_sfile_name)
\ No newline at end of file
+    run_script_jobs(__file__, make_jobs, run_job, process_trackshape, config)
@@ -19,18 +19,43 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 import re
 import os
+import sys
 import configparser
-import pyffeditc
-import shapeio
-import trackshapeutils as tsu
-from typing import List
+import numpy as np
+from typing import Dict, List, Union
+from functools import partial
 from pathlib import Path
 from shapeio.shape import Shape
 from shapeedit import ShapeEditor
-from trackshapeutils import Trackcenter
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
 
-def process_trackshape(trackshape: Shape, trackcenters: List[Trackcenter]):
+from common import catalog, editing, pipeline
+from common.jobs import ShapeJob, run_script_jobs
+from common.trackcenters import AnalyticTrackcenterIndex, TrackcenterIndex, trackcenter_index_from_global_tsection
+
+
+# Shapes in the input folder that this script converts.
+MATCH_FILES = ["DB1z_a1t*.s"]
+IGNORE_FILES = ["*Tun*", "*Pnt*", "*Frog*", "*870r4d*"]
+
+# Texture images swapped by process_trackshape. The DB_Track and DB_TrackSfs
+# images become the same V4 images, which are then merged.
+TEXTURE_REPLACEMENTS = {
+    "DB_Rails1.ace": "V4_Rails1.ace",
+    "DB_Rails1w.ace": "V4_Rails1.ace",
+    "DB_Track1.ace": "V4_RKLb.ace",
+    "DB_Track1s.ace": "V4_RKLs.ace",
+    "DB_Track1w.ace": "V4_RKLb.ace",
+    "DB_Track1sw.ace": "V4_RKLs.ace",
+    "DB_TrackSfs1.ace": "V4_RKLb.ace",
+    "DB_TrackSfs1s.ace": "V4_RKLs.ace",
+    "DB_TrackSfs1w.ace": "V4_RKLb.ace",
+    "DB_TrackSfs1sw.ace": "V4_RKLs.ace",
+}
+
+
+def process_trackshape(trackshape: Shape, trackcenter_index: Union[AnalyticTrackcenterIndex, TrackcenterIndex]):
     """
     Converts a DB1z_a1t tracksection to V4hs_RKL slab track.
     
@@ -38,23 +63,14 @@ def process_trackshape(trackshape: Shape, trackcenters: List[Trackcenter]):
 
     Args:
         trackshape (Shape): The target DB1z_a1t track shape to modify.
-        trackcenters (list[Trackcenter]):   Trackcenters for the track section.
+        trackcenter_index (Union[AnalyticTrackcenterIndex, TrackcenterIndex]): Trackcenters for the track section.
 
     Returns:
         None
     """
-    trackshape_editor = ShapeEditor(trackshape)
+    editing.replace_texture_images(trackshape, TEXTURE_REPLACEMENTS)
 
-    trackshape_editor.replace_texture_image("DB_Rails1.ace", "V4_Rails1.ace")
-    trackshape_editor.replace_texture_image("DB_Rails1w.ace", "V4_Rails1.ace")
-    trackshape_editor.replace_texture_image("DB_Track1.ace", "V4_RKLb.ace")
-    trackshape_editor.replace_texture_image("DB_Track1s.ace", "V4_RKLs.ace")
-    trackshape_editor.replace_texture_image("DB_Track1w.ace", "V4_RKLb.ace")
-    trackshape_editor.replace_texture_image("DB_Track1sw.ace", "V4_RKLs.ace")
-    trackshape_editor.replace_texture_image("DB_TrackSfs1.ace", "V4_RKLb.ace")
-    trackshape_editor.replace_texture_image("DB_TrackSfs1s.ace", "V4_RKLs.ace")
-    trackshape_editor.replace_texture_image("DB_TrackSfs1w.ace", "V4_RKLb.ace")
-    trackshape_editor.replace_texture_image("DB_TrackSfs1sw.ace", "V4_RKLs.ace")
+    trackshape_editor = ShapeEditor(trackshape)
 
     # RKL side
     # [Vector((-1.4025001525878906, 0.0, -0.12800000607967377))]
@@ -71,144 +87,186 @@ def process_trackshape(trackshape: Shape, trackcenters: List[Trackcenter]):
             for sub_object in lod_dlevel.sub_objects():
                 # mb_sleeperbase
                 for primitive in sub_object.primitives(prim_state_name="mb_sleeperbase"):
-                    for vertex in primitive.vertices():
-                        vertex.point.y = 0.120 # Not needed, so set height below slab track surface
+                    arrays = editing.PrimitiveArrays(primitive)
+                    arrays.points[:, 1] = 0.120 # Not needed, so set height below slab track surface
+                    arrays.write_back()
 
                 # mb_trackbed
                 for primitive in sub_object.primitives(prim_state_name="mb_trackbed"):
-                    for vertex in primitive.vertices():
-                        closest_trackcenter = tsu.find_closest_trackcenter(vertex.point, trackcenters, plane="xz")
-                        closest_centerpoint = tsu.find_closest_centerpoint(vertex.point, closest_trackcenter, plane="xz")
-                        distance_from_center = tsu.signed_distance_between(vertex.point, closest_centerpoint, plane="xz")
-
-                        # Innermost mb_trackbed points
-                        if distance_from_center < -1.65 and distance_from_center > -1.75:
-                            new_position = tsu.get_new_position_from_trackcenter(-1.4125, vertex.point, closest_trackcenter)
-                            vertex.point.x = new_position.x # Set recalculated x
-                            vertex.point.y = 0.02 # Set height
-                            vertex.point.z = new_position.z # Set recalculated z
-                        if distance_from_center > 1.65 and distance_from_center < 1.75:
-                            new_position = tsu.get_new_position_from_trackcenter(1.4125, vertex.point, closest_trackcenter)
-                            vertex.point.x = new_position.x # Set recalculated x
-                            vertex.point.y = 0.02 # Set height
-                            vertex.point.z = new_position.z # Set recalculated z
-                        
-                        # Outermost mb_trackbed points
-                        if distance_from_center < -2.55 and distance_from_center > -2.65:
-                            new_position = tsu.get_new_position_from_trackcenter(-2.4325, vertex.point, closest_trackcenter)
-                            vertex.point.x = new_position.x # Set recalculated x
-                            vertex.point.y = 0.01 # Set height
-                            vertex.point.z = new_position.z # Set recalculated z
-                        if distance_from_center > 2.55 and distance_from_center < 2.65:
-                            new_position = tsu.get_new_position_from_trackcenter(2.4325, vertex.point, closest_trackcenter)
-                            vertex.point.x = new_position.x # Set recalculated x
-                            vertex.point.y = 0.01 # Set height
-                            vertex.point.z = new_position.z # Set recalculated z
-                
+                    arrays = editing.PrimitiveArrays(primitive)
+                    closest_trackcenters, _, distances_from_center = trackcenter_index.find_closest_many(arrays.points)
+
+                    # Innermost mb_trackbed points
+                    move_points(arrays, trackcenter_index, closest_trackcenters, (distances_from_center < -1.65) & (distances_from_center > -1.75), -1.4125, 0.02)
+                    move_points(arrays, trackcenter_index, closest_trackcenters, (distances_from_center > 1.65) & (distances_from_center < 1.75), 1.4125, 0.02)
+
+                    # Outermost mb_trackbed points
+                    move_points(arrays, trackcenter_index, closest_trackcenters, (distances_from_center < -2.55) & (distances_from_center > -2.65), -2.4325, 0.01)
+                    move_points(arrays, trackcenter_index, closest_trackcenters, (distances_from_center > 2.55) & (distances_from_center < 2.65), 2.4325, 0.01)
+
+                    arrays.write_back()
+
                 # mt_trackbed
                 for primitive in sub_object.primitives(prim_state_name="mt_trackbed"):
-                    for vertex in primitive.vertices():
-                        closest_trackcenter = tsu.find_closest_trackcenter(vertex.point, trackcenters, plane="xz")
-                        closest_centerpoint = tsu.find_closest_centerpoint(vertex.point, closest_trackcenter, plane="xz")
-                        distance_from_center = tsu.signed_distance_between(vertex.point, closest_centerpoint, plane="xz")
-
-                        # Second to last outermost mt_trackbed points
-                        if distance_from_center < -1.25 and distance_from_center > -1.35:
-                            new_position = tsu.get_new_position_from_trackcenter(-1.4025, vertex.point, closest_trackcenter)
-                            vertex.point.x = new_position.x # Set recalculated x
-                            vertex.point.y = 0.128 # Set height
-                            vertex.point.z = new_position.z # Set recalculated z
-                            if vertex.uv_point.u == 0.6357:
-                                vertex.uv_point.u = 0.6582
-                            elif vertex.uv_point.u == 0.0918:
-                                vertex.uv_point.u = 0.0693
-                        if distance_from_center > 1.25 and distance_from_center < 1.35:
-                            new_position = tsu.get_new_position_from_trackcenter(1.4025, vertex.point, closest_trackcenter)
-                            vertex.point.x = new_position.x # Set recalculated x
-                            vertex.point.y = 0.128 # Set height
-                            vertex.point.z = new_position.z # Set recalculated z
-                            if vertex.uv_point.u == 0.1143:
-                                vertex.uv_point.u = 0.0918
-                            elif vertex.uv_point.u == 0.6582:
-                                vertex.uv_point.u = 0.6807
-                        
-                        # Outermost mt_trackbed points
-                        if distance_from_center < -1.65 and distance_from_center > -1.75:
-                            new_position = tsu.get_new_position_from_trackcenter(-1.4125, vertex.point, closest_trackcenter)
-                            vertex.point.x = new_position.x # Set recalculated x
-                            vertex.point.y = 0.02 # Set height
-                            vertex.point.z = new_position.z # Set recalculated z
-                            if vertex.uv_point.u == 0.7158:
-                                vertex.uv_point.u = 0.6758
-                            elif vertex.uv_point.u == 0.0742:
-                                vertex.uv_point.u = 0.0342
-                        if distance_from_center > 1.65 and distance_from_center < 1.75:
-                            new_position = tsu.get_new_position_from_trackcenter(1.4125, vertex.point, closest_trackcenter)
-                            vertex.point.x = new_position.x # Set recalculated x
-                            vertex.point.y = 0.02 # Set height
-                            vertex.point.z = new_position.z # Set recalculated z
-                            if vertex.uv_point.u == 0.0342:
-                                vertex.uv_point.u = 0.0742
-                            elif vertex.uv_point.u == 0.6758:
-                                vertex.uv_point.u = 0.7158
+                    arrays = editing.PrimitiveArrays(primitive)
+                    closest_trackcenters, _, distances_from_center = trackcenter_index.find_closest_many(arrays.points)
+
+                    # Second to last outermost mt_trackbed points
+                    is_moved = (distances_from_center < -1.25) & (distances_from_center > -1.35)
+                    move_points(arrays, trackcenter_index, closest_trackcenters, is_moved, -1.4025, 0.128)
+                    remap_u(arrays, is_moved, {0.6357: 0.6582, 0.0918: 0.0693})
+
+                    is_moved = (distances_from_center > 1.25) & (distances_from_center < 1.35)
+                    move_points(arrays, trackcenter_index, closest_trackcenters, is_moved, 1.4025, 0.128)
+                    remap_u(arrays, is_moved, {0.1143: 0.0918, 0.6582: 0.6807})
+
+                    # Outermost mt_trackbed points
+                    is_moved = (distances_from_center < -1.65) & (distances_from_center > -1.75)
+                    move_points(arrays, trackcenter_index, closest_trackcenters, is_moved, -1.4125, 0.02)
+                    remap_u(arrays, is_moved, {0.7158: 0.6758, 0.0742: 0.0342})
+
+                    is_moved = (distances_from_center > 1.65) & (distances_from_center < 1.75)
+                    move_points(arrays, trackcenter_index, closest_trackcenters, is_moved, 1.4125, 0.02)
+                    remap_u(arrays, is_moved, {0.0342: 0.0742, 0.6758: 0.7158})
+
+                    arrays.write_back()
+
+
+def move_points(
+    arrays: editing.PrimitiveArrays,
+    trackcenter_index: Union[AnalyticTrackcenterIndex, TrackcenterIndex],
+    closest_trackcenters: np.ndarray,
+    point_mask: np.ndarray,
+    new_distance_from_center: float,
+    new_height: float
+) -> None:
+    """
+    Moves points sideways to a new distance from their closest trackcenter, and to a new height.
+
+    Args:
+        arrays (editing.PrimitiveArrays): The vertex arrays of the primitive.
+        trackcenter_index (Union[AnalyticTrackcenterIndex, TrackcenterIndex]): Trackcenters for the track section.
+        closest_trackcenters (np.ndarray): Index of the closest trackcenter of each point.
+        point_mask (np.ndarray): Boolean mask of the points to move.
+        new_distance_from_center (float): Signed lateral distance from the trackcenter to move the points to.
+        new_height (float): New height of the points.
+
+    Returns:
+        None
+    """
+    if not point_mask.any():
+        return
 
+    new_positions = trackcenter_index.new_positions(new_distance_from_center, arrays.points[point_mask], closest_trackcenters[point_mask])
+    arrays.points[point_mask, 0] = new_positions[:, 0] # Set recalculated x
+    arrays.points[point_mask, 1] = new_height # Set height
+    arrays.points[point_mask, 2] = new_positions[:, 2] # Set recalculated z
 
 
-if __name__ == "__main__":
-    print(f"Running ./scripts/V4hsRKL1t/convert_db1z1t_to_v4hs1trkl.py")
+def remap_u(arrays: editing.PrimitiveArrays, point_mask: np.ndarray, u_mapping: Dict[float, float]) -> None:
+    """
+    Changes the U coordinates of the vertices of moved points.
 
-    config = configparser.ConfigParser()
-    config.read("scripts/config.ini")
+    Only the first vertex of each point is changed. Once a point has been moved, the
+    vertices that share it no longer lie within the distance window that selected it.
+
+    Args:
+        arrays (editing.PrimitiveArrays): The vertex arrays of the primitive.
+        point_mask (np.ndarray): Boolean mask of the moved points.
+        u_mapping (Dict[float, float]): Old U coordinates and what to change them to.
+
+    Returns:
+        None
+    """
+    is_changed_vertex = point_mask[arrays.vertex_points] & arrays.first_vertex_of_point() & (arrays.vertex_uv_points >= 0)
+    uv_rows = arrays.vertex_uv_points[is_changed_vertex]
+
+    old_u = arrays.uv_points[uv_rows, 0]
+    new_u = old_u.copy()
 
-    ffeditc_path = Path(config["utilities"]["ffeditc_path"])
+    for from_u, to_u in u_mapping.items():
+        new_u[old_u == from_u] = to_u
+
+    arrays.uv_points[uv_rows, 0] = new_u
+
+
+def tsection_shape_name(sfile_name: str) -> str:
+    """
+    Returns the name of the shape in the global tsection.dat that has the same track layout as a DB1z_a1t shape.
+
+    Args:
+        sfile_name (str): Name of the DB1z_a1t shape file.
+
+    Returns:
+        str: Name of the corresponding shape in the global tsection.dat.
+    """
+    tsection_sfile_name = sfile_name.replace("a2dt", "a2t")
+    tsection_sfile_name = tsection_sfile_name.replace("DB1z_", "")
+    tsection_sfile_name = tsection_sfile_name.replace("Lft10.s", "Lft.s")
+    tsection_sfile_name = tsection_sfile_name.replace("Rgt10.s", "Rgt.s")
+    tsection_sfile_name = tsection_sfile_name.replace("Lft11.s", "Lft.s")
+    tsection_sfile_name = tsection_sfile_name.replace("Rgt11.s", "Rgt.s")
+    return tsection_sfile_name
+
+
+def make_jobs(config: configparser.ConfigParser) -> List[ShapeJob]:
+    """
+    Finds the DB1z_a1t shapes to convert to V4hs_RKL slab track.
+
+    Args:
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        List[ShapeJob]: One job for each shape to create.
+    """
     input_path = Path(config["shapes"]["input_path"])
     output_path = Path(config["shapes"]["output_path"])
 
     load_path = input_path
     processed_path = output_path / "V4hs1t_RKL"
 
-    match_files = ["DB1z_a1t*.s"]
-    ignore_files = ["*Tun*", "*Pnt*", "*Frog*", "*870r4d*"]
-    
     os.makedirs(processed_path, exist_ok=True)
 
-    shape_names = shapeio.find_directory_files(load_path, match_files, ignore_files)
+    input_catalog = catalog.open_input_catalog(config)
+    shape_names = input_catalog.find(MATCH_FILES, IGNORE_FILES)
+    jobs = []
 
-    for idx, sfile_name in enumerate(shape_names):
+    for sfile_name in shape_names:
         new_sfile_name = sfile_name.replace("DB1z_", "V4hs1t_RKL_")
         new_sfile_name = new_sfile_name.replace("A1t", "")
         new_sfile_name = new_sfile_name.replace("a1t", "")
 
-        tsection_sfile_name = sfile_name.replace("a2dt", "a2t")
-        tsection_sfile_name = tsection_sfile_name.replace("DB1z_", "")
-        tsection_sfile_name = tsection_sfile_name.replace("Lft10.s", "Lft.s")
-        tsection_sfile_name = tsection_sfile_name.replace("Rgt10.s", "Rgt.s")
-        tsection_sfile_name = tsection_sfile_name.replace("Lft11.s", "Lft.s")
-        tsection_sfile_name = tsection_sfile_name.replace("Rgt11.s", "Rgt.s")
-        trackcenters = tsu.trackcenters_from_global_tsection(shape_name=tsection_sfile_name, num_points_per_meter=12)
+        jobs.append(ShapeJob(load_path / sfile_name, processed_path / new_sfile_name))
 
-        print(f"\tCreating {new_sfile_name} ({idx + 1} of {len(shape_names)})...")
+    return jobs
 
-        # Process .s file
-        shape_path = load_path / sfile_name
-        new_shape_path = processed_path / new_sfile_name
 
-        shapeio.copy(shape_path, new_shape_path)
+def run_job(job: ShapeJob, config: configparser.ConfigParser):
+    """
+    Creates the .s and .sd files of a single job.
 
-        pyffeditc.decompress(ffeditc_path, new_shape_path)
-        trackshape = shapeio.load(new_shape_path)
+    Args:
+        job (ShapeJob): The job to run.
+        config (configparser.ConfigParser): The configuration read from config.ini.
 
-        process_trackshape(trackshape, trackcenters)
+    Returns:
+        None
+    """
+    tsection_sfile_name = tsection_shape_name(job.shape_path.name)
+    trackcenter_index = trackcenter_index_from_global_tsection(tsection_sfile_name, config)
 
-        shapeio.dump(trackshape, new_shape_path)
-        pyffeditc.compress(ffeditc_path, new_shape_path)
+    # Process .s file
+    pipeline.make_shape(job, partial(process_trackshape, trackcenter_index=trackcenter_index), config)
 
-        # Process .sd file
-        sdfile_name = sfile_name.replace(".s", ".sd")
-        new_sdfile_name = new_sfile_name.replace(".s", ".sd")
+    # Process .sd file
+    pipeline.make_sd(job)
 
-        sdfile_path = load_path / sdfile_name
-        new_sdfile_path = processed_path / new_sdfile_name
 
-        shapeio.copy(sdfile_path, new_sdfile_path)
-        shapeio.replace_ignorecase(new_sdfile_path, sfile_name, new_sfile_name)
+
+if __name__ == "__main__":
+    print(f"Running ./scripts/V4hsRKL1t/convert_db1z1t_to_v4hs1trkl.py")
+
+    config = configparser.ConfigParser()
+    config.read("scripts/config.ini")
+
+    run_script_jobs(__file__, make_jobs, run_job, process_trackshape, config)
@@ -18,14 +18,35 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 
 import os
+import sys
 import configparser
-import pyffeditc
-import shapeio
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
-from urllib.request import urlopen
+from functools import partial
 from shapeio.shape import Shape
 from shapeedit import ShapeEditor
-from shapeedit.math import coordinates
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common import catalog, pipeline, resources, transplant
+from common.jobs import ShapeJob, run_script_jobs
+
+
+# Shapes in the input folder that this script converts.
+MATCH_FILES = ["DB*_A1tXover7_5d.s"]
+IGNORE_FILES = ["*.sd"]
+
+# Norbert Rieger's shape with the overhead wire, which is not part of the DBTracks packages.
+# TODO: Point the URL at a commit of dblslip7_5d-ohw instead of the master branch and set
+# the sha256 of the file in it. Until then the script refuses the shape, and the error
+# tells the SHA-256 of the downloaded file.
+CWIRE_SHAPE_RESOURCE = resources.Resource(
+    name="DB22f_A1tDblSlip7_5d.s",
+    url="https://raw.githubusercontent.com/pgroenbaek/dblslip7_5d-ohw/refs/heads/master/data/DB22f_A1tDblSlip7_5d.s",
+    sha256=None,
+)
+
+_cwire_shape: Optional[Shape] = None
 
 
 def process_trackshape(trackshape: Shape, cwire_shape: Shape):
@@ -35,7 +56,7 @@ def process_trackshape(trackshape: Shape, cwire_shape: Shape):
 
     Inserts all vertices and triangles from the catenary-wire primitives into the track shapes's
     `Rails` primitive. Vertex positions and normals are remapped between the internal coordinate
-    systems used within the shapes.
+    systems used within the shapes, a whole primitive at a time.
 
     Args:
         trackshape (Shape): The target Xover7_5d track shape to modify.
@@ -53,98 +74,105 @@ def process_trackshape(trackshape: Shape, cwire_shape: Shape):
 
     primitive = sub_object.primitives(prim_state_name="Rails")[0]
     to_matrix = primitive.matrix
-    
-    for cwire_primitive in cwire_primitives:
-        cwire_vertices = cwire_primitive.vertices()
-        cwire_triangles = cwire_primitive.triangles()
-        from_matrix = cwire_primitive.matrix
 
-        # Insert vertices from 'cwire_primitive' into 'primitive'.
-        new_vertex_lookup = {} # Key is vertex index within cwire_sub_object, value is new_vertex.
+    for idx, cwire_primitive in enumerate(cwire_primitives):
+        # Remapped once per process, the same catenary-wire geometry goes into every shape.
+        geometry = transplant.remapped_geometry(cwire_primitive, to_matrix, offset=(0.0, 0.0, 10.0))
+        num_triangles = transplant.transplant_geometry(primitive, geometry)
 
-        for idx, cwire_vertex in enumerate(cwire_vertices):
-            print(f"\tInserting vertex {idx + 1} of {len(cwire_vertices)}", end='\r')
+        print(f"\tInserted {len(geometry.vertex_points)} vertices and {num_triangles} triangles of catenary-wire primitive {idx + 1} of {len(cwire_primitives)}")
 
-            new_vertex = primitive.add_vertex(cwire_vertex.point, cwire_vertex.uv_point, cwire_vertex.normal)
 
-            new_vertex.point = coordinates.remap_point(new_vertex.point, from_matrix, to_matrix)
-            new_vertex.point.z = new_vertex.point.z + 10
-            new_vertex.normal = coordinates.remap_normal(new_vertex.normal, from_matrix, to_matrix)
-
-            if cwire_vertex.index not in new_vertex_lookup:
-                new_vertex_lookup[cwire_vertex.index] = new_vertex
-        
-        print("")
+def load_cwire_shape(config: configparser.ConfigParser) -> Shape:
+    """
+    Gets Norbert Rieger's DB22f_A1tDblSlip7_5d.s shape.
 
-        # Insert triangles from 'cwire_primitive' into 'primitive'.
-        for idx, cwire_triangle in enumerate(cwire_triangles):
-            print(f"\tInserting triangle {idx + 1} of {len(cwire_triangles)}", end='\r')
+    This particular shape is not part of the DBTracks packages and we need it for the overhead wire.
+    It is fetched from GitHub and parsed only once, and kept in the resource cache if one is configured.
 
-            cwire_triangle_vertices = cwire_triangle.vertices()
+    Args:
+        config (configparser.ConfigParser): The configuration read from config.ini.
 
-            vertex1 = new_vertex_lookup[cwire_triangle_vertices[0].index]
-            vertex2 = new_vertex_lookup[cwire_triangle_vertices[1].index]
-            vertex3 = new_vertex_lookup[cwire_triangle_vertices[2].index]
+    Returns:
+        Shape: The DblSlip7_5d shape containing the catenary-wire geometry.
+    """
+    global _cwire_shape
 
-            new_triangle = primitive.insert_triangle(vertex1, vertex2, vertex3)
-            new_triangle.face_normal = coordinates.remap_normal(new_triangle.face_normal, from_matrix, to_matrix)
-        
-        print("")
+    if _cwire_shape is None:
+        _cwire_shape = resources.load_shape_resource(CWIRE_SHAPE_RESOURCE, config)
 
+    return _cwire_shape
 
 
-if __name__ == "__main__":
-    print(f"Running ./scripts/XOver7_5d/make_ohw_xover7_5d.py")
+def make_jobs(config: configparser.ConfigParser) -> List[ShapeJob]:
+    """
+    Finds the Xover7_5d shapes to add the overhead wire to.
 
-    config = configparser.ConfigParser()
-    config.read("scripts/config.ini")
+    Args:
+        config (configparser.ConfigParser): The configuration read from config.ini.
 
-    ffeditc_path = Path(config["utilities"]["ffeditc_path"])
+    Returns:
+        List[ShapeJob]: One job for each shape to create.
+    """
     input_path = Path(config["shapes"]["input_path"])
     output_path = Path(config["shapes"]["output_path"])
 
     load_path = input_path
     processed_path = output_path / "Xover7_5d"
 
-    match_files = ["DB*_A1tXover7_5d.s"]
-    ignore_files = ["*.sd"]
-    
     os.makedirs(processed_path, exist_ok=True)
 
-    print("\tFetching Norbert Rieger's DB22f_A1tDblSlip7_5d.s shape from GitHub...")
-    print("\tThis particular shape is not part of the DBTracks packages and we need it for the overhead wire.")
-    cwire_shape_url = "https://raw.githubusercontent.com/pgroenbaek/dblslip7_5d-ohw/refs/heads/master/data/DB22f_A1tDblSlip7_5d.s"
-    with urlopen(cwire_shape_url) as response:
-        cwire_shape_text = response.read().decode("utf-16-le")
-    cwire_shape = shapeio.loads(cwire_shape_text)
+    input_catalog = catalog.open_input_catalog(config)
+    shape_names = input_catalog.find(MATCH_FILES, IGNORE_FILES)
+    jobs = []
 
-    shape_names = shapeio.find_directory_files(load_path, match_files, ignore_files)
-
-    for idx, sfile_name in enumerate(shape_names):
+    for sfile_name in shape_names:
         new_sfile_name = sfile_name.replace("_A1tXover7_5d", "f_A1tXover7_5d")
 
-        print(f"\tCreating {new_sfile_name} ({idx + 1} of {len(shape_names)})...")
+        jobs.append(ShapeJob(load_path / sfile_name, processed_path / new_sfile_name))
 
-        # Process .s file
-        shape_path = load_path / sfile_name
-        new_shape_path = processed_path / new_sfile_name
+    return jobs
 
-        shapeio.copy(shape_path, new_shape_path)
 
-        pyffeditc.decompress(ffeditc_path, new_shape_path)
-        trackshape = shapeio.load(new_shape_path)
+def job_dependencies(job: ShapeJob, config: configparser.ConfigParser) -> Tuple[List[Path], Dict[str, str]]:
+    """
+    Names what the shapes are created from besides the files in the input folder, for the build manifest.
 
-        process_trackshape(trackshape, cwire_shape)
+    Args:
+        job (ShapeJob): The job.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        Tuple[List[Path], Dict[str, str]]: No other input files, and the SHA-256 of the DblSlip7_5d shape.
+    """
+    return [], {"cwire_shape_sha256": resources.resource_sha256(CWIRE_SHAPE_RESOURCE, config)}
+
+
+def run_job(job: ShapeJob, config: configparser.ConfigParser):
+    """
+    Creates the .s and .sd files of a single job.
+
+    Args:
+        job (ShapeJob): The job to run.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        None
+    """
+    cwire_shape = load_cwire_shape(config)
+
+    # Process .s file
+    pipeline.make_shape(job, partial(process_trackshape, cwire_shape=cwire_shape), config)
+
+    # Process .sd file
+    pipeline.make_sd(job)
 
-        shapeio.dump(trackshape, new_shape_path)
-        pyffeditc.compress(ffeditc_path, new_shape_path)
 
-        # Process .sd file
-        sdfile_name = sfile_name.replace(".s", ".sd")
-        new_sdfile_name = new_sfile_name.replace(".s", ".sd")
 
-        sdfile_path = load_path / sdfile_name
-        new_sdfile_path = processed_path / new_sdfile_name
+if __name__ == "__main__":
+    print(f"Running ./scripts/XOver7_5d/make_ohw_xover7_5d.py")
+
+    config = configparser.ConfigParser()
+    config.read("scripts/config.ini")
 
-        shapeio.copy(sdfile_path, new_sdfile_path)
-        shapeio.replace_ignorecase(new_sdfile_path, sfile_name, new_sfile_name)
+    run_script_jobs(__file__, make_jobs, run_job, process_trackshape, config, job_dependencies)
@@ -0,0 +1,229 @@
+"""
+This file is part of DBTracks Extras.
+
+Copyright (C) 2026 Peter Grønbæk Andersen <peter@grnbk.io>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import subprocess
+import configparser
+import numpy as np
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+from common import ace
+
+
+class EncodeResult(NamedTuple):
+    """
+    How fast and how well a texture was re-encoded.
+
+    Attributes:
+        megapixels (float): Pixels encoded, including the mipmaps, in millions.
+        seconds (float): Time it took to encode the texture.
+        rmse (float): Root-mean-square error of the RGB values of the full-size image.
+        mask_errors (int): Pixels of the full-size image whose transparency changed.
+    """
+    megapixels: float
+    seconds: float
+    rmse: float
+    mask_errors: int
+
+
+def compare(reference: ace.AceTexture, texture: ace.AceTexture, megapixels: float, seconds: float) -> EncodeResult:
+    """
+    Measures the difference between the full-size images of two textures.
+
+    Args:
+        reference (ace.AceTexture): The texture to compare against.
+        texture (ace.AceTexture): The re-encoded texture.
+        megapixels (float): Pixels encoded, including the mipmaps, in millions.
+        seconds (float): Time it took to encode the texture.
+
+    Returns:
+        EncodeResult: The throughput and error of the re-encoded texture.
+    """
+    expected = reference.images[0].astype(np.float64)
+    actual = texture.images[0].astype(np.float64)
+
+    rmse = float(np.sqrt(((actual[:, :, :3] - expected[:, :, :3]) ** 2).mean()))
+    mask_errors = int(((actual[:, :, 3] >= 128) != (expected[:, :, 3] >= 128)).sum())
+
+    return EncodeResult(megapixels, seconds, rmse, mask_errors)
+
+
+def encode_python(texture: ace.AceTexture) -> EncodeResult:
+    """
+    Re-encodes the image of a texture with the in-process codec, mipmaps included.
+
+    Args:
+        texture (ace.AceTexture): The decoded source texture.
+
+    Returns:
+        EncodeResult: The throughput and error of the re-encoded texture.
+    """
+    image = texture.to_image()
+
+    start = time.perf_counter()
+    new_texture = texture.with_image(image)
+    data = ace.encode_ace(new_texture)
+    seconds = time.perf_counter() - start
+
+    megapixels = sum(i.shape[0] * i.shape[1] for i in new_texture.images) / 1e6
+
+    return compare(texture, ace.decode_ace(data), megapixels, seconds)
+
+
+def encode_aceit(texture: ace.AceTexture, aceit_path: Path) -> EncodeResult:
+    """
+    Re-encodes the image of a texture with AceIt, through a `.png` file.
+
+    The time includes starting aceit.exe and reading and writing the files, and AceIt
+    chooses the output format itself, so it is not only the time of a DXT1 encode.
+
+    Args:
+        texture (ace.AceTexture): The decoded source texture.
+        aceit_path (Path): Path to the aceit.exe executable.
+
+    Returns:
+        EncodeResult: The throughput and error of the re-encoded texture.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        png_path = os.path.join(temp_dir, "texture.png")
+        ace_path = os.path.join(temp_dir, "texture.ace")
+
+        texture.to_image().save(png_path)
+
+        start = time.perf_counter()
+        subprocess.run(
+            [str(aceit_path), png_path, ace_path, "-q"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True
+        )
+        seconds = time.perf_counter() - start
+
+        with open(ace_path, "rb") as f:
+            new_texture = ace.decode_ace(f.read())
+
+    megapixels = sum(i.shape[0] * i.shape[1] for i in new_texture.images) / 1e6
+
+    return compare(texture, new_texture, megapixels, seconds)
+
+
+def summarize(label: str, results: List[EncodeResult]) -> str:
+    """
+    Sums up the results of encoding many textures.
+
+    Args:
+        label (str): Name of the encoder.
+        results (List[EncodeResult]): One result per texture.
+
+    Returns:
+        str: The total throughput, the mean error, and the number of changed mask pixels.
+    """
+    megapixels = sum(r.megapixels for r in results)
+    seconds = sum(r.seconds for r in results)
+    mean_rmse = sum(r.rmse for r in results) / max(len(results), 1)
+    mask_errors = sum(r.mask_errors for r in results)
+
+    return f"{label}: {megapixels / max(seconds, 1e-9):.2f} MP/s ({megapixels:.1f} MP in {seconds:.1f} s), mean RMSE {mean_rmse:.2f}, {mask_errors} mask pixels changed"
+
+
+def find_textures(texture_path: Path, limit: Optional[int]) -> List[Path]:
+    """
+    Finds the DXT1 textures to benchmark.
+
+    Args:
+        texture_path (Path): Folder with the DB_Textures `.ace` files.
+        limit (Optional[int]): Maximum number of textures, or None for all of them.
+
+    Returns:
+        List[Path]: Paths of the DXT1 textures, sorted by name.
+    """
+    ace_paths = sorted(p for p in texture_path.iterdir() if p.suffix.lower() == ".ace")
+    dxt1_paths = []
+
+    for ace_path in ace_paths:
+        with open(ace_path, "rb") as f:
+            try:
+                texture = ace.decode_ace(f.read())
+            except ace.AceCodecError:
+                continue
+
+        if texture.surface_format == ace.ACE_FORMAT_DXT1:
+            dxt1_paths.append(ace_path)
+
+        if limit is not None and len(dxt1_paths) >= limit:
+            break
+
+    return dxt1_paths
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the DXT1 encoder of the in-process ACE codec on the DB_Textures set.")
+    parser.add_argument(
+        "--aceit",
+        action="store_true",
+        help="Also re-encode every texture with AceIt (aceit_path in config.ini) to compare against it."
+    )
+    parser.add_argument(
+        "--limit", "-n",
+        type=int,
+        default=None,
+        help="Only benchmark the first N DXT1 textures."
+    )
+    args = parser.parse_args()
+
+    config = configparser.ConfigParser()
+    config.read("scripts/config.ini")
+
+    texture_path = Path(config["textures"]["input_path"])
+    aceit_path = Path(config["utilities"]["aceit_path"]) if args.aceit else None
+
+    ace_paths = find_textures(texture_path, args.limit)
+
+    print(f"Benchmarking {len(ace_paths)} DXT1 textures in {texture_path}")
+    print("The errors are measured against the source textures, which were made with AceIt.")
+
+    python_results = []
+    aceit_results = []
+
+    for ace_path in ace_paths:
+        with open(ace_path, "rb") as f:
+            texture = ace.decode_ace(f.read())
+
+        result = encode_python(texture)
+        python_results.append(result)
+        line = f"\t{ace_path.name}: {result.megapixels / max(result.seconds, 1e-9):.2f} MP/s, RMSE {result.rmse:.2f}"
+
+        if aceit_path is not None:
+            aceit_result = encode_aceit(texture, aceit_path)
+            aceit_results.append(aceit_result)
+            line += f" (AceIt {aceit_result.megapixels / max(aceit_result.seconds, 1e-9):.2f} MP/s, RMSE {aceit_result.rmse:.2f})"
+
+        print(line)
+
+    print(summarize("Python", python_results))
+
+    if aceit_path is not None:
+        print(summarize("AceIt", aceit_results))
+        print("The AceIt times include starting aceit.exe and its file I/O for every texture, and AceIt chooses")
+        print("its own output format, so its throughput is not directly comparable to the in-process encoder.")
@@ -0,0 +1,627 @@
+"""
+This file is part of DBTracks Extras.
+
+Copyright (C) 2026 Peter Grønbæk Andersen <peter@grnbk.io>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import zlib
+import struct
+import numpy as np
+from typing import List, NamedTuple, Optional
+from PIL import Image
+
+
+TEXTURE_CODECS = ("python", "aceit")
+
+ACE_FORMAT_RGB565 = 0x0E
+ACE_FORMAT_ARGB1555 = 0x10
+ACE_FORMAT_ARGB4444 = 0x11
+ACE_FORMAT_DXT1 = 0x12
+
+ACE_CHANNEL_MASK = 2
+ACE_CHANNEL_RED = 3
+ACE_CHANNEL_GREEN = 4
+ACE_CHANNEL_BLUE = 5
+ACE_CHANNEL_ALPHA = 6
+
+_OPTION_MIPMAPS = 0x01
+_OPTION_RAW_DATA = 0x10
+
+_COMPRESSED_HEADER = b"SIMISA@F"
+_UNCOMPRESSED_HEADER = b"SIMISA@@@@@@@@@@"
+
+# Size of the fields between the channel count and the channel list, which hold
+# e.g. the name of the tool that made the file. They are kept when re-encoding.
+_MISC_DATA_SIZE = 128
+
+
+class AceCodecError(Exception):
+    """Raised when an ACE file cannot be read or written by the pure-Python codec."""
+    pass
+
+
+class AceTexture(NamedTuple):
+    """
+    The decoded contents of an ACE texture.
+
+    Attributes:
+        images (List[np.ndarray]): RGBA pixels of the image, shape (H, W, 4), followed by
+            those of each of its mipmaps if it has any.
+        surface_format (int): One of the ACE_FORMAT_* constants.
+        alpha_channel (Optional[int]): ACE_CHANNEL_MASK for 1-bit transparency,
+            ACE_CHANNEL_ALPHA for 8-bit transparency, or None if the texture is opaque.
+        misc_data (bytes): The 128 header bytes following the channel count.
+    """
+    images: List[np.ndarray]
+    surface_format: int
+    alpha_channel: Optional[int]
+    misc_data: bytes = bytes(_MISC_DATA_SIZE)
+
+    @property
+    def has_mipmaps(self) -> bool:
+        return len(self.images) > 1
+
+    def to_image(self) -> Image.Image:
+        """
+        Gets the full-size image of the texture, without its mipmaps.
+
+        Returns:
+            Image.Image: An RGBA image if the texture has an alpha channel, otherwise an RGB image.
+        """
+        if self.alpha_channel is None:
+            return Image.fromarray(np.ascontiguousarray(self.images[0][:, :, :3]), "RGB")
+
+        return Image.fromarray(self.images[0], "RGBA")
+
+    def with_image(self, image: Image.Image) -> "AceTexture":
+        """
+        Makes a texture with another image, and the same format and transparency as this one.
+
+        Mipmaps are generated for the new image if this texture has mipmaps. If this texture
+        is opaque and the new image has transparent pixels, the new texture gets a mask.
+
+        Args:
+            image (Image.Image): The new full-size image.
+
+        Returns:
+            AceTexture: The new texture.
+        """
+        alpha_channel = self.alpha_channel
+        surface_format = self.surface_format
+
+        if alpha_channel is None and image.mode == "RGBA" and image.getextrema()[3][0] < 128:
+            alpha_channel = ACE_CHANNEL_MASK
+
+            if surface_format != ACE_FORMAT_DXT1:
+                surface_format = _structured_surface_format(alpha_channel)
+
+        return texture_from_image(image, self.has_mipmaps, alpha_channel, surface_format, self.misc_data)
+
+
+def texture_from_image(
+    image: Image.Image,
+    has_mipmaps: bool = True,
+    alpha_channel: Optional[int] = None,
+    surface_format: Optional[int] = None,
+    misc_data: bytes = bytes(_MISC_DATA_SIZE)
+) -> AceTexture:
+    """
+    Makes an ACE texture from an image.
+
+    Args:
+        image (Image.Image): The full-size image.
+        has_mipmaps (bool, optional): Whether to generate mipmaps. Defaults to True.
+        alpha_channel (Optional[int], optional): ACE_CHANNEL_MASK, ACE_CHANNEL_ALPHA or None
+            to drop the transparency of the image. Defaults to None.
+        surface_format (Optional[int], optional): The surface format of the texture, ACE_FORMAT_DXT1
+            for a block-compressed texture. Defaults to the uncompressed format matching `alpha_channel`.
+        misc_data (bytes, optional): The 128 header bytes following the channel count.
+
+    Returns:
+        AceTexture: The texture.
+
+    Raises:
+        AceCodecError: If mipmaps are requested for an image that is not square with
+            a power-of-two size, `alpha_channel` is not a transparency channel, or a
+            DXT1 texture is requested with an 8-bit alpha channel.
+    """
+    if alpha_channel not in (None, ACE_CHANNEL_MASK, ACE_CHANNEL_ALPHA):
+        raise AceCodecError(f"Channel {alpha_channel} is not a transparency channel")
+
+    if surface_format == ACE_FORMAT_DXT1 and alpha_channel == ACE_CHANNEL_ALPHA:
+        raise AceCodecError("DXT1 textures can only have a mask, not an 8-bit alpha channel")
+
+    pixels = np.array(image.convert("RGBA"), dtype=np.uint8)
+
+    if alpha_channel is None:
+        pixels[:, :, 3] = 255
+    elif alpha_channel == ACE_CHANNEL_MASK:
+        pixels[:, :, 3] = np.where(pixels[:, :, 3] >= 128, 255, 0)
+
+    images = [pixels]
+
+    if has_mipmaps:
+        images.extend(mipmaps(pixels))
+
+        if alpha_channel == ACE_CHANNEL_MASK:
+            for mipmap in images[1:]:
+                mipmap[:, :, 3] = np.where(mipmap[:, :, 3] >= 128, 255, 0)
+
+    if surface_format is None:
+        surface_format = _structured_surface_format(alpha_channel)
+
+    return AceTexture(images, surface_format, alpha_channel, misc_data)
+
+
+def mipmaps(pixels: np.ndarray) -> List[np.ndarray]:
+    """
+    Generates the mipmaps of an image down to 1x1 pixel, each the 2x2 box filtered previous one.
+
+    Args:
+        pixels (np.ndarray): RGBA pixels of the full-size image, shape (H, W, 4).
+
+    Returns:
+        List[np.ndarray]: RGBA pixels of each mipmap, largest first.
+
+    Raises:
+        AceCodecError: If the image is not square with a power-of-two size.
+    """
+    height, width = pixels.shape[:2]
+
+    if width != height or width & (width - 1) != 0:
+        raise AceCodecError(f"Mipmaps need a square image with a power-of-two size, got {width}x{height}")
+
+    levels = []
+    level = pixels
+
+    while level.shape[0] > 1:
+        wide = level.astype(np.uint16)
+        level = ((wide[0::2, 0::2] + wide[0::2, 1::2] + wide[1::2, 0::2] + wide[1::2, 1::2] + 2) >> 2).astype(np.uint8)
+        levels.append(level)
+
+    return levels
+
+
+def decode_ace(data: bytes) -> AceTexture:
+    """
+    Decodes the contents of an ACE file, compressed or not.
+
+    Both uncompressed textures and DXT1 textures are supported.
+
+    Args:
+        data (bytes): The contents of the `.ace` file.
+
+    Returns:
+        AceTexture: The decoded texture.
+
+    Raises:
+        AceCodecError: If the data is not a supported ACE texture.
+    """
+    payload = _unwrap(data)
+
+    try:
+        (_, options, width, height, surface_format, channel_count) = struct.unpack_from("<6i", payload, 0)
+        offset = 24
+        misc_data = payload[offset:offset + _MISC_DATA_SIZE]
+        offset += _MISC_DATA_SIZE
+
+        channels = []
+        for _ in range(channel_count):
+            size, channel_id = struct.unpack_from("<QQ", payload, offset)
+            channels.append((size, channel_id))
+            offset += 16
+
+        image_sizes = _image_sizes(width, height, options & _OPTION_MIPMAPS != 0)
+
+        if options & _OPTION_RAW_DATA:
+            images = _decode_raw_images(payload, offset, image_sizes, surface_format)
+        else:
+            images = _decode_structured_images(payload, offset, image_sizes, channels)
+
+    except struct.error as e:
+        raise AceCodecError(f"Truncated ACE file: {e}") from e
+
+    channel_ids = [channel_id for _, channel_id in channels]
+
+    # DXT1 has 1-bit transparency, whatever channel the file lists for it.
+    if ACE_CHANNEL_ALPHA in channel_ids and surface_format != ACE_FORMAT_DXT1:
+        alpha_channel = ACE_CHANNEL_ALPHA
+    elif ACE_CHANNEL_ALPHA in channel_ids:
+        alpha_channel = ACE_CHANNEL_MASK
+    elif ACE_CHANNEL_MASK in channel_ids:
+        alpha_channel = ACE_CHANNEL_MASK
+    else:
+        alpha_channel = None
+
+    return AceTexture(images, surface_format, alpha_channel, bytes(misc_data))
+
+
+def encode_ace(texture: AceTexture, compress: bool = False) -> bytes:
+    """
+    Encodes a texture as the contents of an ACE file.
+
+    DXT1 textures are block-compressed, all blocks of an image at once. Other
+    textures are stored uncompressed.
+
+    Args:
+        texture (AceTexture): The texture to encode.
+        compress (bool, optional): Whether to zlib-compress the file, like the 'SIMISA@F'
+            files MSTS and Open Rails also read. Defaults to False.
+
+    Returns:
+        bytes: The contents of the `.ace` file.
+
+    Raises:
+        AceCodecError: If the texture is DXT1 compressed and has an 8-bit alpha channel.
+    """
+    is_dxt1 = texture.surface_format == ACE_FORMAT_DXT1
+
+    if is_dxt1 and texture.alpha_channel == ACE_CHANNEL_ALPHA:
+        raise AceCodecError("DXT1 textures can only have a mask, not an 8-bit alpha channel")
+
+    channels = [(8, ACE_CHANNEL_RED), (8, ACE_CHANNEL_GREEN), (8, ACE_CHANNEL_BLUE)]
+
+    if texture.alpha_channel == ACE_CHANNEL_MASK:
+        channels.append((1, ACE_CHANNEL_MASK))
+    elif texture.alpha_channel == ACE_CHANNEL_ALPHA:
+        channels.append((8, ACE_CHANNEL_ALPHA))
+
+    height, width = texture.images[0].shape[:2]
+    options = _OPTION_MIPMAPS if texture.has_mipmaps else 0
+
+    if is_dxt1:
+        options |= _OPTION_RAW_DATA
+
+    header = struct.pack("<6i", 1, options, width, height, texture.surface_format, len(channels))
+    header += texture.misc_data.ljust(_MISC_DATA_SIZE, b"\0")[:_MISC_DATA_SIZE]
+    header += b"".join(struct.pack("<QQ", size, channel_id) for size, channel_id in channels)
+
+    if is_dxt1:
+        # Each image is stored as its size followed by its blocks.
+        chunks = []
+
+        for image in texture.images:
+            blocks = _encode_dxt1(image)
+            chunks.append(struct.pack("<i", len(blocks)) + blocks)
+    else:
+        # Each row of each image is stored separately.
+        chunks = [row for image in texture.images for row in _encode_rows(image, channels)]
+
+    # One offset per chunk, pointing at the chunk from the start of the payload.
+    chunk_offset = len(header) + 4 * len(chunks)
+    chunk_offsets = []
+
+    for chunk in chunks:
+        chunk_offsets.append(chunk_offset)
+        chunk_offset += len(chunk)
+
+    payload = b"".join([
+        header,
+        struct.pack(f"<{len(chunk_offsets)}i", *chunk_offsets),
+        *chunks,
+    ])
+
+    if compress:
+        return _COMPRESSED_HEADER + struct.pack("<I", len(payload)) + b"@@@@" + zlib.compress(payload, 9)
+
+    return _UNCOMPRESSED_HEADER + payload
+
+
+def _unwrap(data: bytes) -> bytes:
+    # The ACE payload, after the 'SIMISA@@@@@@@@@@' header or decompressed from a 'SIMISA@F' file.
+    if data.startswith(_COMPRESSED_HEADER):
+        try:
+            return zlib.decompress(data[16:])
+        except zlib.error as e:
+            raise AceCodecError(f"Invalid compressed data: {e}") from e
+
+    if data.startswith(_UNCOMPRESSED_HEADER):
+        return data[len(_UNCOMPRESSED_HEADER):]
+
+    # Some tools write the payload without a header.
+    if data[:4] == struct.pack("<i", 1):
+        return data
+
+    raise AceCodecError("Unknown file header, not an ACE file")
+
+
+def _structured_surface_format(alpha_channel: Optional[int]) -> int:
+    if alpha_channel == ACE_CHANNEL_MASK:
+        return ACE_FORMAT_ARGB1555
+    if alpha_channel == ACE_CHANNEL_ALPHA:
+        return ACE_FORMAT_ARGB4444
+    return ACE_FORMAT_RGB565
+
+
+def _image_sizes(width: int, height: int, has_mipmaps: bool) -> List[tuple]:
+    # Width and height of the image and each of its mipmaps, down to 1x1 pixel.
+    if not has_mipmaps:
+        return [(width, height)]
+
+    # 1 + log2(width) images for a power-of-two width.
+    num_images = width.bit_length()
+    return [(max(1, width >> idx), max(1, height >> idx)) for idx in range(num_images)]
+
+
+def _decode_structured_images(payload: bytes, offset: int, image_sizes: List[tuple], channels: List[tuple]) -> List[np.ndarray]:
+    # Rows are read in order rather than through the row offset table, like Open Rails does.
+    offset += 4 * sum(height for _, height in image_sizes)
+    images = []
+
+    for width, height in image_sizes:
+        pixels = np.zeros((height, width, 4), dtype=np.uint8)
+        pixels[:, :, 3] = 255
+
+        row_sizes = [(width + 7) // 8 if size == 1 else width for size, _ in channels]
+        row_size = sum(row_sizes)
+        rows = np.frombuffer(payload, dtype=np.uint8, count=row_size * height, offset=offset).reshape(height, row_size)
+        offset += row_size * height
+
+        column = 0
+        for (size, channel_id), channel_row_size in zip(channels, row_sizes):
+            values = rows[:, column:column + channel_row_size]
+            column += channel_row_size
+
+            if size == 1:
+                values = np.unpackbits(values, axis=1)[:, :width] * np.uint8(255)
+
+            if channel_id in (ACE_CHANNEL_RED, ACE_CHANNEL_GREEN, ACE_CHANNEL_BLUE):
+                pixels[:, :, channel_id - ACE_CHANNEL_RED] = values
+            elif channel_id in (ACE_CHANNEL_MASK, ACE_CHANNEL_ALPHA):
+                pixels[:, :, 3] = values
+
+        images.append(pixels)
+
+    return images
+
+
+def _decode_raw_images(payload: bytes, offset: int, image_sizes: List[tuple], surface_format: int) -> List[np.ndarray]:
+    if surface_format != ACE_FORMAT_DXT1:
+        raise AceCodecError(f"Unsupported raw surface format 0x{surface_format:02x}")
+
+    offset += 4 * len(image_sizes)
+    images = []
+
+    for width, height in image_sizes:
+        if offset + 4 <= len(payload):
+            (size,) = struct.unpack_from("<i", payload, offset)
+            offset += 4
+        else:
+            size = 0
+
+        blocks = payload[offset:offset + size]
+        offset += size
+
+        num_blocks = ((width + 3) // 4) * ((height + 3) // 4)
+
+        if len(blocks) < 8 * num_blocks:
+            # Some tools shorten or leave out the mipmaps smaller than a block, so they are made from the previous one.
+            images.append(mipmaps(images[-1])[0] if images else np.zeros((height, width, 4), dtype=np.uint8))
+            continue
+
+        images.append(_decode_dxt1(blocks, width, height))
+
+    return images
+
+
+def _decode_dxt1(data: bytes, width: int, height: int) -> np.ndarray:
+    blocks_x = (width + 3) // 4
+    blocks_y = (height + 3) // 4
+
+    blocks = np.frombuffer(data, dtype="<u4", count=2 * blocks_x * blocks_y).reshape(-1, 2)
+    colour0 = (blocks[:, 0] & 0xFFFF).astype(np.uint16)
+    colour1 = (blocks[:, 0] >> 16).astype(np.uint16)
+    indices = (blocks[:, 1][:, None] >> (2 * np.arange(16, dtype=np.uint32))) & 3
+
+    palette = _dxt1_palette(colour0, colour1)
+
+    texels = np.take_along_axis(palette, indices[:, :, None].astype(np.intp), axis=1).astype(np.uint8)
+    texels = texels.reshape(blocks_y, blocks_x, 4, 4, 4).transpose(0, 2, 1, 3, 4).reshape(blocks_y * 4, blocks_x * 4, 4)
+
+    return np.ascontiguousarray(texels[:height, :width])
+
+
+def _dxt1_palette(colour0: np.ndarray, colour1: np.ndarray) -> np.ndarray:
+    # RGBA of the four colours of each block. Blocks whose first colour is not greater than
+    # the second have three colours and transparent black.
+    rgb0 = _rgb565_to_rgb(colour0)
+    rgb1 = _rgb565_to_rgb(colour1)
+
+    four_colours = (colour0 > colour1)[:, None]
+    palette = np.empty((len(colour0), 4, 4), dtype=np.int32)
+    palette[:, 0, :3] = rgb0
+    palette[:, 1, :3] = rgb1
+    palette[:, 2, :3] = np.where(four_colours, (2 * rgb0 + rgb1) // 3, (rgb0 + rgb1) // 2)
+    palette[:, 3, :3] = np.where(four_colours, (rgb0 + 2 * rgb1) // 3, 0)
+    palette[:, :, 3] = 255
+    palette[:, 3, 3] = np.where(four_colours[:, 0], 255, 0)
+
+    return palette
+
+
+def _rgb565_to_rgb(colours: np.ndarray) -> np.ndarray:
+    colours = colours.astype(np.int32)
+    r = (colours >> 11) & 0x1F
+    g = (colours >> 5) & 0x3F
+    b = colours & 0x1F
+    return np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], axis=1)
+
+
+def _encode_rows(pixels: np.ndarray, channels: List[tuple]) -> List[bytes]:
+    height, width = pixels.shape[:2]
+    columns = []
+
+    for size, channel_id in channels:
+        if channel_id in (ACE_CHANNEL_RED, ACE_CHANNEL_GREEN, ACE_CHANNEL_BLUE):
+            values = pixels[:, :, channel_id - ACE_CHANNEL_RED]
+        else:
+            values = pixels[:, :, 3]
+
+        if size == 1:
+            values = np.packbits(values >= 128, axis=1)
+
+        columns.append(values)
+
+    rows = np.concatenate(columns, axis=1)
+    return [rows[y].tobytes() for y in range(height)]
+
+
+def _encode_dxt1(pixels: np.ndarray) -> bytes:
+    # Block-compresses all 4x4 blocks of an image at once. The endpoints are first placed
+    # along the principal axis of the colours of each block, and then fitted to the chosen
+    # palette indices by least squares, keeping whichever gives the smaller error.
+    # Channels are kept in separate (blocks, 16) arrays, which NumPy handles much faster
+    # than reductions over a trailing axis of three channels.
+    height, width = pixels.shape[:2]
+    blocks_x = (width + 3) // 4
+    blocks_y = (height + 3) // 4
+
+    padded = np.pad(pixels, ((0, 4 * blocks_y - height), (0, 4 * blocks_x - width), (0, 0)), mode="edge")
+    blocks = padded.reshape(blocks_y, 4, blocks_x, 4, 4).transpose(4, 0, 2, 1, 3).reshape(4, -1, 16)
+
+    rgb = blocks[:3].astype(np.float32)
+    is_opaque = blocks[3] >= 128
+    has_transparency = ~is_opaque.all(axis=1)
+
+    colour0, colour1 = _dxt1_principal_endpoints(rgb, is_opaque)
+    colour0, colour1, indices, errors = _dxt1_fit(rgb, is_opaque, has_transparency, colour0, colour1)
+
+    refined_colour0, refined_colour1 = _dxt1_least_squares_endpoints(rgb, is_opaque, has_transparency, indices, colour0, colour1)
+    refined = _dxt1_fit(rgb, is_opaque, has_transparency, refined_colour0, refined_colour1)
+
+    is_better = refined[3] < errors
+    colour0 = np.where(is_better, refined[0], colour0)
+    colour1 = np.where(is_better, refined[1], colour1)
+    indices = np.where(is_better[:, None], refined[2], indices)
+
+    words = np.empty((blocks.shape[1], 2), dtype="<u4")
+    words[:, 0] = colour0.astype(np.uint32) | (colour1.astype(np.uint32) << 16)
+    words[:, 1] = (indices.astype(np.uint32) << (2 * np.arange(16, dtype=np.uint32))).sum(axis=1, dtype=np.uint32)
+
+    return words.tobytes()
+
+
+def _dxt1_principal_endpoints(rgb: np.ndarray, is_opaque: np.ndarray) -> tuple:
+    weights = is_opaque.astype(np.float32)
+    count = np.maximum(weights.sum(axis=1), 1.0)
+    mean = [(channel * weights).sum(axis=1) / count for channel in rgb]
+    centered = [(channel - channel_mean[:, None]) * weights for channel, channel_mean in zip(rgb, mean)]
+
+    covariance = [[(centered[i] * centered[j]).sum(axis=1) for j in range(3)] for i in range(3)]
+
+    # Power iteration, starting from the row of the channel that varies the most.
+    diagonal = np.stack([covariance[i][i] for i in range(3)])
+    largest = diagonal.argmax(axis=0)
+    axis = [np.choose(largest, [covariance[0][j], covariance[1][j], covariance[2][j]]) for j in range(3)]
+
+    for _ in range(8):
+        axis = [covariance[i][0] * axis[0] + covariance[i][1] * axis[1] + covariance[i][2] * axis[2] for i in range(3)]
+        length = np.maximum(np.sqrt(axis[0] * axis[0] + axis[1] * axis[1] + axis[2] * axis[2]), 1e-12)
+        axis = [a / length for a in axis]
+
+    projections = sum((channel - channel_mean[:, None]) * a[:, None] for channel, channel_mean, a in zip(rgb, mean, axis))
+    max_projection = np.where(is_opaque, projections, -np.inf).max(axis=1)
+    min_projection = np.where(is_opaque, projections, np.inf).min(axis=1)
+
+    # Blocks without opaque pixels get both endpoints at the mean.
+    max_projection = np.where(np.isfinite(max_projection), max_projection, 0.0)
+    min_projection = np.where(np.isfinite(min_projection), min_projection, 0.0)
+
+    end0 = np.stack([m + max_projection * a for m, a in zip(mean, axis)], axis=1)
+    end1 = np.stack([m + min_projection * a for m, a in zip(mean, axis)], axis=1)
+
+    return _rgb_to_rgb565(end0), _rgb_to_rgb565(end1)
+
+
+def _dxt1_fit(
+    rgb: np.ndarray,
+    is_opaque: np.ndarray,
+    has_transparency: np.ndarray,
+    colour0: np.ndarray,
+    colour1: np.ndarray
+) -> tuple:
+    # Orders the endpoints for the mode of each block, and picks the closest palette entry for each pixel.
+    # Opaque blocks use four colours, blocks with transparent pixels three colours and transparent black.
+    swap = np.where(has_transparency, colour0 > colour1, colour0 < colour1)
+    colour0, colour1 = np.where(swap, colour1, colour0), np.where(swap, colour0, colour1)
+
+    palette = _dxt1_palette(colour0, colour1).astype(np.float32)
+    four_colours = (colour0 > colour1)[:, None]
+
+    indices = np.zeros(is_opaque.shape, dtype=np.uint32)
+    errors = None
+
+    for idx in range(4):
+        distances = sum((channel - palette[:, idx, c][:, None]) ** 2 for c, channel in enumerate(rgb))
+
+        # Transparent black is only for transparent pixels.
+        if idx == 3:
+            distances = np.where(four_colours, distances, np.inf)
+
+        if errors is None:
+            errors = distances
+        else:
+            is_closer = distances < errors
+            indices = np.where(is_closer, np.uint32(idx), indices)
+            errors = np.where(is_closer, distances, errors)
+
+    errors = np.where(is_opaque, errors, 0.0).sum(axis=1)
+    indices = np.where(is_opaque, indices, np.uint32(3))
+
+    return colour0, colour1, indices, errors
+
+
+def _dxt1_least_squares_endpoints(
+    rgb: np.ndarray,
+    is_opaque: np.ndarray,
+    has_transparency: np.ndarray,
+    indices: np.ndarray,
+    colour0: np.ndarray,
+    colour1: np.ndarray
+) -> tuple:
+    # Weight of the first endpoint in each palette entry, for four and three colour blocks.
+    four_colour_weights = np.array([1.0, 0.0, 2.0 / 3.0, 1.0 / 3.0], dtype=np.float32)
+    three_colour_weights = np.array([1.0, 0.0, 0.5, 0.0], dtype=np.float32)
+
+    a = np.where(has_transparency[:, None], three_colour_weights[indices], four_colour_weights[indices])
+    a = np.where(is_opaque, a, 0.0)
+    b = np.where(is_opaque, 1.0 - a, 0.0)
+
+    aa = (a * a).sum(axis=1)
+    ab = (a * b).sum(axis=1)
+    bb = (b * b).sum(axis=1)
+    ax = np.stack([(a * channel).sum(axis=1) for channel in rgb], axis=1)
+    bx = np.stack([(b * channel).sum(axis=1) for channel in rgb], axis=1)
+
+    determinant = aa * bb - ab * ab
+    is_solvable = np.abs(determinant) > 1e-6
+    determinant = np.where(is_solvable, determinant, 1.0)[:, None]
+
+    end0 = (bb[:, None] * ax - ab[:, None] * bx) / determinant
+    end1 = (aa[:, None] * bx - ab[:, None] * ax) / determinant
+
+    return (
+        np.where(is_solvable, _rgb_to_rgb565(end0), colour0),
+        np.where(is_solvable, _rgb_to_rgb565(end1), colour1),
+    )
+
+
+def _rgb_to_rgb565(colours: np.ndarray) -> np.ndarray:
+    colours = np.clip(colours, 0.0, 255.0)
+    r = np.rint(colours[:, 0] * 31.0 / 255.0).astype(np.uint16)
+    g = np.rint(colours[:, 1] * 63.0 / 255.0).astype(np.uint16)
+    b = np.rint(colours[:, 2] * 31.0 / 255.0).astype(np.uint16)
+    return (r << 11) | (g << 5) | b
@@ -0,0 +1,307 @@
+"""
+This file is part of DBTracks Extras.
+
+Copyright (C) 2026 Peter Grønbæk Andersen <peter@grnbk.io>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import json
+import atexit
+import fnmatch
+import configparser
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from . import manifest, pipeline
+from .pipeline import write_file_atomic
+
+
+# Bump when the stored details change, so old catalogs are rebuilt.
+CATALOG_VERSION = 1
+
+_open_catalogs: Dict[str, "InputCatalog"] = {}
+
+
+class CatalogEntry(NamedTuple):
+    """
+    What the catalog knows about one shape in the input folder.
+
+    Attributes:
+        name (str): File name of the shape.
+        size (int): Size of the file in bytes.
+        sha256 (str): Hex digest of the file contents.
+        prim_states (List[Optional[str]]): Names of the prim_states of the shape, None for unnamed ones.
+        textures (List[str]): The texture images the shape references.
+        num_vertices (int): Number of vertices in all sub_objects of all distance levels.
+        num_triangles (int): Number of triangles in all primitives of all distance levels.
+    """
+    name: str
+    size: int
+    sha256: str
+    prim_states: List[Optional[str]]
+    textures: List[str]
+    num_vertices: int
+    num_triangles: int
+
+
+class InputCatalog:
+    """
+    A persistent listing of the input shapes folder, shared by all scripts.
+
+    The folder is only listed again when its modification time has changed, i.e.
+    when files were added, removed or renamed, so the scripts can find their shapes
+    and check for existing ones without scanning the folder every time. The hash and
+    details of a shape are calculated the first time they are asked for, and kept
+    until the size or modification time of the file changes.
+
+    Hashes of input files calculated by `manifest.file_hash` during a run are also
+    kept, so unchanged source shapes are not read again to check whether a job is
+    up to date.
+
+    Args:
+        catalog_path (Path): Path of the JSON file.
+        shapes_path (Path): The input shapes folder.
+        config (configparser.ConfigParser): The configuration read from config.ini, used to read shapes.
+    """
+
+    def __init__(self, catalog_path: Path, shapes_path: Path, config: configparser.ConfigParser):
+        self.catalog_path = Path(catalog_path)
+        self.shapes_path = Path(shapes_path)
+        self.config = config
+        self._folder_mtime_ns, self._entries = self._read()
+        self._normcase_names = {os.path.normcase(name) for name in self._entries}
+        self._changed = False
+
+    def _read(self) -> Tuple[Optional[int], Dict[str, dict]]:
+        if not self.catalog_path.exists():
+            return None, {}
+
+        try:
+            with open(self.catalog_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None, {}
+
+        if data.get("version") != CATALOG_VERSION or data.get("folder") != str(self.shapes_path.resolve()):
+            return None, {}
+
+        return data.get("folder_mtime_ns"), data.get("files", {})
+
+    def refresh(self) -> None:
+        """
+        Lists the input folder again if it has changed since the catalog was last saved.
+
+        Files whose size or modification time has changed lose their stored hash and details.
+
+        Returns:
+            None
+
+        Raises:
+            FileNotFoundError: If the input folder does not exist.
+        """
+        folder_mtime_ns = os.stat(self.shapes_path).st_mtime_ns
+
+        if folder_mtime_ns == self._folder_mtime_ns:
+            return
+
+        entries = {}
+
+        with os.scandir(self.shapes_path) as it:
+            for dir_entry in it:
+                if not dir_entry.is_file():
+                    continue
+
+                stat = dir_entry.stat()
+                entry = self._entries.get(dir_entry.name)
+
+                if entry is None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+                    entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+                entries[dir_entry.name] = entry
+
+        self._folder_mtime_ns = folder_mtime_ns
+        self._entries = entries
+        self._normcase_names = {os.path.normcase(name) for name in entries}
+        self._changed = True
+
+    def find(self, match_files: List[str], ignore_files: Optional[List[str]] = None) -> List[str]:
+        """
+        Finds the files in the input folder that match some patterns, but not others.
+
+        Gives the same result as `shapeio.find_directory_files` on the input folder.
+
+        Args:
+            match_files (List[str]): Glob-style patterns of the files to include, e.g. ["DB1s_*.s"].
+            ignore_files (Optional[List[str]], optional): Patterns of the files to leave out. Defaults to None.
+
+        Returns:
+            List[str]: The matching file names.
+        """
+        return [
+            name for name in self._entries
+            if any(fnmatch.fnmatch(name, x) for x in match_files)
+            and not any(fnmatch.fnmatch(name, x) for x in ignore_files or [])
+        ]
+
+    def exists(self, name: str) -> bool:
+        """
+        Checks whether a file is in the input folder.
+
+        Like `os.path.exists` this is case-insensitive on Windows.
+
+        Args:
+            name (str): The file name.
+
+        Returns:
+            bool: True if the file exists.
+        """
+        return os.path.normcase(name) in self._normcase_names
+
+    def entry(self, name: str) -> Optional[CatalogEntry]:
+        """
+        Looks up the stored hash and details of a shape in the input folder.
+
+        Nothing is read, so shapes that no script has read yet have no entry.
+
+        Args:
+            name (str): File name of the shape.
+
+        Returns:
+            Optional[CatalogEntry]: The hash and details of the shape, or None if they are not known.
+
+        Raises:
+            KeyError: If the shape is not in the input folder.
+        """
+        entry = self._entries[name]
+
+        if "sha256" not in entry or "prim_states" not in entry:
+            return None
+
+        return CatalogEntry(
+            name, entry["size"], entry["sha256"], entry["prim_states"],
+            entry["textures"], entry["num_vertices"], entry["num_triangles"]
+        )
+
+    def remember_hashes(self) -> None:
+        """
+        Passes the stored hashes of unchanged files on to `manifest.file_hash`.
+
+        Returns:
+            None
+        """
+        for name, entry in self._entries.items():
+            if "sha256" in entry:
+                manifest.remember_file_hash(self.shapes_path / name, entry["size"], entry["mtime_ns"], entry["sha256"])
+
+    def collect_hashes(self) -> None:
+        """
+        Stores the hashes of files in the input folder that `manifest.file_hash` calculated in this process.
+
+        Returns:
+            None
+        """
+        for name, entry in self._entries.items():
+            if "sha256" in entry:
+                continue
+
+            cached = manifest.cached_file_hash(self.shapes_path / name)
+
+            if cached is not None and cached[0] == entry["size"] and cached[1] == entry["mtime_ns"]:
+                entry["sha256"] = cached[2]
+                self._changed = True
+
+    def collect_details(self) -> None:
+        """
+        Stores the details of the shapes in the input folder that the pipeline read in this process.
+
+        See `pipeline.take_shape_details`.
+
+        Returns:
+            None
+        """
+        for name, entry in self._entries.items():
+            if "prim_states" in entry:
+                continue
+
+            cached = pipeline.cached_shape_details(self.shapes_path / name)
+
+            if cached is not None and cached[0] == entry["size"] and cached[1] == entry["mtime_ns"]:
+                entry.update(cached[2]._asdict())
+                self._changed = True
+
+    def save(self) -> None:
+        """
+        Writes the catalog file, if anything has changed.
+
+        Returns:
+            None
+        """
+        if not self._changed:
+            return
+
+        data = json.dumps({
+            "version": CATALOG_VERSION,
+            "folder": str(self.shapes_path.resolve()),
+            "folder_mtime_ns": self._folder_mtime_ns,
+            "files": self._entries,
+        }, indent=1, sort_keys=True)
+
+        os.makedirs(self.catalog_path.parent, exist_ok=True)
+        write_file_atomic(self.catalog_path, data.encode("utf-8"))
+
+        self._changed = False
+
+
+def open_input_catalog(config: configparser.ConfigParser) -> InputCatalog:
+    """
+    Opens the catalog of the input shapes folder configured in config.ini.
+
+    The catalog is stored at `catalog_path` in the [build] section, or in the
+    output shapes folder if that is not set. It is only opened and refreshed once
+    per process, and saved when the process exits.
+
+    Args:
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        InputCatalog: The refreshed input catalog.
+    """
+    shapes_path = Path(config["shapes"]["input_path"])
+    catalog_path = config.get("build", "catalog_path", fallback=None)
+
+    if catalog_path is None:
+        catalog_path = Path(config["shapes"]["output_path"]) / "dbtracks_extras_catalog.json"
+
+    key = str(Path(catalog_path).resolve())
+    input_catalog = _open_catalogs.get(key)
+
+    if input_catalog is None:
+        input_catalog = InputCatalog(Path(catalog_path), shapes_path, config)
+        input_catalog.refresh()
+        input_catalog.remember_hashes()
+        atexit.register(_save_on_exit, input_catalog)
+        _open_catalogs[key] = input_catalog
+
+    return input_catalog
+
+
+def _save_on_exit(input_catalog: InputCatalog) -> None:
+    # The folder listing and the hashes are worth keeping even if collecting something fails.
+    try:
+        input_catalog.collect_hashes()
+        input_catalog.collect_details()
+    finally:
+        input_catalog.save()
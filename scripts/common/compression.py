@@ -0,0 +1,251 @@
+"""
+This file is part of DBTracks Extras.
+
+Copyright (C) 2026 Peter Grønbæk Andersen <peter@grnbk.io>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import zlib
+import codecs
+import struct
+import tempfile
+import pyffeditc
+from pathlib import Path
+from typing import Callable, Optional
+
+
+SHAPE_CODECS = ("python", "ffeditc")
+
+_COMPRESSED_HEADER = "SIMISA@F"
+_UNCOMPRESSED_HEADER = "SIMISA@@@@@@@@@@"
+_TEXT_SUBHEADER = "JINX0s1t"
+
+
+class ShapeCodecError(Exception):
+    """Raised when a shape file cannot be handled by the pure-Python codec, e.g. binary shapes."""
+    pass
+
+
+def is_compressed(data: bytes) -> Optional[bool]:
+    """
+    Determines whether the contents of a file are compressed.
+
+    Args:
+        data (bytes): The contents of the file, or at least the first 34 bytes of it.
+
+    Returns:
+        bool:
+            - True if the data appears to be compressed.
+            - False if the data appears to be uncompressed (text format with a known header).
+            - None if the data does not match known headers.
+    """
+    if data.startswith(codecs.BOM_UTF16_LE):
+        header = data[2:34].decode("utf-16-le", errors="ignore")
+    else:
+        header = data[:16].decode("ascii", errors="ignore")
+
+    if header.startswith(_COMPRESSED_HEADER) or header.startswith("\r\n" + _COMPRESSED_HEADER):
+        return True
+
+    elif header.startswith("SIMISA@@") or header.startswith("\r\nSIMISA@@"):
+        return False
+
+    return None
+
+
+def decompress(data: bytes) -> bytes:
+    """
+    Decompresses the contents of a compressed text shape file.
+
+    The result has the same layout as the files written by `shapeio.dump`,
+    a UTF-16 text file with a BOM, so it can be parsed directly. Data that is
+    already uncompressed is returned unchanged.
+
+    Args:
+        data (bytes): The contents of the compressed file.
+
+    Returns:
+        bytes: The contents of the uncompressed file.
+
+    Raises:
+        ShapeCodecError: If the header is unknown, the zlib stream is invalid,
+            or the file contains a binary shape rather than a text shape.
+    """
+    compressed = is_compressed(data)
+
+    if compressed is None:
+        raise ShapeCodecError("Unknown file header, not an MSTS file")
+
+    if not compressed:
+        return data
+
+    # The 16 byte header is 'SIMISA@F', the uncompressed size and '@@@@'.
+    # It is followed by a zlib stream that holds the rest of the file.
+    if data.startswith(codecs.BOM_UTF16_LE):
+        stream = data[2 + 32:]
+    else:
+        stream = data[16:]
+
+    try:
+        payload = zlib.decompress(stream)
+    except zlib.error as e:
+        raise ShapeCodecError(f"Invalid compressed data: {e}") from e
+
+    if payload[1:2] == b"\x00":
+        encoding = "utf-16-le"
+    else:
+        encoding = "ascii"
+
+    subheader = payload[:16 if encoding == "ascii" else 32].decode(encoding, errors="ignore")
+
+    if not subheader.startswith(_TEXT_SUBHEADER):
+        raise ShapeCodecError(f"Unsupported subheader '{subheader.strip()}', only text shapes can be decompressed")
+
+    try:
+        text = payload.decode(encoding)
+    except UnicodeDecodeError as e:
+        raise ShapeCodecError(f"Unable to decode compressed text: {e}") from e
+
+    return codecs.BOM_UTF16_LE + (_UNCOMPRESSED_HEADER + text).encode("utf-16-le")
+
+
+def compress(data: bytes) -> bytes:
+    """
+    Compresses the contents of an uncompressed text shape file.
+
+    The text following the 'SIMISA@@@@@@@@@@' header is stored as an ASCII
+    zlib stream after a 'SIMISA@F' header, which is the layout read by MSTS
+    and Open Rails. Data that is already compressed is returned unchanged.
+
+    Args:
+        data (bytes): The contents of the uncompressed file, e.g. as written by `shapeio.dump`.
+
+    Returns:
+        bytes: The contents of the compressed file.
+
+    Raises:
+        ShapeCodecError: If the header is unknown, or the text cannot be stored as ASCII.
+    """
+    compressed = is_compressed(data)
+
+    if compressed is None:
+        raise ShapeCodecError("Unknown file header, not an MSTS file")
+
+    if compressed:
+        return data
+
+    if data.startswith(codecs.BOM_UTF16_LE):
+        text = data[2:].decode("utf-16-le")
+    else:
+        text = data.decode("ascii")
+
+    text = text[text.index("SIMISA@@"):]
+    text = text[len(_UNCOMPRESSED_HEADER):]
+
+    try:
+        payload = text.encode("ascii")
+    except UnicodeEncodeError as e:
+        raise ShapeCodecError(f"Shape text contains non-ASCII characters: {e}") from e
+
+    header = _COMPRESSED_HEADER.encode("ascii") + struct.pack("<I", len(payload)) + b"@@@@"
+
+    return header + zlib.compress(payload, 9)
+
+
+def decompress_data(
+    data: bytes,
+    ffeditc_path: Path,
+    shape_codec: str = "python"
+) -> bytes:
+    """
+    Decompresses the contents of a shape file in memory if they are compressed.
+
+    With the "python" codec the data is decompressed in-process, and ffeditc_unicode.exe
+    is only used as a fallback for files the pure-Python codec cannot handle.
+
+    Args:
+        data (bytes): The contents of the shape file.
+        ffeditc_path (Path): Path to the ffeditc_unicode.exe executable.
+        shape_codec (str, optional): Either "python" or "ffeditc". Defaults to "python".
+
+    Returns:
+        bytes: The contents of the uncompressed shape file.
+
+    Raises:
+        ValueError: If `shape_codec` is not a known codec.
+    """
+    if shape_codec not in SHAPE_CODECS:
+        raise ValueError(f"Unknown shape codec '{shape_codec}', choose one of {SHAPE_CODECS}")
+
+    if shape_codec == "python":
+        try:
+            return decompress(data)
+        except ShapeCodecError:
+            pass
+
+    return _run_ffeditc(pyffeditc.decompress, data, ffeditc_path)
+
+
+def compress_data(
+    data: bytes,
+    ffeditc_path: Path,
+    shape_codec: str = "python"
+) -> bytes:
+    """
+    Compresses the contents of a shape file in memory if they are not already compressed.
+
+    With the "python" codec the data is compressed in-process, and ffeditc_unicode.exe
+    is only used as a fallback for files the pure-Python codec cannot handle.
+
+    Args:
+        data (bytes): The contents of the shape file.
+        ffeditc_path (Path): Path to the ffeditc_unicode.exe executable.
+        shape_codec (str, optional): Either "python" or "ffeditc". Defaults to "python".
+
+    Returns:
+        bytes: The contents of the compressed shape file.
+
+    Raises:
+        ValueError: If `shape_codec` is not a known codec.
+    """
+    if shape_codec not in SHAPE_CODECS:
+        raise ValueError(f"Unknown shape codec '{shape_codec}', choose one of {SHAPE_CODECS}")
+
+    if shape_codec == "python":
+        try:
+            return compress(data)
+        except ShapeCodecError:
+            pass
+
+    return _run_ffeditc(pyffeditc.compress, data, ffeditc_path)
+
+
+def _run_ffeditc(
+    ffeditc_func: Callable[[Path, Path], bool],
+    data: bytes,
+    ffeditc_path: Path
+) -> bytes:
+    # ffeditc_unicode.exe only works on files, so the data takes a detour
+    # through a temporary file that is modified in place.
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir) / "temp.s"
+
+        with open(temp_path, "wb") as f:
+            f.write(data)
+
+        ffeditc_func(ffeditc_path, temp_path)
+
+        with open(temp_path, "rb") as f:
+            return f.read()
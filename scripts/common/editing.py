@@ -0,0 +1,562 @@
+"""
+This file is part of DBTracks Extras.
+
+Copyright (C) 2026 Peter Grønbæk Andersen <peter@grnbk.io>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+from typing import Dict, List, NamedTuple, Tuple
+from shapeio.shape import Shape
+
+
+class PrimitiveArrays:
+    """
+    A view of the vertices of a primitive as NumPy arrays, for editing many vertices at once.
+
+    The points, UV points and normals used by the primitive are each gathered once,
+    so data shared by several vertices also appears only once in the arrays. The
+    `vertex_*` arrays map each vertex to its row in those arrays. Edit the arrays in
+    place and call `write_back` to apply the changes to the shape.
+
+    Vertices are in the order they are first used by the trilist, the same order
+    as `primitive.vertices()`.
+
+    Args:
+        primitive (_PrimitiveEditor): The primitive to view.
+
+    Attributes:
+        vertex_idxs (np.ndarray): Index of each vertex in the parent sub_object, shape (V,).
+        triangles (np.ndarray): The vertices of each triangle as rows into the vertex arrays, shape (T, 3).
+        point_idxs (np.ndarray): Index of each point in the shape's points, shape (P,).
+        points (np.ndarray): XYZ of each point, shape (P, 3).
+        vertex_points (np.ndarray): Row in `points` of each vertex, shape (V,).
+        uv_point_idxs (np.ndarray): Index of each UV point in the shape's uv_points, shape (U,).
+        uv_points (np.ndarray): UV of each UV point, shape (U, 2).
+        vertex_uv_points (np.ndarray): Row in `uv_points` of each vertex, or -1 if it has none, shape (V,).
+        normal_idxs (np.ndarray): Index of each normal in the shape's normals, shape (N,).
+        normals (np.ndarray): XYZ of each normal, shape (N, 3).
+        vertex_normals (np.ndarray): Row in `normals` of each vertex, shape (V,).
+    """
+
+    def __init__(self, primitive):
+        # Same path to the shape as shapeedit's vertex editor uses.
+        self._shape = primitive._parent._parent._parent._parent._shape
+        sub_object = primitive._parent._sub_object
+
+        triangle_vertex_idxs = _triangle_vertex_idxs(primitive._primitive.indexed_trilist)
+
+        self.vertex_idxs, vertex_rows = _unique_in_order(triangle_vertex_idxs)
+        self.triangles = vertex_rows.reshape(-1, 3)
+
+        vertices = [sub_object.vertices[idx] for idx in self.vertex_idxs]
+
+        self.point_idxs, self.vertex_points = _unique_in_order([v.point_index for v in vertices])
+        self.uv_point_idxs, self.vertex_uv_points = _unique_in_order([
+            v.vertex_uvs[0] if v.vertex_uvs else -1 for v in vertices
+        ])
+        self.normal_idxs, self.vertex_normals = _unique_in_order([v.normal_index for v in vertices])
+
+        points = self._shape.points
+        uv_points = self._shape.uv_points
+        normals = self._shape.normals
+
+        self.points = np.array([(points[i].x, points[i].y, points[i].z) for i in self.point_idxs], dtype=np.float64).reshape(-1, 3)
+        self.uv_points = np.array([(uv_points[i].u, uv_points[i].v) for i in self.uv_point_idxs], dtype=np.float64).reshape(-1, 2)
+        self.normals = np.array([(normals[i].x, normals[i].y, normals[i].z) for i in self.normal_idxs], dtype=np.float64).reshape(-1, 3)
+
+        self._original_points = self.points.copy()
+        self._original_uv_points = self.uv_points.copy()
+        self._original_normals = self.normals.copy()
+
+    def first_vertex_of_point(self) -> np.ndarray:
+        """
+        Marks the first vertex that uses each point.
+
+        Useful to apply per-vertex changes only once per point, like a loop over
+        `primitive.vertices()` does when it moves a point that later vertices share.
+
+        Returns:
+            np.ndarray: A boolean mask over the vertices, shape (V,).
+        """
+        mask = np.zeros(len(self.vertex_points), dtype=bool)
+        mask[np.unique(self.vertex_points, return_index=True)[1]] = True
+        return mask
+
+    def triangles_with_vertices(self, vertex_mask: np.ndarray) -> np.ndarray:
+        """
+        Marks the triangles that include at least one of the selected vertices.
+
+        Args:
+            vertex_mask (np.ndarray): Boolean mask over the vertices, shape (V,).
+
+        Returns:
+            np.ndarray: A boolean mask over the triangles, shape (T,).
+        """
+        return np.asarray(vertex_mask, dtype=bool)[self.triangles].any(axis=1)
+
+    def write_back(self) -> int:
+        """
+        Applies the edited arrays to the points, UV points and normals of the shape.
+
+        Only the rows that were changed are written. The objects in the shape are
+        changed in place, so other vertices that share them also see the change,
+        the same as setting e.g. `vertex.point.x` directly.
+
+        Returns:
+            int: The number of points, UV points and normals that were changed.
+        """
+        num_changed = 0
+
+        for row in _changed_rows(self.points, self._original_points):
+            point = self._shape.points[self.point_idxs[row]]
+            point.x, point.y, point.z = (float(x) for x in self.points[row])
+            num_changed += 1
+
+        for row in _changed_rows(self.uv_points, self._original_uv_points):
+            uv_point = self._shape.uv_points[self.uv_point_idxs[row]]
+            uv_point.u, uv_point.v = (float(x) for x in self.uv_points[row])
+            num_changed += 1
+
+        for row in _changed_rows(self.normals, self._original_normals):
+            normal = self._shape.normals[self.normal_idxs[row]]
+            normal.x, normal.y, normal.z = (float(x) for x in self.normals[row])
+            num_changed += 1
+
+        self._original_points = self.points.copy()
+        self._original_uv_points = self.uv_points.copy()
+        self._original_normals = self.normals.copy()
+
+        return num_changed
+
+
+def remove_triangles_where(primitive, triangle_mask: np.ndarray) -> int:
+    """
+    Removes the triangles of a primitive that are selected by a mask.
+
+    Args:
+        primitive (_PrimitiveEditor): The primitive to remove triangles from.
+        triangle_mask (np.ndarray): Boolean mask over the triangles of the primitive,
+            e.g. computed from `PrimitiveArrays.triangles`.
+
+    Returns:
+        int: The number of removed triangles.
+    """
+    triangles_to_remove = set(np.nonzero(triangle_mask)[0].tolist())
+
+    if not triangles_to_remove:
+        return 0
+
+    _remove_triangles(primitive, triangles_to_remove)
+
+    return len(triangles_to_remove)
+
+
+def compact_geometry(trackshape: Shape) -> int:
+    """
+    Removes vertices, points, UV points and normals of a shape that nothing refers to any more.
+
+    Removing triangles leaves their vertices in the sub_object, and their points, UV
+    points and normals in the shape. This drops everything that is no longer used by a
+    triangle, directly or through a vertex, and changes all indices to match. Vertex
+    sets are shrunk to the vertices they still contain. Everything that is kept stays
+    in the same order.
+
+    Args:
+        trackshape (Shape): The shape to compact.
+
+    Returns:
+        int: The number of vertices, points, UV points and normals that were removed.
+    """
+    sub_objects = _sub_objects(trackshape)
+
+    point_used = np.zeros(len(trackshape.points), dtype=bool)
+    uv_point_used = np.zeros(len(trackshape.uv_points), dtype=bool)
+    normal_used = np.zeros(len(trackshape.normals), dtype=bool)
+    num_removed = 0
+
+    for sub_object in sub_objects:
+        vertex_used = np.zeros(len(sub_object.vertices), dtype=bool)
+
+        for primitive in sub_object.primitives:
+            indexed_trilist = primitive.indexed_trilist
+            vertex_used[_triangle_vertex_idxs(indexed_trilist).reshape(-1)] = True
+            _mark_used(normal_used, [x.index for x in indexed_trilist.normal_idxs])
+
+        num_removed += _compact_vertices(sub_object, vertex_used)
+
+        _mark_used(point_used, [v.point_index for v in sub_object.vertices])
+        _mark_used(normal_used, [v.normal_index for v in sub_object.vertices])
+        _mark_used(uv_point_used, [idx for v in sub_object.vertices for idx in v.vertex_uvs])
+
+    point_remap = _compact_remap(point_used)
+    uv_point_remap = _compact_remap(uv_point_used)
+    normal_remap = _compact_remap(normal_used)
+
+    for sub_object in sub_objects:
+        for vertex in sub_object.vertices:
+            vertex.point_index = _remapped(point_remap, vertex.point_index)
+            vertex.normal_index = _remapped(normal_remap, vertex.normal_index)
+            vertex.vertex_uvs = [_remapped(uv_point_remap, idx) for idx in vertex.vertex_uvs]
+
+        for primitive in sub_object.primitives:
+            for normal_idx in primitive.indexed_trilist.normal_idxs:
+                normal_idx.index = _remapped(normal_remap, normal_idx.index)
+
+    trackshape.points[:] = [x for x, used in zip(trackshape.points, point_used) if used]
+    trackshape.uv_points[:] = [x for x, used in zip(trackshape.uv_points, uv_point_used) if used]
+    trackshape.normals[:] = [x for x, used in zip(trackshape.normals, normal_used) if used]
+
+    num_removed += int((~point_used).sum() + (~uv_point_used).sum() + (~normal_used).sum())
+
+    return num_removed
+
+
+class PruneStats(NamedTuple):
+    """
+    What `prune_unused_states` removed from a shape, or from several shapes added together.
+
+    Attributes:
+        primitives (int): Number of removed primitives without triangles.
+        prim_states (int): Number of removed prim_states.
+        vtx_states (int): Number of removed vtx_states.
+        textures (int): Number of removed textures.
+        images (int): Number of removed images.
+        shader_names (int): Number of removed shader names.
+    """
+    primitives: int = 0
+    prim_states: int = 0
+    vtx_states: int = 0
+    textures: int = 0
+    images: int = 0
+    shader_names: int = 0
+
+    def plus(self, other: "PruneStats") -> "PruneStats":
+        """
+        Adds the counts of two `PruneStats` together.
+
+        Args:
+            other (PruneStats): The counts to add.
+
+        Returns:
+            PruneStats: The sum of both counts.
+        """
+        return PruneStats(*(a + b for a, b in zip(self, other)))
+
+    def describe(self) -> str:
+        """
+        Describes how much was removed.
+
+        Returns:
+            str: E.g. "removed 2 primitives, 2 prim_states, ...".
+        """
+        return "removed " + ", ".join(f"{count} {name}" for name, count in self._asdict().items())
+
+
+def prune_unused_states(trackshape: Shape) -> PruneStats:
+    """
+    Removes primitives without triangles, and the states and materials nothing uses any more.
+
+    Primitives are removed from their sub_object and geometry node first. Then the
+    prim_states no primitive uses are removed, followed by the vtx_states, textures,
+    shader names and images that are used by neither a remaining prim_state, a vertex
+    set, a texture nor a sub_object. All indices are changed to match, and everything
+    that is kept stays in the same order.
+
+    Args:
+        trackshape (Shape): The shape to prune.
+
+    Returns:
+        PruneStats: How much was removed.
+    """
+    sub_objects = _sub_objects(trackshape)
+    num_primitives = sum(_remove_empty_primitives(sub_object) for sub_object in sub_objects)
+
+    prim_state_used = np.zeros(len(trackshape.prim_states), dtype=bool)
+    _mark_used(prim_state_used, [p.prim_state_index for so in sub_objects for p in so.primitives])
+    prim_states = [x for x, used in zip(trackshape.prim_states, prim_state_used) if used]
+
+    vtx_state_used = np.zeros(len(trackshape.vtx_states), dtype=bool)
+    _mark_used(vtx_state_used, [x.vtx_state_index for x in prim_states])
+    _mark_used(vtx_state_used, [x.vtx_state for so in sub_objects for x in so.vertex_sets])
+
+    texture_used = np.zeros(len(trackshape.textures), dtype=bool)
+    _mark_used(texture_used, [idx for x in prim_states for idx in x.texture_indices])
+
+    image_used = np.zeros(len(trackshape.images), dtype=bool)
+    _mark_used(image_used, [x.image_index for x, used in zip(trackshape.textures, texture_used) if used])
+
+    shader_used = np.zeros(len(trackshape.shader_names), dtype=bool)
+    _mark_used(shader_used, [x.shader_index for x in prim_states])
+
+    prim_state_remap = _compact_remap(prim_state_used)
+    vtx_state_remap = _compact_remap(vtx_state_used)
+    texture_remap = _compact_remap(texture_used)
+    image_remap = _compact_remap(image_used)
+    shader_remap = _compact_remap(shader_used)
+
+    for sub_object in sub_objects:
+        sub_object_shaders = set(trackshape.prim_states[p.prim_state_index].shader_index for p in sub_object.primitives)
+        header = sub_object.sub_object_header
+        header.subobject_shaders = [_remapped(shader_remap, idx) for idx in header.subobject_shaders if idx in sub_object_shaders]
+
+        for primitive in sub_object.primitives:
+            primitive.prim_state_index = _remapped(prim_state_remap, primitive.prim_state_index)
+
+        for vertex_set in sub_object.vertex_sets:
+            vertex_set.vtx_state = _remapped(vtx_state_remap, vertex_set.vtx_state)
+
+    for prim_state in prim_states:
+        prim_state.vtx_state_index = _remapped(vtx_state_remap, prim_state.vtx_state_index)
+        prim_state.texture_indices = [_remapped(texture_remap, idx) for idx in prim_state.texture_indices]
+        prim_state.shader_index = _remapped(shader_remap, prim_state.shader_index)
+
+    for texture in trackshape.textures:
+        texture.image_index = _remapped(image_remap, texture.image_index)
+
+    trackshape.prim_states[:] = prim_states
+    trackshape.vtx_states[:] = [x for x, used in zip(trackshape.vtx_states, vtx_state_used) if used]
+    trackshape.textures[:] = [x for x, used in zip(trackshape.textures, texture_used) if used]
+    trackshape.images[:] = [x for x, used in zip(trackshape.images, image_used) if used]
+    trackshape.shader_names[:] = [x for x, used in zip(trackshape.shader_names, shader_used) if used]
+
+    return PruneStats(
+        primitives=num_primitives,
+        prim_states=int((~prim_state_used).sum()),
+        vtx_states=int((~vtx_state_used).sum()),
+        textures=int((~texture_used).sum()),
+        images=int((~image_used).sum()),
+        shader_names=int((~shader_used).sum()),
+    )
+
+
+def replace_texture_images(trackshape: Shape, replacements: Dict[str, str]) -> Dict[str, int]:
+    """
+    Replaces texture images of a shape according to a mapping, in a single pass over the images.
+
+    Images are matched against the whole name and case-insensitively, like
+    `ShapeEditor.replace_texture_image` does. Unlike a series of those calls, each
+    image is replaced at most once, so a replacement is never replaced again.
+
+    When several images end up with the same name, e.g. because two old names map to
+    the same new one, they are merged into one image. Textures that then become the
+    same are merged as well, and the prim_states are changed to use the merged textures.
+
+    Args:
+        trackshape (Shape): The shape to modify.
+        replacements (Dict[str, str]): The new image for each old image.
+
+    Returns:
+        Dict[str, int]: For each old image in `replacements`, the number of images that
+            were replaced. Old images that are not in the shape have a count of 0.
+    """
+    new_images = {old_image.lower(): new_image for old_image, new_image in replacements.items()}
+    num_replaced = {old_image.lower(): 0 for old_image in replacements}
+    replaced = []
+
+    for idx, image in enumerate(trackshape.images):
+        new_image = new_images.get(image.lower())
+
+        if new_image is not None:
+            trackshape.images[idx] = new_image
+            num_replaced[image.lower()] += 1
+            replaced.append(idx)
+
+    if replaced:
+        _merge_replaced_images(trackshape, replaced)
+
+    return {old_image: num_replaced[old_image.lower()] for old_image in replacements}
+
+
+def _merge_replaced_images(trackshape: Shape, replaced: List[int]) -> None:
+    # Only images with the same name as a replaced image are merged, so duplicates
+    # that were already in the shape are left as they are.
+    merged_names = {trackshape.images[idx].lower() for idx in replaced}
+
+    image_rows = {}
+    image_remap = []
+    images = []
+
+    for image in trackshape.images:
+        key = image.lower() if image.lower() in merged_names else len(image_remap)
+
+        if key not in image_rows:
+            image_rows[key] = len(images)
+            images.append(image)
+
+        image_remap.append(image_rows[key])
+
+    if len(images) == len(trackshape.images):
+        return
+
+    merged_images = {image_rows[name] for name in merged_names}
+
+    texture_rows = {}
+    texture_remap = []
+    textures = []
+
+    for texture in trackshape.textures:
+        texture.image_index = image_remap[texture.image_index]
+
+        if texture.image_index in merged_images:
+            key = (texture.image_index, texture.filter_mode, texture.mipmap_lod_bias, texture.border_colour)
+        else:
+            key = len(texture_remap)
+
+        if key not in texture_rows:
+            texture_rows[key] = len(textures)
+            textures.append(texture)
+
+        texture_remap.append(texture_rows[key])
+
+    trackshape.images[:] = images
+    trackshape.textures[:] = textures
+
+    for prim_state in trackshape.prim_states:
+        prim_state.texture_indices = [texture_remap[idx] for idx in prim_state.texture_indices]
+
+
+def _unique_in_order(values) -> Tuple[np.ndarray, np.ndarray]:
+    # Unique non-negative values in order of first appearance, and the row of each
+    # value among them. Negative values (missing references) map to row -1.
+    values = np.asarray(values, dtype=int).reshape(-1)
+    is_valid = values >= 0
+
+    unique_values, first_uses, rows = np.unique(values[is_valid], return_index=True, return_inverse=True)
+    order = np.argsort(first_uses, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+
+    value_rows = np.full(len(values), -1, dtype=int)
+    value_rows[is_valid] = rank[rows.reshape(-1)]
+
+    return unique_values[order], value_rows
+
+
+def _changed_rows(array: np.ndarray, original: np.ndarray) -> np.ndarray:
+    return np.nonzero((array != original).any(axis=1))[0]
+
+
+def _sub_objects(trackshape: Shape) -> List:
+    return [
+        sub_object
+        for lod_control in trackshape.lod_controls
+        for distance_level in lod_control.distance_levels
+        for sub_object in distance_level.sub_objects
+    ]
+
+
+def _triangle_vertex_idxs(indexed_trilist) -> np.ndarray:
+    return np.array([
+        (x.vertex1_index, x.vertex2_index, x.vertex3_index)
+        for x in indexed_trilist.vertex_idxs
+    ], dtype=int).reshape(-1, 3)
+
+
+def _mark_used(used: np.ndarray, idxs: List[int]) -> None:
+    # Negative indices are missing references, which do not use anything.
+    idxs = np.asarray(idxs, dtype=int)
+    used[idxs[idxs >= 0]] = True
+
+
+def _compact_remap(used: np.ndarray) -> np.ndarray:
+    # New index of each used row once the unused rows are removed.
+    return np.cumsum(used) - 1
+
+
+def _remapped(remap: np.ndarray, idx: int) -> int:
+    return int(remap[idx]) if idx >= 0 else idx
+
+
+def _compact_vertices(sub_object, vertex_used: np.ndarray) -> int:
+    if vertex_used.all():
+        return 0
+
+    vertex_remap = _compact_remap(vertex_used)
+
+    for primitive in sub_object.primitives:
+        for x in primitive.indexed_trilist.vertex_idxs:
+            x.vertex1_index = int(vertex_remap[x.vertex1_index])
+            x.vertex2_index = int(vertex_remap[x.vertex2_index])
+            x.vertex3_index = int(vertex_remap[x.vertex3_index])
+
+    for vertex_set in sub_object.vertex_sets:
+        start_idx = vertex_set.vtx_start_index
+        end_idx = start_idx + vertex_set.vtx_count
+        vertex_set.vtx_start_index = int(vertex_used[:start_idx].sum())
+        vertex_set.vtx_count = int(vertex_used[start_idx:end_idx].sum())
+
+    sub_object.vertices[:] = [x for x, used in zip(sub_object.vertices, vertex_used) if used]
+
+    return int((~vertex_used).sum())
+
+
+def _remove_triangles(primitive, triangle_idxs: set) -> None:
+    indexed_trilist = primitive._primitive.indexed_trilist
+
+    keep = [
+        tri_idx not in triangle_idxs
+        for tri_idx in range(len(indexed_trilist.vertex_idxs))
+    ]
+
+    indexed_trilist.vertex_idxs[:] = [x for x, k in zip(indexed_trilist.vertex_idxs, keep) if k]
+    indexed_trilist.normal_idxs[:] = [x for x, k in zip(indexed_trilist.normal_idxs, keep) if k]
+    indexed_trilist.flags[:] = [x for x, k in zip(indexed_trilist.flags, keep) if k]
+
+    # Same bookkeeping as shapeedit does after removing triangles.
+    primitive._parent._sub_object_helper.update_geometry_info()
+
+
+def _remove_empty_primitives(sub_object) -> int:
+    geometry_info = sub_object.sub_object_header.geometry_info
+    primitives = sub_object.primitives
+
+    # The primitives of a sub_object are grouped by geometry node, in order.
+    node_primitives = []
+    start_idx = 0
+
+    for geometry_node in geometry_info.geometry_nodes:
+        end_idx = start_idx + geometry_node.cullable_prims.num_prims
+        node_primitives.append((geometry_node, list(range(start_idx, min(end_idx, len(primitives))))))
+        start_idx = end_idx
+
+    is_empty = [False] * len(primitives)
+    num_removed = 0
+
+    for geometry_node, primitive_idxs in node_primitives:
+        empty_idxs = [idx for idx in primitive_idxs if not primitives[idx].indexed_trilist.vertex_idxs]
+
+        for idx in empty_idxs:
+            is_empty[idx] = True
+
+        _decrease_primitive_counts(geometry_node, geometry_node.cullable_prims.num_prims, len(empty_idxs))
+        geometry_node.cullable_prims.num_prims -= len(empty_idxs)
+        num_removed += len(empty_idxs)
+
+    if not num_removed:
+        return 0
+
+    _decrease_primitive_counts(geometry_info, len(primitives), num_removed)
+    primitives[:] = [x for x, empty in zip(primitives, is_empty) if not empty]
+
+    return num_removed
+
+
+def _decrease_primitive_counts(counts, num_primitives: int, num_removed: int) -> None:
+    # Not all shapes count one of these per primitive, so only the counts that
+    # match the number of primitives are changed.
+    for name in ("tx_light_cmds", "trilists"):
+        if getattr(counts, name) == num_primitives:
+            setattr(counts, name, num_primitives - num_removed)
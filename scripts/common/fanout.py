@@ -0,0 +1,112 @@
+"""
+This file is part of DBTracks Extras.
+
+Copyright (C) 2026 Peter Grønbæk Andersen <peter@grnbk.io>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import configparser
+from collections import OrderedDict
+from typing import List, Tuple
+
+from . import pipeline
+from .jobs import ShapeJob, load_script
+
+
+# Scripts run by run_all.py that create variants of the same DB1s source shapes. Their
+# `process_trackshape` functions only take the shape itself, so one parsed source can be
+# shared between them.
+FANOUT_SCRIPTS = [
+    "scripts/DBxb/convert_db1s_to_db1b.py",
+    "scripts/DBxb/convert_db1s_to_db2b.py",
+    "scripts/DBxb/convert_db1s_to_db10b.py",
+    "scripts/DBxb/convert_db1s_to_db20b.py",
+    "scripts/DBxb/convert_db1s_to_db22b.py",
+    "scripts/DBxfb/convert_db1s_to_db1fb.py",
+    "scripts/DBxfb/convert_db1s_to_db2fb.py",
+    "scripts/DBxfb/convert_db1s_to_db10fb.py",
+    "scripts/DBxfb/convert_db1s_to_db20fb.py",
+    "scripts/DBxfb/convert_db1s_to_db22fb.py",
+    "scripts/DBxfbTun/convert_db1s_to_db1fbtun.py",
+    "scripts/DBxfbTun/convert_db1s_to_db2fbtun.py",
+]
+
+
+def group_jobs_by_source(
+    script_jobs: List[Tuple[str, ShapeJob]]
+) -> List[List[Tuple[str, ShapeJob]]]:
+    """
+    Groups the jobs of the fan-out scripts by their source shape.
+
+    Jobs of other scripts are returned as groups containing only that job.
+    The order of the groups follows the first appearance of each source shape.
+
+    Args:
+        script_jobs (List[Tuple[str, ShapeJob]]): Pairs of script path and job.
+
+    Returns:
+        List[List[Tuple[str, ShapeJob]]]: The groups of jobs.
+    """
+    groups = OrderedDict()
+
+    for script_path, job in script_jobs:
+        if script_path in FANOUT_SCRIPTS:
+            key = ("fanout", str(job.shape_path))
+        else:
+            key = (script_path, str(job.new_shape_path))
+
+        groups.setdefault(key, []).append((script_path, job))
+
+    return list(groups.values())
+
+
+def run_fanout_group(
+    group: List[Tuple[str, ShapeJob]],
+    config: configparser.ConfigParser
+) -> None:
+    """
+    Creates the .s and .sd files of all jobs sharing the same DB1s source shape.
+
+    The source shape is loaded once and every script's `process_trackshape`
+    is applied to its own clone of it. Scripts that define `texture_only_replacements`
+    skip that for shapes that only need their textures swapped.
+
+    Args:
+        group (List[Tuple[str, ShapeJob]]): Pairs of script path and job, all with the same source shape.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: If the jobs do not share the same source shape.
+    """
+    shape_path = group[0][1].shape_path
+
+    if any(job.shape_path != shape_path for _, job in group):
+        raise ValueError("All jobs in a fan-out group must have the same source shape")
+
+    variants = []
+
+    for script_path, job in group:
+        module = load_script(script_path)
+        variants.append((job, module.process_trackshape, getattr(module, "texture_only_replacements", None)))
+
+    # Process .s files
+    pipeline.make_shape_variants(shape_path, variants, config)
+
+    # Process .sd files
+    for _, job in group:
+        pipeline.make_sd(job)
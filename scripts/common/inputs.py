@@ -0,0 +1,117 @@
+"""
+This file is part of DBTracks Extras.
+
+Copyright (C) 2026 Peter Grønbæk Andersen <peter@grnbk.io>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import json
+import fnmatch
+import hashlib
+from pathlib import PureWindowsPath
+from typing import List, Tuple
+
+from .jobs import load_script
+
+
+class InputSelection:
+    """
+    The files in the input folders that a set of conversion scripts reads.
+
+    A shape is selected if its name matches the `MATCH_FILES` but not the `IGNORE_FILES`
+    of one of the scripts, or the `CHECKED_FILES` that a script looks for to skip shapes
+    that already exist. The `.sd` file of a selected shape is selected along with it.
+    Textures are selected by the `INPUT_TEXTURES` of the scripts. File names are matched
+    the same way as `shapeio.find_directory_files` does.
+
+    Args:
+        shape_patterns (List[Tuple[List[str], List[str]]]): Pairs of match and ignore patterns for shape file names.
+        texture_patterns (List[str]): Patterns for texture file names.
+    """
+
+    def __init__(self, shape_patterns: List[Tuple[List[str], List[str]]], texture_patterns: List[str]):
+        self.shape_patterns = shape_patterns
+        self.texture_patterns = texture_patterns
+
+    def selects(self, member_name: str) -> bool:
+        """
+        Checks whether an archive member is read by any of the scripts.
+
+        Args:
+            member_name (str): Name of the member inside the archive, with or without folders.
+
+        Returns:
+            bool: True if the member should be extracted.
+        """
+        filename = PureWindowsPath(member_name).name
+
+        if filename.lower().endswith(".sd"):
+            filename = filename[:-1]
+
+        if filename.lower().endswith(".s"):
+            return any(
+                _matches_any(filename, match_files) and not _matches_any(filename, ignore_files)
+                for match_files, ignore_files in self.shape_patterns
+            )
+
+        return _matches_any(filename, self.texture_patterns)
+
+    def key(self) -> str:
+        """
+        Identifies the selection, to tell whether files were extracted with the same selection before.
+
+        Returns:
+            str: Hex digest of the patterns.
+        """
+        data = json.dumps([self.shape_patterns, self.texture_patterns], sort_keys=True)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def script_inputs(script_paths: List[str]) -> InputSelection:
+    """
+    Collects the files that some conversion scripts read from the input folders.
+
+    Args:
+        script_paths (List[str]): Paths of the scripts, e.g. "scripts/DBxb/convert_db1s_to_db1b.py".
+
+    Returns:
+        InputSelection: The files read by any of the scripts.
+
+    Raises:
+        FileNotFoundError: If one of the scripts does not exist.
+        AttributeError: If one of the scripts does not define `MATCH_FILES` and `IGNORE_FILES`.
+    """
+    shape_patterns = []
+    texture_patterns = []
+
+    for script_path in script_paths:
+        module = load_script(script_path)
+
+        for name in ("MATCH_FILES", "IGNORE_FILES"):
+            if not hasattr(module, name):
+                raise AttributeError(f"Script '{script_path}' does not define '{name}'")
+
+        shape_patterns.append((list(module.MATCH_FILES), list(module.IGNORE_FILES)))
+
+        if hasattr(module, "CHECKED_FILES"):
+            shape_patterns.append((list(module.CHECKED_FILES), []))
+
+        texture_patterns.extend(getattr(module, "INPUT_TEXTURES", []))
+
+    return InputSelection(shape_patterns, sorted(set(texture_patterns)))
+
+
+def _matches_any(filename: str, patterns: List[str]) -> bool:
+    return any(fnmatch.fnmatch(filename, pattern) for pattern in patterns)
@@ -0,0 +1,241 @@
+"""
+This file is part of DBTracks Extras.
+
+Copyright (C) 2026 Peter Grønbæk Andersen <peter@grnbk.io>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import sys
+import traceback
+import configparser
+import importlib.util
+from pathlib import Path
+from types import ModuleType
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+class ShapeJob(NamedTuple):
+    """
+    A single shape to create by one of the conversion scripts.
+
+    Attributes:
+        shape_path (Path): Path of the source `.s` file in the input folder.
+        new_shape_path (Path): Path of the `.s` file to create in the output folder.
+    """
+    shape_path: Path
+    new_shape_path: Path
+
+
+# The conversion scripts run by run_all.py, in order.
+SCRIPTS = [
+    "scripts/DBxb/convert_db1s_to_db1b.py",
+    "scripts/DBxb/convert_db1s_to_db2b.py",
+    "scripts/DBxb/convert_db1s_to_db10b.py",
+    "scripts/DBxb/convert_db1s_to_db20b.py",
+    "scripts/DBxb/convert_db1s_to_db22b.py",
+    "scripts/DBxfb/convert_db1s_to_db1fb.py",
+    "scripts/DBxfb/convert_db1s_to_db2fb.py",
+    "scripts/DBxfb/convert_db1s_to_db10fb.py",
+    "scripts/DBxfb/convert_db1s_to_db20fb.py",
+    "scripts/DBxfb/convert_db1s_to_db22fb.py",
+    "scripts/DBxfbTun/convert_db1s_to_db1fbtun.py",
+    "scripts/DBxfbTun/convert_db1s_to_db2fbtun.py",
+    "scripts/V4hs1t_RKL/convert_db1z1t_to_v4hs1trkl.py",
+    "scripts/Xover7_5d/make_ohw_xover7_5d.py",
+]
+
+_loaded_scripts: Dict[str, ModuleType] = {}
+_worker_config: Optional[configparser.ConfigParser] = None
+
+
+def load_config(config_path: str = "scripts/config.ini") -> configparser.ConfigParser:
+    """
+    Reads the configuration file shared by all scripts.
+
+    Args:
+        config_path (str, optional): Path of the config file. Defaults to "scripts/config.ini".
+
+    Returns:
+        configparser.ConfigParser: The parsed configuration.
+    """
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    return config
+
+
+def load_script(script_path: str) -> ModuleType:
+    """
+    Imports a conversion script as a module without running its `__main__` block.
+
+    Each script is only imported once per process.
+
+    Args:
+        script_path (str): Path of the script, e.g. "scripts/DBxb/convert_db1s_to_db1b.py".
+
+    Returns:
+        ModuleType: The imported script module.
+
+    Raises:
+        FileNotFoundError: If the script does not exist.
+        AttributeError: If the script does not define `make_jobs` and `run_job`.
+    """
+    if script_path in _loaded_scripts:
+        return _loaded_scripts[script_path]
+
+    if not Path(script_path).is_file():
+        raise FileNotFoundError(f"No such script: '{script_path}'")
+
+    module_name = "dbtracks_extras_" + Path(script_path).stem
+    spec = importlib.util.spec_from_file_location(module_name, script_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+
+    for function_name in ("make_jobs", "run_job"):
+        if not hasattr(module, function_name):
+            raise AttributeError(f"Script '{script_path}' does not define '{function_name}'")
+
+    _loaded_scripts[script_path] = module
+    return module
+
+
+def run_script_jobs(
+    script_path: str,
+    make_jobs: Callable[[configparser.ConfigParser], List[ShapeJob]],
+    run_job: Callable[[ShapeJob, configparser.ConfigParser], None],
+    process_trackshape: Callable,
+    config: configparser.ConfigParser,
+    job_dependencies: Optional[Callable] = None
+) -> None:
+    """
+    Runs the jobs of a conversion script one after another, as done when the script is run by itself.
+
+    Jobs whose outputs are unchanged since the last run are skipped, see `manifest`.
+    The stage report is printed when all jobs are done.
+
+    Args:
+        script_path (str): Path of the script.
+        make_jobs (Callable[[configparser.ConfigParser], List[ShapeJob]]): The `make_jobs` function of the script.
+        run_job (Callable[[ShapeJob, configparser.ConfigParser], None]): The `run_job` function of the script.
+        process_trackshape (Callable): The `process_trackshape` function of the script.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+        job_dependencies (Optional[Callable], optional): The `job_dependencies` function of the
+            script, if it defines one, see `manifest.JobDependencies`. Defaults to None.
+
+    Returns:
+        None
+    """
+    from . import manifest, pipeline
+
+    jobs = make_jobs(config)
+
+    with manifest.open_manifest(config) as build_manifest:
+        for idx, job in enumerate(jobs):
+            record = manifest.job_record(script_path, process_trackshape, job, config, job_dependencies)
+
+            if build_manifest.is_up_to_date(record):
+                print(f"\tSkipping {job.new_shape_path.name}, unchanged since the last run...")
+                continue
+
+            print(f"\tCreating {job.new_shape_path.name} ({idx + 1} of {len(jobs)})...")
+            run_job(job, config)
+            build_manifest.update(record)
+
+    pipeline.print_stage_report()
+
+
+def _init_worker(config_path: str):
+    global _worker_config
+    _worker_config = load_config(config_path)
+
+
+def _run_job_group(group: List[Tuple[str, ShapeJob]]) -> Tuple[dict, dict]:
+    from .pipeline import take_shape_details, take_stage_report
+
+    if len(group) == 1:
+        script_path, job = group[0]
+        load_script(script_path).run_job(job, _worker_config)
+    else:
+        from .fanout import run_fanout_group
+        run_fanout_group(group, _worker_config)
+
+    # Sent back to the main process, which prints the report and catalogs the shapes.
+    return take_stage_report(), take_shape_details()
+
+
+def run_jobs_parallel(
+    job_groups: List[List[Tuple[str, ShapeJob]]],
+    num_workers: int,
+    config_path: str = "scripts/config.ini"
+) -> List[Tuple[str, ShapeJob, str]]:
+    """
+    Runs shape jobs from any number of scripts on a pool of worker processes.
+
+    Each group of jobs is run by one worker. A group either holds a single job,
+    or the jobs of several scripts that share the same source shape (see `fanout`).
+    Every job writes its own output files only, so the result is the same as
+    running the scripts one after another. Progress is printed as jobs finish,
+    and a failing group does not stop the remaining ones. What the optional output
+    stages did in the workers is added to the stage report of this process, and the details
+    of the source shapes they read to those of this process, see `pipeline`.
+
+    Args:
+        job_groups (List[List[Tuple[str, ShapeJob]]]): Groups of script path and job pairs.
+        num_workers (int): Number of worker processes.
+        config_path (str, optional): Path of the config file each worker reads.
+            Defaults to "scripts/config.ini".
+
+    Returns:
+        List[Tuple[str, ShapeJob, str]]: The script path, job and formatted traceback of every failed job.
+    """
+    from .pipeline import add_shape_details, add_stage_report
+
+    failures = []
+    num_jobs = sum(len(group) for group in job_groups)
+    num_finished = 0
+
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        initializer=_init_worker,
+        initargs=(config_path,)
+    ) as executor:
+        futures = {
+            executor.submit(_run_job_group, group): group
+            for group in job_groups
+        }
+
+        for future in as_completed(futures):
+            group = futures[future]
+            error = None
+
+            try:
+                stage_report, shape_details = future.result()
+                add_stage_report(stage_report)
+                add_shape_details(shape_details)
+            except Exception:
+                error = traceback.format_exc()
+
+            for script_path, job in group:
+                num_finished += 1
+                new_sfile_name = job.new_shape_path.name
+
+                if error is None:
+                    print(f"\tCreated {new_sfile_name} ({num_finished} of {num_jobs})")
+                else:
+                    print(f"\tFailed {new_sfile_name} ({num_finished} of {num_jobs})")
+                    failures.append((script_path, job, error))
+
+    return failures
@@ -0,0 +1,620 @@
+"""
+This file is part of DBTracks Extras.
+
+Copyright (C) 2026 Peter Grønbæk Andersen <peter@grnbk.io>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import json
+import inspect
+import hashlib
+import configparser
+import shapeio
+import shapeedit
+import trackshapeutils
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .jobs import ShapeJob
+from .pipeline import write_file_atomic
+
+
+MANIFEST_VERSION = 1
+EXTRACTION_MANIFEST_VERSION = 1
+
+# Config values that change the contents of the generated files.
+MANIFEST_CONFIG_VALUES = [
+    ("utilities", "shape_codec"),
+    ("utilities", "texture_codec"),
+    ("trackcenters", "method"),
+    ("build", "prune_unused_states"),
+    ("build", "optimize_triangle_order"),
+]
+
+# The shared modules that decide the contents of the generated files, for each kind of
+# record. Changing any other module, e.g. the caches, does not rebuild anything.
+SHAPE_MODULES = [
+    "compression.py",
+    "editing.py",
+    "pipeline.py",
+    "shapetext.py",
+    "trackcenters.py",
+    "transplant.py",
+    "vertexcache.py",
+]
+TEXTURE_MODULES = [
+    "ace.py",
+    "pipeline.py",
+    "textures.py",
+]
+
+# A function scripts can define to add what else the outputs of a job are created from,
+# e.g. files outside of the input folder. Given the job and the configuration, it returns
+# more input files, and other values such as the SHA-256 of a downloaded resource.
+JobDependencies = Callable[[ShapeJob, configparser.ConfigParser], Tuple[List[Path], Dict[str, str]]]
+
+_COMMON_PATH = Path(__file__).resolve().parent
+
+_file_hashes: Dict[str, Tuple[int, int, str]] = {}
+
+
+def file_hash(filepath: Path) -> str:
+    """
+    Calculates the SHA-256 hash of a file.
+
+    Hashes are cached per process for as long as the size and modification
+    time of the file stay the same, so a source shape shared by many jobs
+    is only read once.
+
+    Args:
+        filepath (Path): Path of the file.
+
+    Returns:
+        str: The hex digest of the file contents.
+    """
+    stat = os.stat(filepath)
+    key = str(Path(filepath).resolve())
+
+    cached = _file_hashes.get(key)
+    if cached is not None and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+        return cached[2]
+
+    h = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+
+    digest = h.hexdigest()
+    _file_hashes[key] = (stat.st_size, stat.st_mtime_ns, digest)
+    return digest
+
+
+def remember_file_hash(filepath: Path, size: int, mtime_ns: int, digest: str) -> None:
+    """
+    Adds a hash that was calculated before, e.g. in an earlier run, to the cache of `file_hash`.
+
+    The hash is only used for as long as the file keeps the given size and modification time.
+
+    Args:
+        filepath (Path): Path of the file.
+        size (int): Size of the file when it was hashed.
+        mtime_ns (int): Modification time of the file when it was hashed.
+        digest (str): The hex digest of the file contents.
+
+    Returns:
+        None
+    """
+    key = str(Path(filepath).resolve())
+
+    if key not in _file_hashes:
+        _file_hashes[key] = (size, mtime_ns, digest)
+
+
+def cached_file_hash(filepath: Path) -> Optional[Tuple[int, int, str]]:
+    """
+    Looks up the hash of a file in the cache of `file_hash`, without reading the file.
+
+    Args:
+        filepath (Path): Path of the file.
+
+    Returns:
+        Optional[Tuple[int, int, str]]: The size and modification time of the file
+            when it was hashed, and the hex digest, or None if it was not hashed.
+    """
+    return _file_hashes.get(str(Path(filepath).resolve()))
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _common_hash(modules: List[str]) -> str:
+    h = hashlib.sha256()
+    for module_name in sorted(modules):
+        h.update(module_name.encode("utf-8"))
+        h.update(file_hash(_COMMON_PATH / module_name).encode("ascii"))
+    return h.hexdigest()
+
+
+def _library_versions() -> Dict[str, str]:
+    return {
+        "shapeio": shapeio.__version__,
+        "shapeedit": shapeedit.__version__,
+        "trackshapeutils": trackshapeutils.__version__,
+    }
+
+
+def make_record(
+    output_paths: List[Path],
+    input_paths: List[Path],
+    script_path: str,
+    functions: List[Callable],
+    modules: List[str],
+    config: configparser.ConfigParser,
+    parameters: Optional[Dict[str, str]] = None
+) -> dict:
+    """
+    Describes everything that goes into creating a set of output files.
+
+    Args:
+        output_paths (List[Path]): The files that are created together, e.g. a `.s` and its `.sd` file.
+        input_paths (List[Path]): The files they are created from.
+        script_path (str): Path of the script creating them.
+        functions (List[Callable]): The functions of the script doing the work,
+            e.g. `process_trackshape` or `process_texture`.
+        modules (List[str]): The shared modules in scripts/common that do the rest of the
+            work, e.g. `SHAPE_MODULES`.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+        parameters (Optional[Dict[str, str]], optional): Other values the outputs depend on,
+            e.g. the ops of a texture derivation. Defaults to None.
+
+    Returns:
+        dict: The build record. Two records are equal only if the outputs would be created the same way.
+    """
+    config_values = {
+        f"{section}.{option}": config.get(section, option, fallback=None)
+        for section, option in MANIFEST_CONFIG_VALUES
+    }
+
+    record = {
+        "outputs": [str(Path(p).resolve()) for p in output_paths],
+        "inputs": {str(Path(p).resolve()): file_hash(p) for p in input_paths},
+        "script": file_hash(script_path),
+        "functions": {f.__name__: _text_hash(inspect.getsource(f)) for f in functions},
+        "common": _common_hash(modules),
+        "libraries": _library_versions(),
+        "config": config_values,
+    }
+
+    # Only in records that have any, so other records stay the same.
+    if parameters:
+        record["parameters"] = dict(parameters)
+
+    return record
+
+
+def job_record(
+    script_path: str,
+    process_trackshape: Callable,
+    job: ShapeJob,
+    config: configparser.ConfigParser,
+    job_dependencies: Optional[JobDependencies] = None
+) -> dict:
+    """
+    Describes everything that goes into creating the `.s` and `.sd` files of a job.
+
+    Args:
+        script_path (str): Path of the script the job belongs to.
+        process_trackshape (Callable): The `process_trackshape` function of the script.
+        job (ShapeJob): The job.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+        job_dependencies (Optional[JobDependencies], optional): The `job_dependencies` function
+            of the script, if it defines one. Defaults to None.
+
+    Returns:
+        dict: The build record, see `make_record`.
+    """
+    sdfile_path = job.shape_path.with_name(job.shape_path.name.replace(".s", ".sd"))
+    new_sdfile_path = job.new_shape_path.with_name(job.new_shape_path.name.replace(".s", ".sd"))
+
+    input_paths = [job.shape_path, sdfile_path]
+    parameters = None
+
+    if job_dependencies is not None:
+        extra_input_paths, parameters = job_dependencies(job, config)
+        input_paths.extend(extra_input_paths)
+
+    return make_record(
+        output_paths=[job.new_shape_path, new_sdfile_path],
+        input_paths=input_paths,
+        script_path=script_path,
+        functions=[process_trackshape],
+        modules=SHAPE_MODULES,
+        config=config,
+        parameters=parameters
+    )
+
+
+class BuildManifest:
+    """
+    Keeps track of how every generated file was created, so unchanged files can be skipped.
+
+    The manifest is a JSON file mapping each output path to the build record
+    it was last created from. Use it as a context manager to save it on exit,
+    also when a job fails halfway through a run.
+
+    Args:
+        manifest_path (Path): Path of the JSON file.
+    """
+
+    def __init__(self, manifest_path: Path):
+        self.manifest_path = Path(manifest_path)
+        self._records = self._read()
+        self._updated = {}
+
+    def __enter__(self) -> "BuildManifest":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.save()
+
+    def _read(self) -> Dict[str, dict]:
+        if not self.manifest_path.exists():
+            return {}
+
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if data.get("version") != MANIFEST_VERSION:
+            return {}
+
+        return data.get("outputs", {})
+
+    def is_up_to_date(self, record: dict) -> bool:
+        """
+        Checks whether the outputs of a record exist and were created from exactly that record.
+
+        Args:
+            record (dict): The build record, see `make_record`.
+
+        Returns:
+            bool: True if the outputs can be skipped.
+        """
+        for output_path in record["outputs"]:
+            if not os.path.exists(output_path):
+                return False
+            if self._records.get(output_path) != record:
+                return False
+
+        return True
+
+    def update(self, record: dict) -> None:
+        """
+        Marks the outputs of a record as created from it.
+
+        Args:
+            record (dict): The build record, see `make_record`.
+
+        Returns:
+            None
+        """
+        for output_path in record["outputs"]:
+            self._records[output_path] = record
+            self._updated[output_path] = record
+
+    def save(self) -> None:
+        """
+        Writes the updated records to the manifest file.
+
+        The file is read again first, so records written by other scripts
+        running at the same time are kept.
+
+        Returns:
+            None
+        """
+        if not self._updated:
+            return
+
+        records = self._read()
+        records.update(self._updated)
+
+        data = json.dumps({"version": MANIFEST_VERSION, "outputs": records}, indent=1, sort_keys=True)
+
+        os.makedirs(self.manifest_path.parent, exist_ok=True)
+        write_file_atomic(self.manifest_path, data.encode("utf-8"))
+
+        self._records = records
+        self._updated = {}
+
+
+def open_manifest(config: configparser.ConfigParser) -> BuildManifest:
+    """
+    Opens the build manifest configured in config.ini.
+
+    The manifest is stored at `manifest_path` in the [build] section,
+    or in the output shapes folder if that is not set.
+
+    Args:
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        BuildManifest: The build manifest.
+    """
+    manifest_path = config.get("build", "manifest_path", fallback=None)
+
+    if manifest_path is None:
+        manifest_path = Path(config["shapes"]["output_path"]) / "dbtracks_extras_manifest.json"
+
+    return BuildManifest(Path(manifest_path))
+
+
+class ExtractionManifest:
+    """
+    Keeps track of where every extracted input file came from, so unchanged archives and files can be skipped.
+
+    For every archive (zip file) the manifest records its size, modification time and
+    hash, and which of its files were selected for extraction. For every extracted file
+    it records the archive it came from, the name of the member inside it, the CRC and
+    size of the member, and the size and modification time of the file on disk once
+    written, to tell whether it was changed since.
+
+    Use it as a context manager to save it on exit, also when extraction fails halfway through.
+
+    Args:
+        manifest_path (Path): Path of the JSON file.
+    """
+
+    def __init__(self, manifest_path: Path):
+        self.manifest_path = Path(manifest_path)
+        self._archives, self._files = self._read()
+        self._archive_order: Dict[str, int] = {}
+        self._unchanged_archives: Set[str] = set()
+
+    def __enter__(self) -> "ExtractionManifest":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.save()
+
+    def _read(self) -> Tuple[Dict[str, dict], Dict[str, dict]]:
+        if not self.manifest_path.exists():
+            return {}, {}
+
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}, {}
+
+        if data.get("version") != EXTRACTION_MANIFEST_VERSION:
+            return {}, {}
+
+        return data.get("archives", {}), data.get("files", {})
+
+    @staticmethod
+    def _key(path: Path) -> str:
+        return str(Path(path).resolve())
+
+    def _is_archive_unchanged(self, archive_key: str, selection: Optional[str]) -> bool:
+        record = self._archives.get(archive_key)
+
+        if record is None or not os.path.exists(archive_key):
+            return False
+
+        # An archive extracted completely also covers any selection of its files.
+        if record.get("selection") not in (None, selection):
+            return False
+
+        stat = os.stat(archive_key)
+
+        if stat.st_size != record["size"]:
+            return False
+
+        if stat.st_mtime_ns != record["mtime_ns"]:
+            # Touched, e.g. downloaded again, but possibly with the same contents.
+            if file_hash(archive_key) != record["sha256"]:
+                return False
+            record["mtime_ns"] = stat.st_mtime_ns
+
+        return True
+
+    def _is_file_intact(self, file_key: str) -> bool:
+        record = self._files.get(file_key)
+
+        if record is None:
+            return False
+
+        try:
+            stat = os.stat(file_key)
+        except OSError:
+            return False
+
+        return stat.st_size == record["file_size"] and stat.st_mtime_ns == record["mtime_ns"]
+
+    def plan(self, archive_paths: List[Path], selection: Optional[str] = None) -> List[Path]:
+        """
+        Finds the archives that have to be extracted, out of all archives in extraction order.
+
+        An archive can be skipped if it is unchanged since it was last extracted, by
+        size and modification time or else by hash, and all files that were last
+        extracted from it are still unchanged on disk. An archive that was last extracted
+        with a different selection of files is extracted again, unless it was last
+        extracted completely.
+
+        Args:
+            archive_paths (List[Path]): All archives, in the order they are extracted.
+            selection (Optional[str], optional): Key of the selection of files that is
+                extracted, see `InputSelection.key`, or None for all files. Defaults to None.
+
+        Returns:
+            List[Path]: The archives to extract, in the same order.
+        """
+        self._archive_order = {self._key(p): idx for idx, p in enumerate(archive_paths)}
+        self._unchanged_archives = set()
+
+        files_by_archive: Dict[str, List[str]] = {}
+        for file_key, record in self._files.items():
+            files_by_archive.setdefault(record["archive"], []).append(file_key)
+
+        changed_archives = []
+
+        for archive_path in archive_paths:
+            archive_key = self._key(archive_path)
+            file_keys = files_by_archive.get(archive_key, [])
+
+            if self._is_archive_unchanged(archive_key, selection) and all(self._is_file_intact(k) for k in file_keys):
+                self._unchanged_archives.add(archive_key)
+            else:
+                changed_archives.append(archive_path)
+
+        return changed_archives
+
+    def known_files(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Lists the CRC and size of every extracted file that is unchanged on disk.
+
+        Returns:
+            Dict[str, Tuple[int, int]]: The CRC and size of each file, by resolved path.
+        """
+        return {
+            file_key: (record["crc"], record["size"])
+            for file_key, record in self._files.items()
+            if self._is_file_intact(file_key)
+        }
+
+    def file_matches(self, dest: Path, crc: int, size: int) -> bool:
+        """
+        Checks whether a file on disk already has the contents of an archive member.
+
+        Args:
+            dest (Path): Path of the extracted file.
+            crc (int): CRC-32 of the archive member.
+            size (int): Uncompressed size of the archive member.
+
+        Returns:
+            bool: True if the file does not have to be written again.
+        """
+        file_key = self._key(dest)
+        record = self._files.get(file_key)
+
+        return record is not None and record["crc"] == crc and record["size"] == size and self._is_file_intact(file_key)
+
+    def is_shadowed(self, dest: Path, archive_path: Path) -> bool:
+        """
+        Checks whether a file was last extracted from a later archive that is skipped in this run.
+
+        Files with the same name in several archives end up with the contents of the
+        last one. When that archive is skipped, an earlier archive must not overwrite it.
+
+        Args:
+            dest (Path): Path of the extracted file.
+            archive_path (Path): The archive that is being extracted.
+
+        Returns:
+            bool: True if the member of `archive_path` should not be written to `dest`.
+        """
+        record = self._files.get(self._key(dest))
+
+        if record is None or record["archive"] not in self._unchanged_archives:
+            return False
+
+        return self._archive_order.get(record["archive"], -1) > self._archive_order.get(self._key(archive_path), -1)
+
+    def record_file(self, dest: Path, archive_path: Path, member: str, crc: int, size: int) -> None:
+        """
+        Records that a file on disk holds the contents of an archive member.
+
+        Args:
+            dest (Path): Path of the extracted file.
+            archive_path (Path): The archive the member is in.
+            member (str): Name of the member inside the archive, e.g. "DB1.rar/Shapes/DB1s_a10m.s".
+            crc (int): CRC-32 of the archive member.
+            size (int): Uncompressed size of the archive member.
+
+        Returns:
+            None
+        """
+        stat = os.stat(dest)
+
+        self._files[self._key(dest)] = {
+            "archive": self._key(archive_path),
+            "member": member,
+            "crc": crc,
+            "size": size,
+            "file_size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+
+    def record_archive(self, archive_path: Path, selection: Optional[str] = None) -> None:
+        """
+        Records that an archive has been extracted completely, or all of its selected files.
+
+        Args:
+            archive_path (Path): The archive.
+            selection (Optional[str], optional): Key of the selection of files that was
+                extracted, or None for all files. Defaults to None.
+
+        Returns:
+            None
+        """
+        stat = os.stat(archive_path)
+
+        self._archives[self._key(archive_path)] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": file_hash(archive_path),
+            "selection": selection,
+        }
+
+    def save(self) -> None:
+        """
+        Writes the manifest file.
+
+        Returns:
+            None
+        """
+        data = json.dumps({
+            "version": EXTRACTION_MANIFEST_VERSION,
+            "archives": self._archives,
+            "files": self._files,
+        }, indent=1, sort_keys=True)
+
+        os.makedirs(self.manifest_path.parent, exist_ok=True)
+        write_file_atomic(self.manifest_path, data.encode("utf-8"))
+
+
+def open_extraction_manifest(config: configparser.ConfigParser) -> ExtractionManifest:
+    """
+    Opens the extraction manifest configured in config.ini.
+
+    The manifest is stored at `extraction_manifest_path` in the [build] section,
+    or in the input shapes folder if that is not set.
+
+    Args:
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        ExtractionManifest: The extraction manifest.
+    """
+    manifest_path = config.get("build", "extraction_manifest_path", fallback=None)
+
+    if manifest_path is None:
+        manifest_path = Path(config["shapes"]["input_path"]) / "dbtracks_extras_extraction.json"
+
+    return ExtractionManifest(Path(manifest_path))
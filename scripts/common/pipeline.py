@@ -0,0 +1,601 @@
+"""
+This file is part of DBTracks Extras.
+
+Copyright (C) 2026 Peter Grønbæk Andersen <peter@grnbk.io>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import re
+import codecs
+import pickle
+import tempfile
+import subprocess
+import configparser
+import shapeio
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from shapeio.shape import Shape
+from PIL import Image
+
+from . import ace, compression, editing, shapecache, shapetext, vertexcache
+from .editing import PruneStats
+from .vertexcache import TriangleOrderStats
+from .jobs import ShapeJob
+
+
+# Files created by tempfile.mkstemp are only readable by the owner, so the
+# permissions a plain open() would have given are restored before renaming.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# The stats of each optional output stage, e.g. "Pruned", and output folder, with
+# the number of shapes they were added up from. See `take_stage_report`.
+StageReport = Dict[Tuple[str, str], Tuple[int, Union[PruneStats, TriangleOrderStats]]]
+
+# What the optional output stages did to the shapes written by this process.
+_stage_report: StageReport = {}
+
+# The details of the source shapes read by this process, by resolved path, with the
+# size and modification time of the file they were read from. See `take_shape_details`.
+ShapeDetailsReport = Dict[str, Tuple[int, int, shapetext.ShapeDetails]]
+
+_shape_details: ShapeDetailsReport = {}
+
+
+def shape_codec_settings(config: configparser.ConfigParser) -> Tuple[Path, str]:
+    """
+    Reads the shape compression settings from the configuration.
+
+    Args:
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        Tuple[Path, str]: Path to the ffeditc_unicode.exe executable, and the
+            shape codec to use, either "python" (the default) or "ffeditc".
+    """
+    ffeditc_path = Path(config["utilities"]["ffeditc_path"])
+    shape_codec = config.get("utilities", "shape_codec", fallback="python")
+    return ffeditc_path, shape_codec
+
+
+def texture_codec_settings(config: configparser.ConfigParser) -> str:
+    """
+    Reads the texture codec setting from the configuration.
+
+    Args:
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        str: The texture codec to use, either "python" (the default) or "aceit".
+
+    Raises:
+        ValueError: If the configured texture codec is not a known codec.
+    """
+    texture_codec = config.get("utilities", "texture_codec", fallback="python")
+
+    if texture_codec not in ace.TEXTURE_CODECS:
+        raise ValueError(f"Unknown texture codec '{texture_codec}', choose one of {ace.TEXTURE_CODECS}")
+
+    return texture_codec
+
+
+def prune_unused_states_enabled(config: configparser.ConfigParser) -> bool:
+    """
+    Reads whether output shapes are pruned with `editing.prune_unused_states` before they are written.
+
+    Args:
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        bool: The `prune_unused_states` option of the build section. Defaults to False.
+    """
+    return config.getboolean("build", "prune_unused_states", fallback=False)
+
+
+def optimize_triangle_order_enabled(config: configparser.ConfigParser) -> bool:
+    """
+    Reads whether the triangles of output shapes are reordered with `vertexcache.optimize_triangle_order`.
+
+    Args:
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        bool: The `optimize_triangle_order` option of the build section. Defaults to False.
+    """
+    return config.getboolean("build", "optimize_triangle_order", fallback=False)
+
+
+def take_stage_report() -> StageReport:
+    """
+    Takes what the optional output stages did to the shapes written by this process so far, and clears it.
+
+    Returns:
+        StageReport: For each stage and output folder, the number of shapes and the
+            stats of the stage for all of them together.
+    """
+    report = dict(_stage_report)
+    _stage_report.clear()
+    return report
+
+
+def add_stage_report(report: StageReport) -> None:
+    """
+    Adds a report taken with `take_stage_report`, e.g. in a worker process, to the report of this process.
+
+    Args:
+        report (StageReport): The report to add.
+
+    Returns:
+        None
+    """
+    for key, (num_shapes, stats) in report.items():
+        if key in _stage_report:
+            total_shapes, total_stats = _stage_report[key]
+            _stage_report[key] = (total_shapes + num_shapes, total_stats.plus(stats))
+        else:
+            _stage_report[key] = (num_shapes, stats)
+
+
+def take_shape_details() -> ShapeDetailsReport:
+    """
+    Takes the details of the source shapes read by this process so far, and clears them.
+
+    Returns:
+        ShapeDetailsReport: For each source shape, the size and modification time of the
+            file and the details read from its text, see `shapetext.shape_details`.
+    """
+    report = dict(_shape_details)
+    _shape_details.clear()
+    return report
+
+
+def add_shape_details(report: ShapeDetailsReport) -> None:
+    """
+    Adds details taken with `take_shape_details`, e.g. in a worker process, to those of this process.
+
+    Args:
+        report (ShapeDetailsReport): The details to add.
+
+    Returns:
+        None
+    """
+    _shape_details.update(report)
+
+
+def cached_shape_details(shape_path: Path) -> Optional[Tuple[int, int, shapetext.ShapeDetails]]:
+    """
+    Looks up the details of a source shape read by this process, without reading the file.
+
+    Args:
+        shape_path (Path): Path of the source `.s` file.
+
+    Returns:
+        Optional[Tuple[int, int, shapetext.ShapeDetails]]: The size and modification time of
+            the file when it was read, and the details of the shape, or None if it was not read.
+    """
+    return _shape_details.get(str(Path(shape_path).resolve()))
+
+
+def print_stage_report() -> None:
+    """
+    Prints what the optional output stages did to the shapes written by this process, for each output folder.
+
+    Nothing is printed if no output stages are enabled.
+
+    Returns:
+        None
+    """
+    for (stage, output_folder), (num_shapes, stats) in sorted(_stage_report.items()):
+        print(f"\t{stage} {num_shapes} shapes in {output_folder}: {stats.describe()}")
+
+
+# Returns the texture replacements of a script if they are all it changes in a
+# shape, given the decompressed text of the shape, or None otherwise.
+TextureOnlyReplacements = Callable[[str], Optional[Dict[str, str]]]
+
+
+class _SourceShape:
+    # A source `.s` file that is only decompressed, parsed and serialized as far as needed.
+
+    def __init__(self, shape_path: Path, config: configparser.ConfigParser):
+        self.config = config
+        self.shape_path = shape_path
+
+        with open(shape_path, "rb") as f:
+            self.data = f.read()
+            self.stat = os.fstat(f.fileno())
+
+        self.shape_cache = shapecache.open_shape_cache(config)
+        self.cache_key = self.shape_cache.key(self.data) if self.shape_cache is not None else None
+
+        self._text = None
+        self._trackshape = None
+        self._serialized_text = None
+
+    def scan_text(self) -> str:
+        # Text to look for things in without parsing it. The serialized text holds the
+        # same shape, and is cheaper to get than the source text if it is cached.
+        if self._serialized_text is None and self.shape_cache is not None:
+            self._serialized_text = self.shape_cache.get_text(self.cache_key)
+
+        if self._serialized_text is not None:
+            return self._serialized_text
+
+        return self.text()
+
+    def text(self) -> str:
+        if self._text is None:
+            ffeditc_path, shape_codec = shape_codec_settings(self.config)
+            data = compression.decompress_data(self.data, ffeditc_path, shape_codec)
+            self._text = data.decode(detect_encoding(data))
+
+        return self._text
+
+    def parse(self) -> Shape:
+        if self._trackshape is not None:
+            return self._trackshape
+
+        if self.shape_cache is not None:
+            self._trackshape = self.shape_cache.get(self.cache_key)
+
+        if self._trackshape is None:
+            self._trackshape = shapeio.loads(self.text())
+
+            if self.shape_cache is not None:
+                self.shape_cache.put(self.cache_key, self._trackshape)
+
+        return self._trackshape
+
+    def record_details(self) -> None:
+        # Only from text that is already at hand, so nothing is decompressed for it.
+        text = self._serialized_text if self._serialized_text is not None else self._text
+        key = str(Path(self.shape_path).resolve())
+
+        if text is not None and key not in _shape_details:
+            _shape_details[key] = (self.stat.st_size, self.stat.st_mtime_ns, shapetext.shape_details(text))
+
+    def serialized_text(self) -> str:
+        # Must be called before the parsed shape is modified.
+        if self._serialized_text is None and self.shape_cache is not None:
+            self._serialized_text = self.shape_cache.get_text(self.cache_key)
+
+        if self._serialized_text is None:
+            self._serialized_text = shapeio.dumps(self.parse())
+
+            if self.shape_cache is not None:
+                self.shape_cache.put_text(self.cache_key, self._serialized_text)
+
+        return self._serialized_text
+
+
+def read_shape(shape_path: Path, config: configparser.ConfigParser) -> Shape:
+    """
+    Reads, decompresses and parses a `.s` file without writing anything to disk.
+
+    If a shape cache is configured (see `shapecache`) and it already holds the
+    parsed contents of the file, both decompressing and parsing are skipped.
+
+    Args:
+        shape_path (Path): Path of the `.s` file, which may be compressed.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        Shape: The parsed shape.
+    """
+    return _SourceShape(shape_path, config).parse()
+
+
+def write_shape(
+    trackshape: Shape,
+    shape_path: Path,
+    config: configparser.ConfigParser
+) -> None:
+    """
+    Serializes and compresses a shape in memory, and writes it as a `.s` file.
+
+    The file is written exactly once, see `write_file_atomic`.
+
+    Args:
+        trackshape (Shape): The shape to write.
+        shape_path (Path): Path of the `.s` file to create.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        None
+    """
+    write_shape_text(shapeio.dumps(trackshape), shape_path, config)
+
+
+def write_shape_text(
+    text: str,
+    shape_path: Path,
+    config: configparser.ConfigParser
+) -> None:
+    """
+    Compresses the serialized text of a shape in memory, and writes it as a `.s` file.
+
+    Args:
+        text (str): The text of the shape, as written by `shapeio.dumps`.
+        shape_path (Path): Path of the `.s` file to create.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        None
+    """
+    ffeditc_path, shape_codec = shape_codec_settings(config)
+
+    # Same layout as the files written by shapeio.dump.
+    data = codecs.BOM_UTF16_LE + text.encode("utf-16-le")
+    data = compression.compress_data(data, ffeditc_path, shape_codec)
+
+    write_file_atomic(shape_path, data)
+
+
+def write_file_atomic(filepath: Path, data: bytes) -> None:
+    """
+    Writes data to a file through a temporary file in the same folder that is renamed into place.
+
+    An interrupted run therefore never leaves a half-written file at `filepath`.
+
+    Args:
+        filepath (Path): Path of the file to create or overwrite.
+        data (bytes): The contents of the file.
+
+    Returns:
+        None
+    """
+    fd, temp_path = tempfile.mkstemp(dir=filepath.parent, prefix=f".{filepath.name}.", suffix=".tmp")
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+
+        os.chmod(temp_path, 0o666 & ~_UMASK)
+        os.replace(temp_path, filepath)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def detect_encoding(data: bytes) -> str:
+    """
+    Detects the text encoding of file contents by inspecting the initial bytes (BOM or heuristics).
+
+    This gives the same result as the encoding detection in shapeio.
+
+    Args:
+        data (bytes): The contents of the file.
+
+    Returns:
+        str: The detected encoding.
+    """
+    if data.startswith((codecs.BOM_UTF32_BE, codecs.BOM_UTF32_LE)):
+        return "utf-32"
+    if data.startswith((codecs.BOM_UTF16_BE, codecs.BOM_UTF16_LE)):
+        return "utf-16"
+    if data.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+
+    b = data[:4]
+    if len(b) >= 4:
+        if not b[0]:
+            return "utf-16-be" if b[1] else "utf-32-be"
+        if not b[1]:
+            return "utf-16-le" if b[2] or b[3] else "utf-32-le"
+    elif len(b) == 2:
+        if not b[0]:
+            return "utf-16-be"
+        if not b[1]:
+            return "utf-16-le"
+    return "utf-8"
+
+
+def make_shape(
+    job: ShapeJob,
+    process_trackshape: Callable[[Shape], None],
+    config: configparser.ConfigParser,
+    texture_only_replacements: Optional[TextureOnlyReplacements] = None
+) -> None:
+    """
+    Creates the output `.s` file of a job from its source shape.
+
+    The source shape is read once and decompressed, parsed, modified by
+    `process_trackshape`, serialized and compressed in memory. Only the final
+    `.s` file is written to disk. See `make_shape_variants` for the texture-only path.
+
+    Args:
+        job (ShapeJob): The job to create the `.s` file for.
+        process_trackshape (Callable[[Shape], None]): Function that modifies the loaded shape in place.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+        texture_only_replacements (Optional[TextureOnlyReplacements], optional): Function that
+            returns the texture replacements of the script for shapes where that is all
+            `process_trackshape` changes. Defaults to None.
+
+    Returns:
+        None
+    """
+    make_shape_variants(job.shape_path, [(job, process_trackshape, texture_only_replacements)], config)
+
+
+def make_shape_variants(
+    shape_path: Path,
+    variants: List[Tuple[ShapeJob, Callable[[Shape], None], Optional[TextureOnlyReplacements]]],
+    config: configparser.ConfigParser
+) -> None:
+    """
+    Creates several output `.s` files from a single source shape.
+
+    The source shape is only decompressed and parsed once. Each variant is then
+    created from a clone of the parsed shape, modified by its own `process_trackshape`
+    function, and written to the output path of its job.
+
+    Variants whose `texture_only_replacements` function finds that the shape only needs
+    its textures swapped are not cloned, modified and serialized. Their text is made by
+    replacing the images in the serialized text of the unmodified source shape, which
+    gives exactly the same file. That text is kept in the shape cache, so on later runs
+    these variants are made without parsing the source shape at all. Variants where
+    replacing the images merges some of them still take the full path, and so do all
+    variants when the `prune_unused_states` or `optimize_triangle_order` option is enabled.
+
+    Args:
+        shape_path (Path): Path of the source `.s` file shared by all variants.
+        variants (List[Tuple[ShapeJob, Callable[[Shape], None], Optional[TextureOnlyReplacements]]]):
+            The job, `process_trackshape` function and optional `texture_only_replacements`
+            function of each variant to create.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        None
+    """
+    source_shape = _SourceShape(shape_path, config)
+    prune_states = prune_unused_states_enabled(config)
+    optimize_order = optimize_triangle_order_enabled(config)
+    full_variants = []
+
+    for job, process_trackshape, texture_only_replacements in variants:
+        replacements = None
+
+        # The optional output stages also change shapes that only need their textures swapped.
+        if texture_only_replacements is not None and not (prune_states or optimize_order):
+            replacements = texture_only_replacements(source_shape.scan_text())
+
+        if replacements is not None:
+            text = shapetext.replace_images(source_shape.serialized_text(), replacements)
+
+            if text is not None:
+                write_shape_text(text, job.new_shape_path, config)
+                continue
+
+        full_variants.append((job, process_trackshape))
+
+    source_shape.record_details()
+
+    if not full_variants:
+        return
+
+    trackshape = source_shape.parse()
+    source_shape.record_details()
+
+    # Unpickling is a lot cheaper than parsing the shape again, and unlike
+    # copy.deepcopy it does not need to track every visited object in Python.
+    shape_data = pickle.dumps(trackshape, protocol=pickle.HIGHEST_PROTOCOL)
+
+    for idx, (job, process_trackshape) in enumerate(full_variants):
+        is_last_variant = idx == len(full_variants) - 1
+        variant_trackshape = trackshape if is_last_variant else pickle.loads(shape_data)
+
+        process_trackshape(variant_trackshape)
+
+        output_folder = str(job.new_shape_path.parent)
+
+        if prune_states:
+            add_stage_report({("Pruned", output_folder): (1, editing.prune_unused_states(variant_trackshape))})
+
+        if optimize_order:
+            add_stage_report({("Reordered", output_folder): (1, vertexcache.optimize_triangle_order(variant_trackshape))})
+
+        write_shape(variant_trackshape, job.new_shape_path, config)
+
+
+def make_sd(job: ShapeJob) -> None:
+    """
+    Creates the output `.sd` file of a job from the `.sd` file of its source shape.
+
+    The shape name referenced within the `.sd` file is changed to the new shape name
+    (case-insensitive) in memory, and the new `.sd` file is written once.
+
+    Args:
+        job (ShapeJob): The job to create the `.sd` file for.
+
+    Returns:
+        None
+    """
+    sfile_name = job.shape_path.name
+    new_sfile_name = job.new_shape_path.name
+
+    sdfile_path = job.shape_path.with_name(sfile_name.replace(".s", ".sd"))
+    new_sdfile_path = job.new_shape_path.with_name(new_sfile_name.replace(".s", ".sd"))
+
+    with open(sdfile_path, "rb") as f:
+        data = f.read()
+
+    encoding = detect_encoding(data)
+    text = data.decode(encoding)
+
+    # Same pattern semantics as shapeio.replace_ignorecase.
+    pattern = re.compile(sfile_name, re.IGNORECASE)
+    new_text = pattern.sub(new_sfile_name, text)
+
+    write_file_atomic(new_sdfile_path, new_text.encode(encoding))
+
+
+def make_texture(
+    ace_path: Path,
+    new_ace_path: Path,
+    process_texture: Callable[[Image.Image], Image.Image],
+    config: configparser.ConfigParser
+) -> None:
+    """
+    Creates an `.ace` file from a source `.ace` file with a modified image.
+
+    With the "python" texture codec (see `texture_codec_settings`) the texture is decoded,
+    modified and encoded in memory, and keeps the format, mipmaps and transparency of the
+    source texture. With "aceit" it is converted with ace2png.exe and AceIt through a `.png` file.
+
+    Args:
+        ace_path (Path): Path of the source `.ace` file.
+        new_ace_path (Path): Path of the `.ace` file to create.
+        process_texture (Callable[[Image.Image], Image.Image]): Function that returns the modified image.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        None
+    """
+    if texture_codec_settings(config) == "python":
+        with open(ace_path, "rb") as f:
+            texture = ace.decode_ace(f.read())
+
+        new_texture = texture.with_image(process_texture(texture.to_image()))
+        write_file_atomic(new_ace_path, ace.encode_ace(new_texture))
+        return
+
+    aceit_path = Path(config["utilities"]["aceit_path"])
+    ace2png_path = Path(config["utilities"]["ace2png_path"])
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        png_temp_path = os.path.join(temp_dir, ace_path.with_suffix(".png").name)
+
+        subprocess.run(
+            [str(ace2png_path), "-o", temp_dir, str(ace_path)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True
+        )
+
+        # Loaded before the file is closed, since the image may be returned unchanged.
+        with Image.open(png_temp_path) as image:
+            image.load()
+            new_image = process_texture(image)
+
+        new_image.save(png_temp_path)
+
+        subprocess.run(
+            [str(aceit_path), png_temp_path, str(new_ace_path), "-q"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True
+        )
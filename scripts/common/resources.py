@@ -0,0 +1,312 @@
+"""
+This file is part of DBTracks Extras.
+
+Copyright (C) 2026 Peter Grønbæk Andersen <peter@grnbk.io>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import pickle
+import hashlib
+import tempfile
+import configparser
+import shapeio
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+from urllib.request import urlopen
+from shapeio.shape import Shape
+
+from . import compression, pipeline
+
+
+# Bump when the cached parsed representation changes, so old entries are not used.
+RESOURCE_CACHE_VERSION = 1
+
+_downloads: Dict[str, bytes] = {}
+
+
+class Resource(NamedTuple):
+    """
+    A file that the scripts fetch from outside of the DBTracks packages.
+
+    Attributes:
+        name (str): File name of the resource, also used to pre-seed the resource cache.
+        url (str): Where to download the resource from. Should point at a fixed revision,
+            not a branch, so the contents do not change.
+        sha256 (Optional[str]): Expected SHA-256 of the file contents as a hex string.
+            Resources without one are refused, and the error tells the SHA-256 to pin.
+    """
+    name: str
+    url: str
+    sha256: Optional[str] = None
+
+
+class ResourceError(Exception):
+    """Raised when a resource cannot be found or does not have the expected contents."""
+    pass
+
+
+class ResourceCache:
+    """
+    An on-disk, content-addressed cache of external resources and their parsed forms.
+
+    Each resource is stored as `<sha256>.bin`, named by the SHA-256 of its contents, and
+    parsed shapes as pickles next to it.
+
+    The cache can be pre-seeded for hosts without internet access, either by copying the
+    folder from another host, or by placing a resource in it under its file name.
+
+    Args:
+        cache_path (Path): Folder to store the resources in.
+    """
+
+    def __init__(self, cache_path: Path):
+        self.cache_path = Path(cache_path)
+
+    def _entry_path(self, sha256: str) -> Path:
+        return self.cache_path / f"{sha256}.bin"
+
+    def _shape_entry_path(self, sha256: str) -> Path:
+        return self.cache_path / f"{sha256}.{RESOURCE_CACHE_VERSION}.{shapeio.__version__}.pickle"
+
+    def _write_entry(self, entry_path: Path, data: bytes) -> None:
+        os.makedirs(self.cache_path, exist_ok=True)
+
+        # Several worker processes may add the same entry at once, so it is
+        # written to a temporary file first and renamed into place.
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_path, suffix=".tmp")
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+
+            os.replace(temp_path, entry_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _add(self, resource: Resource, data: bytes, source: str) -> str:
+        sha256 = _check_sha256(resource, data, source)
+        self._write_entry(self._entry_path(sha256), data)
+
+        return sha256
+
+    def fetch(self, resource: Resource) -> str:
+        """
+        Makes sure a resource is in the cache, and gets the SHA-256 of its contents.
+
+        The resource is taken from the cache if it is already there, otherwise from a
+        file with the name of the resource in the cache folder, and otherwise downloaded.
+
+        Args:
+            resource (Resource): The resource to fetch.
+
+        Returns:
+            str: The SHA-256 of the resource, as a hex string.
+
+        Raises:
+            ResourceError: If the resource cannot be downloaded, has no expected SHA-256,
+                or does not have the expected SHA-256.
+        """
+        if resource.sha256 is not None and self._entry_path(resource.sha256.lower()).exists():
+            return resource.sha256.lower()
+
+        seed_path = self.cache_path / resource.name
+
+        if seed_path.exists():
+            with open(seed_path, "rb") as f:
+                return self._add(resource, f.read(), str(seed_path))
+
+        print(f"\tDownloading {resource.name} from {resource.url}...")
+        try:
+            with urlopen(resource.url) as response:
+                data = response.read()
+        except OSError as e:
+            raise ResourceError(f"Unable to download {resource.name}: {e}. Place the file in {self.cache_path} to use it without downloading it.") from e
+
+        return self._add(resource, data, resource.url)
+
+    def read(self, resource: Resource) -> bytes:
+        """
+        Gets the contents of a resource.
+
+        Args:
+            resource (Resource): The resource to read.
+
+        Returns:
+            bytes: The contents of the resource.
+
+        Raises:
+            ResourceError: If the resource has no expected SHA-256, or does not have the expected SHA-256.
+        """
+        sha256 = self.fetch(resource)
+
+        with open(self._entry_path(sha256), "rb") as f:
+            data = f.read()
+
+        if hashlib.sha256(data).hexdigest() != sha256:
+            raise ResourceError(f"Cached {resource.name} is corrupt, remove {self._entry_path(sha256)} to download it again")
+
+        return data
+
+    def shape(self, resource: Resource, config: configparser.ConfigParser) -> Shape:
+        """
+        Gets a resource parsed as a shape.
+
+        The parsed shape is cached next to the resource, so once it is cached the
+        shape is neither downloaded, read nor parsed again.
+
+        Args:
+            resource (Resource): The `.s` file resource.
+            config (configparser.ConfigParser): The configuration read from config.ini.
+
+        Returns:
+            Shape: The parsed shape.
+
+        Raises:
+            ResourceError: If the resource has no expected SHA-256, or does not have the expected SHA-256.
+        """
+        if resource.sha256 is not None:
+            try:
+                with open(self._shape_entry_path(resource.sha256.lower()), "rb") as f:
+                    return pickle.load(f)
+            except Exception:
+                # A missing or broken entry is made again below.
+                pass
+
+        data = self.read(resource)
+        trackshape = parse_shape_data(data, config)
+        sha256 = hashlib.sha256(data).hexdigest()
+
+        self._write_entry(self._shape_entry_path(sha256), pickle.dumps(trackshape, protocol=pickle.HIGHEST_PROTOCOL))
+
+        return trackshape
+
+
+def _check_sha256(resource: Resource, data: bytes, source: str) -> str:
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    # Unpinned resources are refused rather than trusted on first use, but the
+    # digest is reported so that it can be checked and pinned.
+    if resource.sha256 is None:
+        raise ResourceError(f"{resource.name} from {source} has SHA-256 {sha256}, but no expected SHA-256 is pinned")
+
+    if sha256 != resource.sha256.lower():
+        raise ResourceError(f"{resource.name} from {source} has SHA-256 {sha256}, expected {resource.sha256}")
+
+    return sha256
+
+
+def parse_shape_data(data: bytes, config: configparser.ConfigParser) -> Shape:
+    """
+    Decompresses and parses the contents of a `.s` file.
+
+    Args:
+        data (bytes): The contents of the `.s` file, compressed or not.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        Shape: The parsed shape.
+    """
+    ffeditc_path, shape_codec = pipeline.shape_codec_settings(config)
+    data = compression.decompress_data(data, ffeditc_path, shape_codec)
+
+    return shapeio.loads(data.decode(pipeline.detect_encoding(data)))
+
+
+def open_resource_cache(config: configparser.ConfigParser) -> Optional[ResourceCache]:
+    """
+    Opens the resource cache configured in config.ini.
+
+    The cache is stored at `resource_cache_path` in the [build] section.
+
+    Args:
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        Optional[ResourceCache]: The resource cache, or None if `resource_cache_path` is not set.
+    """
+    cache_path = config.get("build", "resource_cache_path", fallback=None)
+
+    if not cache_path:
+        return None
+
+    return ResourceCache(Path(cache_path))
+
+
+def resource_sha256(resource: Resource, config: configparser.ConfigParser) -> str:
+    """
+    Gets the SHA-256 of the contents of a resource, e.g. to record what an output was created from.
+
+    This is the pinned digest of the resource, so nothing is downloaded.
+
+    Args:
+        resource (Resource): The resource.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        str: The SHA-256 of the resource, as a hex string.
+
+    Raises:
+        ResourceError: If the resource has no expected SHA-256.
+    """
+    if resource.sha256 is not None:
+        return resource.sha256.lower()
+
+    # Fetching it fails with the SHA-256 that should be pinned.
+    resource_cache = open_resource_cache(config)
+
+    if resource_cache is not None:
+        return resource_cache.fetch(resource)
+
+    return _check_sha256(resource, _download(resource), resource.url)
+
+
+def load_shape_resource(resource: Resource, config: configparser.ConfigParser) -> Shape:
+    """
+    Gets a `.s` file resource parsed as a shape.
+
+    Uses the resource cache if it is configured, otherwise the shape is downloaded and parsed.
+
+    Args:
+        resource (Resource): The `.s` file resource.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        Shape: The parsed shape.
+
+    Raises:
+        ResourceError: If the resource has no expected SHA-256, or does not have the expected SHA-256.
+    """
+    resource_cache = open_resource_cache(config)
+
+    if resource_cache is not None:
+        return resource_cache.shape(resource, config)
+
+    data = _download(resource)
+    _check_sha256(resource, data, resource.url)
+
+    return parse_shape_data(data, config)
+
+
+def _download(resource: Resource) -> bytes:
+    # Without a resource cache, each resource is still only downloaded once per process.
+    if resource.url not in _downloads:
+        print(f"\tDownloading {resource.name} from {resource.url}...")
+        with urlopen(resource.url) as response:
+            _downloads[resource.url] = response.read()
+
+    return _downloads[resource.url]
@@ -0,0 +1,277 @@
+"""
+This file is part of DBTracks Extras.
+
+Copyright (C) 2026 Peter Grønbæk Andersen <peter@grnbk.io>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import pickle
+import hashlib
+import tempfile
+import configparser
+import shapeio
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from shapeio.shape import Shape
+
+
+# Bump when the cached representation changes, so old entries are not used.
+SHAPE_CACHE_VERSION = 1
+
+DEFAULT_SHAPE_CACHE_SIZE_MB = 2048
+
+# Entries are evicted down to this fraction of the size limit, so the cache
+# folder is only listed again after a good number of new entries.
+EVICT_TO_FRACTION = 0.9
+
+_open_caches: Dict[Tuple[str, int], "ShapeCache"] = {}
+
+
+class ShapeCache:
+    """
+    An on-disk cache of parsed shapes, keyed by the contents of the source `.s` file.
+
+    Each entry is the pickled `Shape` parsed from a source file, and possibly the text
+    shapeio serializes that shape to. Entries are evicted least recently used first
+    once the cache grows beyond its size limit.
+
+    The total size of the entries is only found by listing the cache folder before
+    the first entry is added, and when the entries added since then make the cache
+    too large. Entries added by other processes in the meantime are counted then.
+
+    Args:
+        cache_path (Path): Folder to store the cache entries in.
+        max_size (int): Maximum total size of the entries in bytes.
+    """
+
+    def __init__(self, cache_path: Path, max_size: int):
+        self.cache_path = Path(cache_path)
+        self.max_size = max_size
+        self._size: Optional[int] = None
+
+    def key(self, data: bytes) -> str:
+        """
+        Calculates the cache key of a source `.s` file.
+
+        The key also covers the shapeio version, since that decides how the shape is parsed.
+
+        Args:
+            data (bytes): The contents of the source `.s` file, compressed or not.
+
+        Returns:
+            str: The cache key.
+        """
+        h = hashlib.sha256(data)
+        h.update(f"\0{SHAPE_CACHE_VERSION}\0{shapeio.__version__}".encode("ascii"))
+        return h.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_path / f"{key}.pickle"
+
+    def _text_entry_path(self, key: str) -> Path:
+        return self.cache_path / f"{key}.txt"
+
+    def get(self, key: str) -> Optional[Shape]:
+        """
+        Gets a parsed shape from the cache.
+
+        Every call returns a new copy, so the shape can be modified freely.
+
+        Args:
+            key (str): The cache key, see `key`.
+
+        Returns:
+            Optional[Shape]: The parsed shape, or None if it is not in the cache.
+        """
+        entry_path = self._entry_path(key)
+
+        try:
+            with open(entry_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        try:
+            trackshape = pickle.loads(data)
+        except Exception:
+            # A broken entry is treated like a missing one and replaced later.
+            return None
+
+        # Mark the entry as recently used.
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+
+        return trackshape
+
+    def put(self, key: str, trackshape: Shape) -> None:
+        """
+        Adds a parsed shape to the cache and evicts old entries if the cache is too large.
+
+        Args:
+            key (str): The cache key, see `key`.
+            trackshape (Shape): The parsed shape. It must not have been modified yet.
+
+        Returns:
+            None
+        """
+        data = pickle.dumps(trackshape, protocol=pickle.HIGHEST_PROTOCOL)
+        self._write_entry(self._entry_path(key), data)
+
+    def get_text(self, key: str) -> Optional[str]:
+        """
+        Gets the serialized text of a parsed shape from the cache.
+
+        Args:
+            key (str): The cache key, see `key`.
+
+        Returns:
+            Optional[str]: The text written by `shapeio.dumps` for the unmodified shape,
+                or None if it is not in the cache.
+        """
+        text_entry_path = self._text_entry_path(key)
+
+        try:
+            with open(text_entry_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        try:
+            text = data.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+
+        try:
+            os.utime(text_entry_path)
+        except OSError:
+            pass
+
+        return text
+
+    def put_text(self, key: str, text: str) -> None:
+        """
+        Adds the serialized text of a parsed shape to the cache, and evicts old entries if the cache is too large.
+
+        Args:
+            key (str): The cache key, see `key`.
+            text (str): The text written by `shapeio.dumps` for the unmodified shape.
+
+        Returns:
+            None
+        """
+        self._write_entry(self._text_entry_path(key), text.encode("utf-8"))
+
+    def _write_entry(self, entry_path: Path, data: bytes) -> None:
+        os.makedirs(self.cache_path, exist_ok=True)
+
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._list_entries())
+
+        try:
+            replaced_size = os.stat(entry_path).st_size
+        except FileNotFoundError:
+            replaced_size = 0
+
+        # Several worker processes may add the same entry at once, so it is
+        # written to a temporary file first and renamed into place.
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_path, suffix=".tmp")
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+
+            os.replace(temp_path, entry_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        self._size += len(data) - replaced_size
+
+        if self._size > self.max_size:
+            self.evict()
+
+    def _list_entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+
+        for entry in os.scandir(self.cache_path):
+            if not entry.name.endswith((".pickle", ".txt")):
+                continue
+
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        return entries
+
+    def evict(self) -> None:
+        """
+        Removes the least recently used entries if the cache is larger than its size limit.
+
+        Entries are removed until the cache is down to `EVICT_TO_FRACTION` of the limit.
+
+        Returns:
+            None
+        """
+        entries = sorted(self._list_entries())
+        total_size = sum(size for _, size, _ in entries)
+
+        if total_size > self.max_size:
+            for _, size, entry_path in entries:
+                if total_size <= self.max_size * EVICT_TO_FRACTION:
+                    break
+
+                try:
+                    os.remove(entry_path)
+                except FileNotFoundError:
+                    pass
+
+                total_size -= size
+
+        self._size = total_size
+
+
+def open_shape_cache(config: configparser.ConfigParser) -> Optional[ShapeCache]:
+    """
+    Opens the parsed-shape cache configured in config.ini.
+
+    The cache is stored at `shape_cache_path` in the [build] section, and
+    limited to `shape_cache_size_mb` megabytes (2048 by default). It is only
+    opened once per process, so the size of its entries is kept track of.
+
+    Args:
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        Optional[ShapeCache]: The shape cache, or None if `shape_cache_path` is not set.
+    """
+    cache_path = config.get("build", "shape_cache_path", fallback=None)
+
+    if not cache_path:
+        return None
+
+    max_size_mb = config.getint("build", "shape_cache_size_mb", fallback=DEFAULT_SHAPE_CACHE_SIZE_MB)
+    key = (str(Path(cache_path).resolve()), max_size_mb)
+
+    if key not in _open_caches:
+        _open_caches[key] = ShapeCache(Path(cache_path), max_size_mb * 1024 * 1024)
+
+    return _open_caches[key]
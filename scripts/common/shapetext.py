@@ -0,0 +1,133 @@
+"""
+This file is part of DBTracks Extras.
+
+Copyright (C) 2026 Peter Grønbæk Andersen <peter@grnbk.io>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import re
+import numpy as np
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+
+
+# Same pattern as the point parser of shapeio, so the same tokens are read as floats.
+_POINT_PATTERN = re.compile(r"\bpoint\s*\(\s*([-+eE\d\.]+)\s+([-+eE\d\.]+)\s+([-+eE\d\.]+)\s*\)")
+
+# An entry of the images block, as written by shapeio.
+_IMAGE_LINE_PATTERN = re.compile(r"^([ \t]*image \( )(.*)( \))$", re.MULTILINE)
+
+# Same patterns as the image and prim_state parsers of shapeio.
+_IMAGE_PATTERN = re.compile(r"\bimage\s*\(\s*(.+?)\s*\)", re.IGNORECASE)
+_PRIM_STATE_PATTERN = re.compile(r"\bprim_state\s+(?:([\w.#-]+)\s*)?\(", re.IGNORECASE)
+
+_VERTICES_PATTERN = re.compile(r"\bvertices\s*\(\s*(\d+)", re.IGNORECASE)
+_VERTEX_IDXS_PATTERN = re.compile(r"\bvertex_idxs\s*\(\s*(\d+)", re.IGNORECASE)
+
+
+class ShapeDetails(NamedTuple):
+    """
+    What a shape contains, as read from its text by `shape_details`.
+
+    Attributes:
+        prim_states (List[Optional[str]]): Names of the prim_states of the shape, None for unnamed ones.
+        textures (List[str]): The texture images the shape references.
+        num_vertices (int): Number of vertices in all sub_objects of all distance levels.
+        num_triangles (int): Number of triangles in all primitives of all distance levels.
+    """
+    prim_states: List[Optional[str]]
+    textures: List[str]
+    num_vertices: int
+    num_triangles: int
+
+
+@lru_cache(maxsize=1)
+def point_heights(text: str) -> np.ndarray:
+    """
+    Reads the Y coordinates of all points of a shape from its text, without parsing the shape.
+
+    The result for the last text is kept, since all variants of a source shape look at the same text.
+
+    Args:
+        text (str): The decompressed text of a `.s` file.
+
+    Returns:
+        np.ndarray: The Y coordinate of every point, in the order of the points block. Read-only.
+    """
+    heights = np.array([float(match.group(2)) for match in _POINT_PATTERN.finditer(text)], dtype=np.float64)
+    heights.flags.writeable = False
+    return heights
+
+
+def replace_images(text: str, replacements: Dict[str, str]) -> Optional[str]:
+    """
+    Replaces texture images in the text of a shape serialized by shapeio.
+
+    The images are replaced in a single pass, the same way as `editing.replace_texture_images`
+    does on the parsed shape, so the result is the same as serializing the shape after that
+    call. The text must have been written by `shapeio.dumps`, since only its layout of the
+    images block is known.
+
+    Merging images and textures needs the parsed shape, so no text is returned if the
+    replacements give several images the same name.
+
+    Args:
+        text (str): The text of a shape, as written by `shapeio.dumps`.
+        replacements (Dict[str, str]): The new image for each old image (case-insensitive).
+
+    Returns:
+        Optional[str]: The text with the images replaced, or None if images would have to be merged.
+    """
+    new_images = {old_image.lower(): new_image for old_image, new_image in replacements.items()}
+    images = []
+    replaced_names = set()
+
+    def replace_image_line(match: re.Match) -> str:
+        image = match.group(2)
+        new_image = new_images.get(image.lower())
+
+        if new_image is not None:
+            image = new_image
+            replaced_names.add(image.lower())
+
+        images.append(image.lower())
+        return match.group(1) + image + match.group(3)
+
+    text = _IMAGE_LINE_PATTERN.sub(replace_image_line, text)
+
+    if any(images.count(name) > 1 for name in replaced_names):
+        return None
+
+    return text
+
+
+def shape_details(text: str) -> ShapeDetails:
+    """
+    Reads the prim_states, textures and vertex and triangle counts of a shape from its text, without parsing the shape.
+
+    Gives the same names and counts as the parsed shape has.
+
+    Args:
+        text (str): The decompressed text of a `.s` file.
+
+    Returns:
+        ShapeDetails: What the shape contains.
+    """
+    return ShapeDetails(
+        [match.group(1) for match in _PRIM_STATE_PATTERN.finditer(text)],
+        [match.group(1) for match in _IMAGE_PATTERN.finditer(text)],
+        sum(int(match.group(1)) for match in _VERTICES_PATTERN.finditer(text)),
+        sum(int(match.group(1)) // 3 for match in _VERTEX_IDXS_PATTERN.finditer(text)),
+    )
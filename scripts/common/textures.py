@@ -0,0 +1,325 @@
+"""
+This file is part of DBTracks Extras.
+
+Copyright (C) 2026 Peter Grønbæk Andersen <peter@grnbk.io>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import traceback
+import configparser
+import numpy as np
+from pathlib import Path
+from functools import partial
+from typing import List, NamedTuple, Optional, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PIL import Image, ImageChops, ImageOps
+
+from . import manifest, pipeline
+from .jobs import load_config
+
+
+class Offset(NamedTuple):
+    """
+    Shifts the image, wrapping around at the edges.
+
+    Attributes:
+        x (int): Pixels to shift right, negative to shift left.
+        y (int): Pixels to shift down, negative to shift up. Defaults to 0.
+    """
+    x: int
+    y: int = 0
+
+    def apply(self, image: Image.Image) -> Image.Image:
+        return ImageChops.offset(image, self.x, self.y)
+
+
+class Crop(NamedTuple):
+    """
+    Cuts out a rectangle of the image.
+
+    Textures with mipmaps must stay square with a power-of-two size.
+
+    Attributes:
+        left (int): Left edge of the rectangle.
+        top (int): Top edge of the rectangle.
+        right (int): Right edge of the rectangle, exclusive.
+        bottom (int): Bottom edge of the rectangle, exclusive.
+    """
+    left: int
+    top: int
+    right: int
+    bottom: int
+
+    def apply(self, image: Image.Image) -> Image.Image:
+        return image.crop((self.left, self.top, self.right, self.bottom))
+
+
+class Mirror(NamedTuple):
+    """
+    Mirrors the image.
+
+    Attributes:
+        vertical (bool): Flip top to bottom instead of left to right. Defaults to False.
+    """
+    vertical: bool = False
+
+    def apply(self, image: Image.Image) -> Image.Image:
+        return ImageOps.flip(image) if self.vertical else ImageOps.mirror(image)
+
+
+class Tint(NamedTuple):
+    """
+    Multiplies the colour channels of the image, e.g. (1.0, 1.0, 0.8) for a yellow tint.
+
+    Attributes:
+        red (float): Factor for the red channel.
+        green (float): Factor for the green channel.
+        blue (float): Factor for the blue channel.
+    """
+    red: float
+    green: float
+    blue: float
+
+    def apply(self, image: Image.Image) -> Image.Image:
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        pixels = np.array(image, dtype=np.float32)
+        pixels[:, :, :3] *= np.array([self.red, self.green, self.blue], dtype=np.float32)
+        return Image.fromarray(np.clip(np.rint(pixels), 0, 255).astype(np.uint8), image.mode)
+
+
+class AlphaMask(NamedTuple):
+    """
+    Makes a rectangle of the image transparent, or opaque.
+
+    An opaque source texture gets a mask when any of its pixels become transparent.
+
+    Attributes:
+        left (int): Left edge of the rectangle.
+        top (int): Top edge of the rectangle.
+        right (int): Right edge of the rectangle, exclusive.
+        bottom (int): Bottom edge of the rectangle, exclusive.
+        opaque (bool): Make the rectangle opaque instead of transparent. Defaults to False.
+    """
+    left: int
+    top: int
+    right: int
+    bottom: int
+    opaque: bool = False
+
+    def apply(self, image: Image.Image) -> Image.Image:
+        image = image.convert("RGBA")
+        alpha = image.getchannel("A")
+        alpha.paste(255 if self.opaque else 0, (self.left, self.top, self.right, self.bottom))
+        image.putalpha(alpha)
+        return image
+
+
+TextureOp = Union[Offset, Crop, Mirror, Tint, AlphaMask]
+
+
+class TextureDerivation(NamedTuple):
+    """
+    A texture made from a source texture by applying a list of ops in order.
+
+    Attributes:
+        texture_name (str): File name of the source texture in the textures input folder.
+        new_texture_name (str): File name of the texture to create in the textures output folder.
+        ops (Tuple[TextureOp, ...]): The ops to apply, in order.
+    """
+    texture_name: str
+    new_texture_name: str
+    ops: Tuple[TextureOp, ...]
+
+
+_worker_config: Optional[configparser.ConfigParser] = None
+
+
+def apply_ops(image: Image.Image, ops: Tuple[TextureOp, ...]) -> Image.Image:
+    """
+    Applies a list of ops to an image in order.
+
+    Args:
+        image (Image.Image): The image of the source texture.
+        ops (Tuple[TextureOp, ...]): The ops to apply.
+
+    Returns:
+        Image.Image: The new image.
+    """
+    for op in ops:
+        image = op.apply(image)
+
+    return image
+
+
+def derivation_paths(derivation: TextureDerivation, config: configparser.ConfigParser) -> Tuple[Path, Path]:
+    """
+    Finds the source texture and the texture to create of a derivation.
+
+    Args:
+        derivation (TextureDerivation): The derivation.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        Tuple[Path, Path]: Path of the source `.ace` file, and of the `.ace` file to create.
+    """
+    texture_input_path = Path(config["textures"]["input_path"])
+    texture_output_path = Path(config["textures"]["output_path"])
+
+    return texture_input_path / derivation.texture_name, texture_output_path / derivation.new_texture_name
+
+
+def derivation_record(script_path: str, derivation: TextureDerivation, config: configparser.ConfigParser) -> dict:
+    """
+    Describes everything that goes into creating the texture of a derivation.
+
+    The record covers the hash of the source texture and the list of ops, so a
+    derived texture is only created again when either of them changes.
+
+    Args:
+        script_path (str): Path of the script declaring the derivation.
+        derivation (TextureDerivation): The derivation.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        dict: The build record, see `manifest.make_record`.
+    """
+    ace_path, new_ace_path = derivation_paths(derivation, config)
+
+    return manifest.make_record(
+        output_paths=[new_ace_path],
+        input_paths=[ace_path],
+        script_path=script_path,
+        functions=[],
+        modules=manifest.TEXTURE_MODULES,
+        config=config,
+        parameters={"ops": repr(tuple(derivation.ops))}
+    )
+
+
+def derive_texture(derivation: TextureDerivation, config: configparser.ConfigParser) -> None:
+    """
+    Creates the texture of a derivation, see `pipeline.make_texture`.
+
+    Args:
+        derivation (TextureDerivation): The derivation.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        None
+    """
+    ace_path, new_ace_path = derivation_paths(derivation, config)
+    pipeline.make_texture(ace_path, new_ace_path, partial(apply_ops, ops=tuple(derivation.ops)), config)
+
+
+def _init_worker(config_path: str):
+    global _worker_config
+    _worker_config = load_config(config_path)
+
+
+def _derive_texture_in_worker(derivation: TextureDerivation) -> None:
+    derive_texture(derivation, _worker_config)
+
+
+def make_textures(
+    script_path: str,
+    derivations: List[TextureDerivation],
+    config: configparser.ConfigParser,
+    num_workers: Optional[int] = None,
+    config_path: str = "scripts/config.ini"
+) -> List[Tuple[TextureDerivation, str]]:
+    """
+    Creates the textures of a script that have changed since the last run.
+
+    Derivations whose source texture and ops are unchanged according to the build
+    manifest are skipped. The others are created on a pool of worker processes, or
+    in this process if only one of them has to be created. A failing derivation does
+    not stop the remaining ones.
+
+    Args:
+        script_path (str): Path of the script declaring the derivations.
+        derivations (List[TextureDerivation]): The textures to create.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+        num_workers (Optional[int], optional): Number of worker processes. Defaults to one per CPU.
+        config_path (str, optional): Path of the config file each worker reads.
+            Defaults to "scripts/config.ini".
+
+    Returns:
+        List[Tuple[TextureDerivation, str]]: The derivation and formatted traceback of every failed texture.
+    """
+    os.makedirs(Path(config["textures"]["output_path"]), exist_ok=True)
+
+    failures = []
+
+    with manifest.open_manifest(config) as build_manifest:
+        records = {}
+
+        for derivation in derivations:
+            try:
+                record = derivation_record(script_path, derivation, config)
+            except OSError:
+                # E.g. the source texture is missing, which only fails this derivation.
+                print(f"\tFailed {derivation.new_texture_name}, unable to read its source texture")
+                failures.append((derivation, traceback.format_exc()))
+                continue
+
+            if build_manifest.is_up_to_date(record):
+                print(f"\tSkipping {derivation.new_texture_name}, unchanged since the last run...")
+                continue
+
+            records[derivation] = record
+
+        if len(records) == 1:
+            derivation = next(iter(records))
+            print(f"\tCreating {derivation.new_texture_name}...")
+
+            try:
+                derive_texture(derivation, config)
+            except Exception:
+                failures.append((derivation, traceback.format_exc()))
+
+        elif records:
+            print(f"\tCreating {len(records)} textures...")
+
+            with ProcessPoolExecutor(
+                max_workers=num_workers,
+                initializer=_init_worker,
+                initargs=(config_path,)
+            ) as executor:
+                futures = {
+                    executor.submit(_derive_texture_in_worker, derivation): derivation
+                    for derivation in records
+                }
+
+                for num_finished, future in enumerate(as_completed(futures), start=1):
+                    derivation = futures[future]
+
+                    try:
+                        future.result()
+                        print(f"\tCreated {derivation.new_texture_name} ({num_finished} of {len(records)})")
+                    except Exception:
+                        print(f"\tFailed {derivation.new_texture_name} ({num_finished} of {len(records)})")
+                        failures.append((derivation, traceback.format_exc()))
+
+        failed_derivations = set(derivation for derivation, _ in failures)
+
+        for derivation, record in records.items():
+            if derivation not in failed_derivations:
+                build_manifest.update(record)
+
+    for derivation, error in failures:
+        print(f"\nFailed to create {derivation.new_texture_name}:\n{error}")
+
+    return failures
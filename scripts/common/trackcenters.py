@@ -0,0 +1,676 @@
+"""
+This file is part of DBTracks Extras.
+
+Copyright (C) 2026 Peter Grønbæk Andersen <peter@grnbk.io>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import re
+import math
+import codecs
+import tempfile
+import configparser
+import numpy as np
+import trackshapeutils as tsu
+from pathlib import Path
+from functools import lru_cache
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+from scipy.spatial import cKDTree
+from shapeio.shape import Point
+from trackshapeutils import Trackcenter
+
+
+TRACKCENTER_METHODS = ("analytic", "sampled")
+
+# Sampling density used by the sampled method.
+SAMPLED_POINTS_PER_METER = 12
+
+_trackcenters: Dict[Tuple[str, str], list] = {}
+_trackcenter_indexes: Dict[Tuple[str, str], Union["AnalyticTrackcenterIndex", "TrackcenterIndex"]] = {}
+
+
+class TrackcenterIndex:
+    """
+    A spatial index over the centerpoints of a set of trackcenters.
+
+    Build it once per set of trackcenters and reuse it for all vertices of a shape.
+    `find_closest_many` gives the same results as calling `tsu.find_closest_trackcenter`,
+    `tsu.find_closest_centerpoint` and `tsu.signed_distance_between` in turn for each
+    point, but the closest centerpoints are found with a KD-tree per trackcenter instead
+    of by measuring the distance to every centerpoint.
+
+    Args:
+        trackcenters (List[Trackcenter]): The trackcenters to index.
+        plane (str, optional): Plane in which to measure distances, either "xz" or "xy". Defaults to "xz".
+
+    Raises:
+        ValueError: If `plane` is not "xz" or "xy".
+    """
+
+    def __init__(self, trackcenters: List[Trackcenter], plane: str = "xz"):
+        if plane == "xz":
+            self._axes = [0, 2]
+        elif plane == "xy":
+            self._axes = [0, 1]
+        else:
+            raise ValueError("Invalid plane. Choose either 'xy' or 'xz'.")
+
+        self.plane = plane
+        self.trackcenters = [t for t in trackcenters if len(t.centerpoints) > 0]
+        self._centerpoints_2d = [t.centerpoints[:, self._axes] for t in self.trackcenters]
+        self._trees = [cKDTree(c) for c in self._centerpoints_2d]
+
+    def _closest_centerpoint_indices(self, trackcenter_idx: int, points_2d: np.ndarray) -> np.ndarray:
+        tree = self._trees[trackcenter_idx]
+        centerpoints_2d = self._centerpoints_2d[trackcenter_idx]
+
+        if len(centerpoints_2d) == 1:
+            return np.zeros(len(points_2d), dtype=int)
+
+        distances, indices = tree.query(points_2d, k=2)
+        closest_indices = indices[:, 0].copy()
+
+        # Where the two nearest centerpoints are (almost) equally close, measure the distances
+        # the same way as trackshapeutils does, so ties resolve to the same centerpoint.
+        maybe_tied = distances[:, 1] <= distances[:, 0] * (1 + 1e-9) + 1e-12
+
+        for point_idx in np.nonzero(maybe_tied)[0]:
+            point_2d = points_2d[point_idx]
+            radius = distances[point_idx, 0] * (1 + 1e-9) + 1e-12
+            candidates = sorted(tree.query_ball_point(point_2d, radius))
+            candidate_distances = np.linalg.norm(centerpoints_2d[candidates] - point_2d, axis=1)
+            closest_indices[point_idx] = candidates[int(np.argmin(candidate_distances))]
+
+        return closest_indices
+
+    def _signed_distances(self, points: np.ndarray, centerpoints: np.ndarray) -> np.ndarray:
+        # Row-wise version of tsu.signed_distance_between.
+        if self.plane == "xz":
+            points_proj = points * np.array([1.0, 0.0, 1.0])
+            centerpoints_proj = centerpoints * np.array([1.0, 0.0, 1.0])
+            reference_vector = np.array([0, 1, 0])
+        else:
+            points_proj = points * np.array([1.0, 1.0, 0.0])
+            centerpoints_proj = centerpoints * np.array([1.0, 1.0, 0.0])
+            reference_vector = np.array([1, 0, 0])
+
+        vectors_to_point = points_proj - centerpoints_proj
+        cross = np.cross(reference_vector, vectors_to_point)
+
+        return np.linalg.norm(vectors_to_point[:, :2], axis=1) * np.sign(cross[:, -1])
+
+    def _query(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        points_2d = points[:, self._axes]
+
+        closest_trackcenter_idxs = np.full(len(points), -1, dtype=int)
+        closest_centerpoint_idxs = np.zeros(len(points), dtype=int)
+        closest_signed_distances = np.zeros(len(points))
+        min_distances = np.full(len(points), np.inf)
+
+        for trackcenter_idx, trackcenter in enumerate(self.trackcenters):
+            centerpoint_idxs = self._closest_centerpoint_indices(trackcenter_idx, points_2d)
+            signed_distances = self._signed_distances(points, trackcenter.centerpoints[centerpoint_idxs])
+            distances = np.abs(signed_distances)
+
+            # Strictly closer, so the first trackcenter wins ties like in tsu.find_closest_trackcenter.
+            is_closer = distances < min_distances
+
+            min_distances[is_closer] = distances[is_closer]
+            closest_trackcenter_idxs[is_closer] = trackcenter_idx
+            closest_centerpoint_idxs[is_closer] = centerpoint_idxs[is_closer]
+            closest_signed_distances[is_closer] = signed_distances[is_closer]
+
+        return closest_trackcenter_idxs, closest_centerpoint_idxs, closest_signed_distances
+
+    def find_closest_many(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Finds the closest trackcenter and centerpoint to each of many points, and the signed distances to them.
+
+        Args:
+            points (np.ndarray): The reference points, shape (N, 3).
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: For each point the index of the closest
+                trackcenter in `trackcenters` (-1 if there are none), its closest centerpoint,
+                shape (N, 3), and the signed distance from the point to that centerpoint.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        trackcenter_idxs, centerpoint_idxs, signed_distances = self._query(points)
+
+        centerpoints = np.full((len(points), 3), np.nan)
+        for trackcenter_idx, trackcenter in enumerate(self.trackcenters):
+            is_closest = trackcenter_idxs == trackcenter_idx
+            centerpoints[is_closest] = trackcenter.centerpoints[centerpoint_idxs[is_closest]]
+
+        return trackcenter_idxs, centerpoints, signed_distances
+
+    def new_positions(self, new_signed_distance: float, points: np.ndarray, trackcenter_idxs: np.ndarray) -> np.ndarray:
+        """
+        Calculates positions at a signed lateral distance from the trackcenters, next to many points.
+
+        Same as calling `tsu.get_new_position_from_trackcenter` for each point.
+
+        Args:
+            new_signed_distance (float): Lateral distance from the trackcenters.
+            points (np.ndarray): The original points to map from, shape (N, 3).
+            trackcenter_idxs (np.ndarray): Index of the trackcenter of each point, e.g. as returned by `find_closest_many`.
+
+        Returns:
+            np.ndarray: The new positions, shape (N, 3).
+        """
+        new_points = [
+            tsu.get_new_position_from_trackcenter(new_signed_distance, Point.from_numpy(point), self.trackcenters[trackcenter_idx]).to_numpy()
+            for point, trackcenter_idx in zip(np.asarray(points, dtype=np.float64).reshape(-1, 3), trackcenter_idxs)
+        ]
+        return np.array(new_points, dtype=np.float64).reshape(-1, 3)
+
+
+class TrackSectionGeometry(NamedTuple):
+    """
+    A single straight or curved section of a track path, in the XZ plane.
+
+    Attributes:
+        start_x (float): X coordinate of the start of the section.
+        start_z (float): Z coordinate of the start of the section.
+        start_angle (float): Heading at the start of the section in degrees, as in tsection.dat.
+        length (float): Length of a straight section.
+        radius (Optional[float]): Radius of a curved section, None for straight sections.
+        angle (Optional[float]): Angle of a curved section in degrees, negative for right-hand curves.
+    """
+    start_x: float
+    start_z: float
+    start_angle: float
+    length: float
+    radius: Optional[float]
+    angle: Optional[float]
+
+
+class AnalyticTrackcenter:
+    """
+    The centerline of one track path, described by its straight and curved sections.
+
+    Points are projected onto the sections directly instead of searching the
+    closest of many sampled centerpoints. The sections follow the same conventions
+    as `tsu.generate_straight_centerpoints` and `tsu.generate_curve_centerpoints`,
+    so the sampled centerpoints of a path lie on its analytic centerline.
+
+    Args:
+        sections (List[TrackSectionGeometry]): The sections of the path, in order.
+        y (float): Height of the centerline.
+    """
+
+    def __init__(self, sections: List[TrackSectionGeometry], y: float = 0.0):
+        self.sections = sections
+        self.y = y
+
+    def __repr__(self):
+        return f"AnalyticTrackcenter(sections={self.sections}, y={self.y})"
+
+    def project(self, x: np.ndarray, z: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Finds the closest points on the centerline to points in the XZ plane.
+
+        Args:
+            x (np.ndarray): X coordinates of the points.
+            z (np.ndarray): Z coordinates of the points.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: X and Z of the closest points
+                on the centerline, and X and Z of the unit tangents of the centerline there.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        z = np.asarray(z, dtype=np.float64)
+
+        closest = None
+        min_distances = np.full(x.shape, np.inf)
+
+        for section in self.sections:
+            if section.radius is None:
+                result = _project_straight(section, x, z)
+            else:
+                result = _project_curve(section, x, z)
+
+            distances = np.hypot(x - result[0], z - result[1])
+
+            if closest is None:
+                closest = result
+                min_distances = distances
+                continue
+
+            # Strictly closer, so the first section wins ties.
+            is_closer = distances < min_distances
+            min_distances = np.where(is_closer, distances, min_distances)
+            closest = tuple(np.where(is_closer, new, old) for new, old in zip(result, closest))
+
+        return closest
+
+
+def _project_straight(section: TrackSectionGeometry, x: np.ndarray, z: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    angle = math.radians(section.start_angle)
+    tangent_x, tangent_z = -math.sin(angle), math.cos(angle)
+
+    t = (x - section.start_x) * tangent_x + (z - section.start_z) * tangent_z
+    t = np.clip(t, 0.0, section.length)
+
+    return (
+        section.start_x + t * tangent_x,
+        section.start_z + t * tangent_z,
+        np.full(x.shape, tangent_x),
+        np.full(x.shape, tangent_z),
+    )
+
+
+def _project_curve(section: TrackSectionGeometry, x: np.ndarray, z: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # Like tsu.generate_curve_centerpoints, the curve is built in a local frame where it
+    # starts at the origin heading along +Z, and then rotated by the start angle.
+    direction = -1 if section.angle < 0 else 1
+    radius = section.radius
+    max_phi = math.radians(abs(section.angle))
+
+    rotation = math.radians(section.start_angle) * direction
+    cos_r, sin_r = math.cos(rotation), math.sin(rotation)
+
+    center_x = section.start_x + cos_r * direction * radius
+    center_z = section.start_z + sin_r * direction * radius
+
+    # Points relative to the curve center, rotated back into the local frame.
+    local_x = cos_r * (x - center_x) + sin_r * (z - center_z)
+    local_z = -sin_r * (x - center_x) + cos_r * (z - center_z)
+
+    phi = np.arctan2(local_z, -direction * local_x)
+
+    # Outside of the arc the closest point is one of its ends, the start end on ties.
+    start_distances = np.hypot(local_x + direction * radius, local_z)
+    end_distances = np.hypot(local_x + direction * radius * math.cos(max_phi), local_z - radius * math.sin(max_phi))
+    end_phi = np.where(end_distances < start_distances, max_phi, 0.0)
+    phi = np.where((phi >= 0.0) & (phi <= max_phi), phi, end_phi)
+
+    point_local_x = -direction * radius * np.cos(phi)
+    point_local_z = radius * np.sin(phi)
+    tangent_local_x = direction * np.sin(phi)
+    tangent_local_z = np.cos(phi)
+
+    return (
+        center_x + cos_r * point_local_x - sin_r * point_local_z,
+        center_z + sin_r * point_local_x + cos_r * point_local_z,
+        cos_r * tangent_local_x - sin_r * tangent_local_z,
+        sin_r * tangent_local_x + cos_r * tangent_local_z,
+    )
+
+
+class AnalyticTrackcenterIndex:
+    """
+    Finds the closest point on a set of analytic trackcenters, with the same interface as `TrackcenterIndex`.
+
+    Each lookup projects the point onto every section directly, so the cost does not
+    depend on a sampling density and the results carry no sampling error.
+
+    Args:
+        trackcenters (List[AnalyticTrackcenter]): The trackcenters to search.
+    """
+
+    def __init__(self, trackcenters: List[AnalyticTrackcenter]):
+        self.trackcenters = trackcenters
+
+    def find_closest_many(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Finds the closest trackcenter and point on it to each of many points, and the signed lateral offsets from them.
+
+        The offset is positive to the left and negative to the right of the trackcenter,
+        relative to its direction, the same sign convention as `tsu.get_new_position_from_trackcenter`.
+
+        Args:
+            points (np.ndarray): The reference points, shape (N, 3).
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: For each point the index of the closest
+                trackcenter in `trackcenters` (-1 if there are none), the closest point on it,
+                shape (N, 3), and the signed lateral offset from the point to it.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        x, z = points[:, 0], points[:, 2]
+
+        trackcenter_idxs = np.full(len(points), -1, dtype=int)
+        closest_points = np.full((len(points), 3), np.nan)
+        signed_distances = np.zeros(len(points))
+        min_distances = np.full(len(points), np.inf)
+
+        for trackcenter_idx, trackcenter in enumerate(self.trackcenters):
+            center_x, center_z, tangent_x, tangent_z = trackcenter.project(x, z)
+            distances = np.hypot(x - center_x, z - center_z)
+
+            # Strictly closer, so the first trackcenter wins ties.
+            is_closer = distances < min_distances
+
+            min_distances[is_closer] = distances[is_closer]
+            trackcenter_idxs[is_closer] = trackcenter_idx
+            closest_points[is_closer] = np.stack([center_x, np.full(len(points), trackcenter.y), center_z], axis=1)[is_closer]
+            # The lateral direction is the tangent rotated a quarter turn, (-tangent_z, tangent_x).
+            lateral_offsets = (x - center_x) * -tangent_z + (z - center_z) * tangent_x
+            signed_distances[is_closer] = lateral_offsets[is_closer]
+
+        return trackcenter_idxs, closest_points, signed_distances
+
+    def new_positions(self, new_signed_distance: float, points: np.ndarray, trackcenter_idxs: np.ndarray) -> np.ndarray:
+        """
+        Calculates positions at a signed lateral offset from the trackcenters, next to many points.
+
+        Args:
+            new_signed_distance (float): Lateral offset from the trackcenters.
+            points (np.ndarray): The original points to map from, shape (N, 3).
+            trackcenter_idxs (np.ndarray): Index of the trackcenter of each point, e.g. as returned by `find_closest_many`.
+
+        Returns:
+            np.ndarray: The new positions, shape (N, 3).
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        trackcenter_idxs = np.asarray(trackcenter_idxs, dtype=int)
+        new_points = np.full((len(points), 3), np.nan)
+
+        for trackcenter_idx, trackcenter in enumerate(self.trackcenters):
+            is_on_trackcenter = trackcenter_idxs == trackcenter_idx
+
+            if not is_on_trackcenter.any():
+                continue
+
+            center_x, center_z, tangent_x, tangent_z = trackcenter.project(points[is_on_trackcenter, 0], points[is_on_trackcenter, 2])
+            new_points[is_on_trackcenter] = np.stack([
+                center_x - new_signed_distance * tangent_z,
+                np.full(len(center_x), trackcenter.y),
+                center_z + new_signed_distance * tangent_x,
+            ], axis=1)
+
+        return new_points
+
+
+@lru_cache(maxsize=None)
+def _global_tsection() -> Tuple[Dict[int, Tuple[float, Optional[float], Optional[float]]], Dict[str, str]]:
+    tsection_path = Path(tsu.__file__).parent / "tsection.dat"
+
+    with open(tsection_path, "rb") as f:
+        data = f.read()
+
+    encoding = "utf-16" if data.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)) else "utf-8"
+    tsection_text = data.decode(encoding).replace("\r\n", "\n")
+
+    # The same patterns as used by tsu.trackcenters_from_global_tsection.
+    tracksection_pattern = re.compile(
+        r"TrackSection\s*\(\s*(\d+)\s*\n"
+        r"\s*SectionSize\s*\(\s*([\d.]+)\s+([\d.]+)\s*\)\s*\n"
+        r"(\s*SectionCurve\s*\(\s*([\d.-]+)\s+([\d.-]+)\s*\)\s*\n)?"
+        r"\s*\)",
+        re.MULTILINE | re.DOTALL
+    )
+    trackshape_pattern = re.compile(r"TrackShape\s*\(\s*\d+\s*\n(.*?)\n\s*\)", re.DOTALL)
+    filename_pattern = re.compile(r"FileName\s*\(\s*(\S+?)\s*\)", re.IGNORECASE)
+
+    tracksections = {}
+    for match in tracksection_pattern.finditer(tsection_text):
+        radius = float(match.group(5)) if match.group(5) else None
+        angle = float(match.group(6)) if match.group(6) else None
+        tracksections.setdefault(int(match.group(1)), (float(match.group(3)), radius, angle))
+
+    trackshapes = {}
+    for trackshape_match in trackshape_pattern.findall(tsection_text):
+        for filename in filename_pattern.findall(trackshape_match):
+            trackshapes.setdefault(filename.lower(), trackshape_match)
+
+    return tracksections, trackshapes
+
+
+def analytic_trackcenters_from_global_tsection(shape_name: str) -> List[AnalyticTrackcenter]:
+    """
+    Creates analytic trackcenters for a track shape from the global tsection.dat bundled with trackshapeutils.
+
+    Gives the same paths as `tsu.trackcenters_from_global_tsection`, but as
+    straight and curved sections instead of sampled centerpoints.
+
+    Args:
+        shape_name (str): The name of the track shape in tsection.dat.
+
+    Returns:
+        List[AnalyticTrackcenter]: One trackcenter for each path of the track shape.
+
+    Raises:
+        ValueError: If the shape, or a TrackSection it refers to, is not found in tsection.dat.
+    """
+    tracksections, trackshapes = _global_tsection()
+
+    trackshape_text = trackshapes.get(shape_name.lower())
+    if trackshape_text is None:
+        raise ValueError(f"Unable to create trackcenters: Unknown shape '{shape_name}'")
+
+    trackcenters = []
+
+    for section_idx in re.findall(r"SectionIdx\s*\(\s*([^\)]*?)\s*\)", trackshape_text):
+        values = section_idx.split()
+        num_idxs = int(values[0])
+        current_x, current_y, current_z = map(float, values[1:4])
+        current_angle = float(values[4])
+        sections = []
+
+        for tracksection_idx in map(int, values[5:5 + num_idxs]):
+            if tracksection_idx not in tracksections:
+                raise ValueError(f"Unable to create trackcenters: Could not find TrackSection '{tracksection_idx}' defined by TrackShape '{shape_name}'")
+
+            length, radius, angle = tracksections[tracksection_idx]
+
+            if radius is not None and angle is not None:
+                section = TrackSectionGeometry(current_x, current_z, current_angle, length, radius, angle)
+                current_x, current_z = _curve_end(section)
+                current_angle += angle
+            else:
+                section = TrackSectionGeometry(current_x, current_z, current_angle, length, None, None)
+                current_x, current_z = _straight_end(section)
+
+            sections.append(section)
+
+        trackcenters.append(AnalyticTrackcenter(sections, current_y))
+
+    return trackcenters
+
+
+def _straight_end(section: TrackSectionGeometry) -> Tuple[float, float]:
+    angle = math.radians(section.start_angle)
+    return section.start_x - section.length * math.sin(angle), section.start_z + section.length * math.cos(angle)
+
+
+def _curve_end(section: TrackSectionGeometry) -> Tuple[float, float]:
+    direction = -1 if section.angle < 0 else 1
+    phi = math.radians(abs(section.angle))
+
+    local_x = direction * section.radius * (1 - math.cos(phi))
+    local_z = section.radius * math.sin(phi)
+
+    rotation = math.radians(section.start_angle) * direction
+    cos_r, sin_r = math.cos(rotation), math.sin(rotation)
+
+    return section.start_x + cos_r * local_x - sin_r * local_z, section.start_z + sin_r * local_x + cos_r * local_z
+
+
+def sampled_trackcenters_from_global_tsection(
+    shape_name: str,
+    num_points_per_meter: int,
+    cache_path: Optional[Path] = None
+) -> List[Trackcenter]:
+    """
+    Gets the sampled trackcenters of a track shape in the global tsection.dat, building them only once.
+
+    The trackcenters built by `tsu.trackcenters_from_global_tsection` are memoized
+    for the lifetime of the process. If `cache_path` is given, they are also stored
+    there as arrays in a `.npz` file, so later runs can load them instead of building them.
+
+    Args:
+        shape_name (str): The name of the track shape in tsection.dat.
+        num_points_per_meter (int): Sampling density of the centerpoints.
+        cache_path (Optional[Path], optional): Folder to persist the trackcenters in. Defaults to None.
+
+    Returns:
+        List[Trackcenter]: One trackcenter for each path of the track shape. They are
+            shared between callers and must not be modified.
+    """
+    key = (shape_name.lower(), str(num_points_per_meter))
+
+    if key not in _trackcenters:
+        def build() -> Dict[str, np.ndarray]:
+            trackcenters = tsu.trackcenters_from_global_tsection(shape_name=shape_name, num_points_per_meter=num_points_per_meter)
+            return {f"path_{idx}": t.centerpoints for idx, t in enumerate(trackcenters)}
+
+        arrays = _cached_arrays(key, build, cache_path)
+        _trackcenters[key] = [Trackcenter(arrays[f"path_{idx}"]) for idx in range(len(arrays))]
+
+    return _trackcenters[key]
+
+
+def cached_analytic_trackcenters_from_global_tsection(
+    shape_name: str,
+    cache_path: Optional[Path] = None
+) -> List[AnalyticTrackcenter]:
+    """
+    Gets the analytic trackcenters of a track shape in the global tsection.dat, building them only once.
+
+    Works like `sampled_trackcenters_from_global_tsection`, so a warm run
+    does not need to parse tsection.dat at all.
+
+    Args:
+        shape_name (str): The name of the track shape in tsection.dat.
+        cache_path (Optional[Path], optional): Folder to persist the trackcenters in. Defaults to None.
+
+    Returns:
+        List[AnalyticTrackcenter]: One trackcenter for each path of the track shape.
+    """
+    key = (shape_name.lower(), "analytic")
+
+    if key not in _trackcenters:
+        def build() -> Dict[str, np.ndarray]:
+            trackcenters = analytic_trackcenters_from_global_tsection(shape_name)
+            return {
+                f"path_{idx}": np.array(
+                    [[t.y, np.nan, np.nan, np.nan, np.nan, np.nan]] + [
+                        [s.start_x, s.start_z, s.start_angle, s.length,
+                         np.nan if s.radius is None else s.radius,
+                         np.nan if s.angle is None else s.angle]
+                        for s in t.sections
+                    ],
+                    dtype=np.float64
+                )
+                for idx, t in enumerate(trackcenters)
+            }
+
+        arrays = _cached_arrays(key, build, cache_path)
+        trackcenters = []
+
+        # The first row of each path holds its height, the other rows one section each.
+        for idx in range(len(arrays)):
+            rows = arrays[f"path_{idx}"].tolist()
+            sections = [
+                TrackSectionGeometry(
+                    start_x, start_z, start_angle, length,
+                    None if math.isnan(radius) else radius,
+                    None if math.isnan(angle) else angle
+                )
+                for start_x, start_z, start_angle, length, radius, angle in rows[1:]
+            ]
+            trackcenters.append(AnalyticTrackcenter(sections, rows[0][0]))
+
+        _trackcenters[key] = trackcenters
+
+    return _trackcenters[key]
+
+
+def _cached_arrays(
+    key: Tuple[str, str],
+    build: Callable[[], Dict[str, np.ndarray]],
+    cache_path: Optional[Path]
+) -> Dict[str, np.ndarray]:
+    if cache_path is None:
+        return build()
+
+    # The trackcenters depend on the tsection.dat bundled with trackshapeutils.
+    npz_path = Path(cache_path) / f"{key[0]}_{key[1]}_{tsu.__version__}.npz"
+
+    if npz_path.exists():
+        try:
+            with np.load(npz_path) as npz:
+                return {name: npz[name] for name in npz.files}
+        except (OSError, ValueError):
+            pass
+
+    arrays = build()
+
+    os.makedirs(npz_path.parent, exist_ok=True)
+
+    # Written to a temporary file first, as other worker processes may load the same file.
+    fd, temp_path = tempfile.mkstemp(dir=npz_path.parent, suffix=".tmp")
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+
+        os.replace(temp_path, npz_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return arrays
+
+
+def trackcenter_index_from_global_tsection(
+    shape_name: str,
+    config: configparser.ConfigParser
+) -> Union[AnalyticTrackcenterIndex, TrackcenterIndex]:
+    """
+    Gets a trackcenter index for a track shape in the global tsection.dat.
+
+    The `method` option in the [trackcenters] section of config.ini decides
+    whether the analytic trackcenters (the default) or the trackcenters sampled
+    by trackshapeutils are used. The sampled ones are kept to verify the analytic ones.
+    Both kinds are persisted in `trackcenter_cache_path` from the [build] section if it is set.
+
+    Many shapes share the same track layout, so the index of each shape name is
+    only created once per process and then reused.
+
+    Args:
+        shape_name (str): The name of the track shape in tsection.dat.
+        config (configparser.ConfigParser): The configuration read from config.ini.
+
+    Returns:
+        Union[AnalyticTrackcenterIndex, TrackcenterIndex]: The trackcenter index.
+
+    Raises:
+        ValueError: If the configured method is unknown.
+    """
+    method = config.get("trackcenters", "method", fallback="analytic")
+    key = (method, shape_name.lower())
+
+    if key in _trackcenter_indexes:
+        return _trackcenter_indexes[key]
+
+    cache_path = config.get("build", "trackcenter_cache_path", fallback=None)
+    cache_path = Path(cache_path) if cache_path else None
+
+    if method == "analytic":
+        trackcenters = cached_analytic_trackcenters_from_global_tsection(shape_name, cache_path)
+        trackcenter_index = AnalyticTrackcenterIndex(trackcenters)
+    elif method == "sampled":
+        trackcenters = sampled_trackcenters_from_global_tsection(shape_name, SAMPLED_POINTS_PER_METER, cache_path)
+        trackcenter_index = TrackcenterIndex(trackcenters, plane="xz")
+    else:
+        raise ValueError(f"Unknown trackcenter method '{method}', choose one of {TRACKCENTER_METHODS}")
+
+    _trackcenter_indexes[key] = trackcenter_index
+    return trackcenter_index
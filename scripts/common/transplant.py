@@ -0,0 +1,270 @@
+"""
+This file is part of DBTracks Extras.
+
+Copyright (C) 2026 Peter Grønbæk Andersen <peter@grnbk.io>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+from typing import Dict, NamedTuple, Tuple
+from shapeio.shape import Matrix, NormalIdx, Point, UVPoint, Vector, Vertex, VertexIdx
+
+from . import editing
+
+
+class TransplantGeometry(NamedTuple):
+    """
+    The vertices and triangles of a primitive, remapped into the coordinate system of another primitive.
+
+    Attributes:
+        points (np.ndarray): XYZ of each point, shape (P, 3).
+        uv_points (np.ndarray): UV of each UV point, shape (U, 2).
+        normals (np.ndarray): XYZ of each vertex normal, shape (N, 3).
+        vertex_points (np.ndarray): Row in `points` of each vertex, shape (V,).
+        vertex_uv_points (np.ndarray): Row in `uv_points` of each vertex, or -1 if it has none, shape (V,).
+        vertex_normals (np.ndarray): Row in `normals` of each vertex, shape (V,).
+        triangles (np.ndarray): The vertices of each triangle as rows into the vertex arrays, shape (T, 3).
+        face_normals (np.ndarray): XYZ of the face normal of each triangle, shape (T, 3).
+    """
+    points: np.ndarray
+    uv_points: np.ndarray
+    normals: np.ndarray
+    vertex_points: np.ndarray
+    vertex_uv_points: np.ndarray
+    vertex_normals: np.ndarray
+    triangles: np.ndarray
+    face_normals: np.ndarray
+
+
+# Remapped geometry for each source primitive, matrix pair and offset, see `remapped_geometry`.
+# The source primitive is kept with it, so its id is not reused while it is in the cache.
+_remapped_geometry: Dict[tuple, Tuple[object, TransplantGeometry]] = {}
+
+
+def remap_transform(from_matrix: Matrix, to_matrix: Matrix) -> np.ndarray:
+    """
+    Builds the transform from the coordinate system of one matrix into that of another.
+
+    This is the same transform as `shapeedit.math.coordinates.remap_point` applies to a
+    single point, so it can be applied to many points with one matrix product.
+
+    Args:
+        from_matrix (Matrix): The coordinate system the geometry is in.
+        to_matrix (Matrix): The coordinate system to remap the geometry into.
+
+    Returns:
+        np.ndarray: A 4x4 transform for column vectors of homogeneous coordinates.
+    """
+    old_matrix = from_matrix.to_numpy().astype(np.float32)
+    new_matrix = to_matrix.to_numpy().astype(np.float32)
+
+    M_old = np.eye(4, dtype=np.float32)
+    M_old[:3, :3] = old_matrix[:3, :].T
+    M_old[:3, 3] = old_matrix[3, :]
+
+    M_new = np.eye(4, dtype=np.float32)
+    M_new[:3, :3] = new_matrix[:3, :].T
+    M_new[:3, 3] = new_matrix[3, :]
+
+    return np.linalg.inv(M_new) @ M_old
+
+
+def remapped_geometry(
+    source_primitive,
+    to_matrix: Matrix,
+    offset: Tuple[float, float, float] = (0.0, 0.0, 0.0)
+) -> TransplantGeometry:
+    """
+    Remaps all vertices and triangles of a primitive into the coordinate system of another matrix.
+
+    Points and normals are each remapped with a single matrix product, the same way
+    `coordinates.remap_point` and `coordinates.remap_normal` remap them one at a time.
+    Face normals are calculated from the remapped points, and then remapped as well,
+    like a loop of `insert_triangle` calls followed by `remap_normal` gives them.
+
+    The result is cached for each source primitive, matrix pair and offset, so shapes that
+    receive the same geometry only have it remapped once per process.
+
+    Args:
+        source_primitive (_PrimitiveEditor): The primitive to take the geometry from.
+        to_matrix (Matrix): The coordinate system to remap the geometry into.
+        offset (Tuple[float, float, float], optional): Added to the points after remapping
+            them, in the new coordinate system. Defaults to (0.0, 0.0, 0.0).
+
+    Returns:
+        TransplantGeometry: The remapped geometry. Do not modify its arrays, since they are shared.
+    """
+    from_matrix = source_primitive.matrix
+    key = (
+        id(source_primitive._primitive),
+        tuple(from_matrix.to_numpy().reshape(-1).tolist()),
+        tuple(to_matrix.to_numpy().reshape(-1).tolist()),
+        tuple(offset),
+    )
+
+    if key in _remapped_geometry:
+        return _remapped_geometry[key][1]
+
+    arrays = editing.PrimitiveArrays(source_primitive)
+    transform = remap_transform(from_matrix, to_matrix)
+
+    homogeneous_points = np.hstack([arrays.points, np.ones((len(arrays.points), 1))])
+    points = (homogeneous_points @ transform.T)
+    points = points[:, :3] / points[:, 3:] + np.asarray(offset, dtype=np.float64)
+
+    normal_matrix = np.linalg.inv(transform[:3, :3]).T
+    normals = _normalized(arrays.normals @ normal_matrix.T)
+
+    # Face normals are rounded the same way as `calculate_face_normal` rounds them.
+    triangle_points = points[arrays.vertex_points[arrays.triangles]]
+    face_normals = np.cross(
+        triangle_points[:, 1] - triangle_points[:, 0],
+        triangle_points[:, 2] - triangle_points[:, 0]
+    ).reshape(-1, 3)
+    face_normals = np.round(_normalized(face_normals, min_length=1e-10), 4)
+    face_normals = _normalized(face_normals @ normal_matrix.T)
+
+    geometry = TransplantGeometry(
+        points=points,
+        uv_points=arrays.uv_points,
+        normals=normals,
+        vertex_points=arrays.vertex_points,
+        vertex_uv_points=arrays.vertex_uv_points,
+        vertex_normals=arrays.vertex_normals,
+        triangles=arrays.triangles,
+        face_normals=face_normals,
+    )
+
+    for array in geometry:
+        array.flags.writeable = False
+
+    _remapped_geometry[key] = (source_primitive._primitive, geometry)
+    return geometry
+
+
+def transplant_geometry(primitive, geometry: TransplantGeometry) -> int:
+    """
+    Appends remapped geometry to a primitive, with all vertices and triangles in a single batch.
+
+    The new vertices are inserted at the end of the vertex set of the primitive, like
+    `add_vertex` inserts them one at a time, and the vertex indices of all triangles in
+    the sub_object are shifted to make room for them. The new points, UV points and
+    normals are appended to the shape.
+
+    Args:
+        primitive (_PrimitiveEditor): The primitive to add the geometry to.
+        geometry (TransplantGeometry): The geometry, e.g. from `remapped_geometry`.
+
+    Returns:
+        int: The number of triangles that were added.
+    """
+    shape = primitive._parent._parent._parent._parent._shape
+    sub_object = primitive._parent._sub_object
+    num_vertices = len(geometry.vertex_points)
+
+    new_vertex_idx = _expand_vertex_set(sub_object, primitive._primitive, num_vertices)
+
+    for other_primitive in sub_object.primitives:
+        for x in other_primitive.indexed_trilist.vertex_idxs:
+            if x.vertex1_index >= new_vertex_idx:
+                x.vertex1_index += num_vertices
+            if x.vertex2_index >= new_vertex_idx:
+                x.vertex2_index += num_vertices
+            if x.vertex3_index >= new_vertex_idx:
+                x.vertex3_index += num_vertices
+
+    first_point_idx = len(shape.points)
+    first_uv_point_idx = len(shape.uv_points)
+    first_normal_idx = len(shape.normals)
+    first_face_normal_idx = first_normal_idx + len(geometry.normals)
+
+    shape.points.extend(Point(*row) for row in geometry.points.tolist())
+    shape.uv_points.extend(UVPoint(*row) for row in geometry.uv_points.tolist())
+    shape.normals.extend(Vector(*row) for row in geometry.normals.tolist())
+    shape.normals.extend(Vector(*row) for row in geometry.face_normals.tolist())
+
+    # Same flags and colours as `add_vertex` gives new vertices.
+    sub_object.vertices[new_vertex_idx:new_vertex_idx] = [
+        Vertex(
+            flags="00000000",
+            point_index=first_point_idx + point_row,
+            normal_index=first_normal_idx + normal_row,
+            colour1="ff969696",
+            colour2="ff808080",
+            vertex_uvs=[first_uv_point_idx + uv_point_row] if uv_point_row >= 0 else []
+        )
+        for point_row, uv_point_row, normal_row in zip(
+            geometry.vertex_points.tolist(),
+            geometry.vertex_uv_points.tolist(),
+            geometry.vertex_normals.tolist()
+        )
+    ]
+
+    indexed_trilist = primitive._primitive.indexed_trilist
+
+    for triangle_idx, (row1, row2, row3) in enumerate(geometry.triangles.tolist()):
+        indexed_trilist.vertex_idxs.append(VertexIdx(new_vertex_idx + row1, new_vertex_idx + row2, new_vertex_idx + row3))
+        indexed_trilist.normal_idxs.append(NormalIdx(first_face_normal_idx + triangle_idx, 3))
+        indexed_trilist.flags.append("00000000")
+
+    primitive._parent._sub_object_helper.update_geometry_info()
+
+    return len(geometry.triangles)
+
+
+def _normalized(vectors: np.ndarray, min_length: float = 0.0) -> np.ndarray:
+    # Vectors that are too short to normalize become zero vectors.
+    lengths = np.linalg.norm(vectors, axis=1, keepdims=True)
+    is_valid = lengths > min_length
+    return np.where(is_valid, vectors / np.where(is_valid, lengths, 1.0), 0.0)
+
+
+def _expand_vertex_set(sub_object, primitive, num_vertices: int) -> int:
+    # Same as shapeedit's `expand_vertexset`, for several vertices at once: the vertex
+    # set of the primitive's geometry node grows, and the vertex sets after it move.
+    geometry_nodes = sub_object.sub_object_header.geometry_info.geometry_nodes
+    primitive_idx = sub_object.primitives.index(primitive)
+
+    node_idx = None
+    total_prims = 0
+
+    for idx, geometry_node in enumerate(geometry_nodes):
+        total_prims += geometry_node.cullable_prims.num_prims
+        if total_prims > primitive_idx:
+            node_idx = idx
+            break
+
+    if node_idx is None:
+        raise ValueError("The primitive is not in any geometry node of its sub_object")
+
+    new_vertex_idx = None
+    total_vertex_count = 0
+    update_next_sets = False
+
+    for vertex_set in sub_object.vertex_sets:
+        if vertex_set.vtx_state == node_idx:
+            new_vertex_idx = vertex_set.vtx_start_index + vertex_set.vtx_count
+            vertex_set.vtx_count += num_vertices
+            update_next_sets = True
+
+        elif update_next_sets:
+            vertex_set.vtx_start_index = total_vertex_count
+
+        total_vertex_count = vertex_set.vtx_start_index + vertex_set.vtx_count
+
+    if new_vertex_idx is None:
+        raise ValueError("The primitive has no vertex set in its sub_object")
+
+    return new_vertex_idx
@@ -0,0 +1,305 @@
+"""
+This file is part of DBTracks Extras.
+
+Copyright (C) 2026 Peter Grønbæk Andersen <peter@grnbk.io>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+from typing import Dict, List, NamedTuple
+from shapeio.shape import Shape
+
+
+# Size of the FIFO post-transform vertex cache the ACMR is measured with.
+ACMR_CACHE_SIZE = 16
+
+# Parameters of the vertex scores used to order the triangles, from Tom Forsyth's
+# "Linear-Speed Vertex Cache Optimisation". The ordering models an LRU cache.
+_CACHE_SIZE = 32
+_CACHE_DECAY_POWER = 1.5
+_LAST_TRIANGLE_SCORE = 0.75
+_VALENCE_BOOST_SCALE = 2.0
+_VALENCE_BOOST_POWER = 0.5
+
+
+class TriangleOrderStats(NamedTuple):
+    """
+    How `optimize_triangle_order` changed the vertex cache use of a shape, or of several shapes added together.
+
+    Attributes:
+        num_triangles (int): Number of triangles in all primitives.
+        misses_before (int): Vertex cache misses of the triangles in their original order.
+        misses_after (int): Vertex cache misses of the triangles in their new order.
+    """
+    num_triangles: int = 0
+    misses_before: int = 0
+    misses_after: int = 0
+
+    def plus(self, other: "TriangleOrderStats") -> "TriangleOrderStats":
+        """
+        Adds the counts of two `TriangleOrderStats` together.
+
+        Args:
+            other (TriangleOrderStats): The counts to add.
+
+        Returns:
+            TriangleOrderStats: The sum of both counts.
+        """
+        return TriangleOrderStats(*(a + b for a, b in zip(self, other)))
+
+    def describe(self) -> str:
+        """
+        Describes the change of the average cache miss ratio (ACMR), the number of vertices transformed per triangle.
+
+        Returns:
+            str: E.g. "ACMR 1.52 -> 0.81".
+        """
+        num_triangles = max(self.num_triangles, 1)
+        return f"ACMR {self.misses_before / num_triangles:.2f} -> {self.misses_after / num_triangles:.2f}"
+
+
+def cache_misses(triangles: np.ndarray, cache_size: int = ACMR_CACHE_SIZE) -> int:
+    """
+    Counts the vertex cache misses of drawing triangles in order, with a FIFO cache.
+
+    Args:
+        triangles (np.ndarray): The vertex indices of each triangle, shape (T, 3).
+        cache_size (int, optional): Number of vertices in the cache. Defaults to `ACMR_CACHE_SIZE`.
+
+    Returns:
+        int: The number of vertices that had to be transformed.
+    """
+    cache = []
+    cached = set()
+    num_misses = 0
+
+    for vertex_idx in np.asarray(triangles, dtype=int).reshape(-1).tolist():
+        if vertex_idx in cached:
+            continue
+
+        num_misses += 1
+        cache.append(vertex_idx)
+        cached.add(vertex_idx)
+
+        if len(cache) > cache_size:
+            cached.discard(cache.pop(0))
+
+    return num_misses
+
+
+def optimized_triangle_order(triangles: np.ndarray) -> np.ndarray:
+    """
+    Finds a vertex cache friendly order of triangles, with Tom Forsyth's algorithm.
+
+    Each vertex is scored by its position in a simulated LRU cache and by how many of
+    its triangles are still to be drawn. The triangle with the highest total score of
+    its vertices is drawn next, which keeps the cache on one part of the mesh until
+    it is used up. Then the next part is started with its first triangle, like the
+    linear-time variants of the algorithm do, instead of searching all triangles.
+
+    Args:
+        triangles (np.ndarray): The vertex indices of each triangle, shape (T, 3).
+
+    Returns:
+        np.ndarray: The original index of each triangle in the new order, shape (T,).
+    """
+    triangles = np.asarray(triangles, dtype=int).reshape(-1, 3)
+    num_triangles = len(triangles)
+
+    if num_triangles <= 1:
+        return np.arange(num_triangles)
+
+    # Vertex indices local to the triangles, so the lists below stay small.
+    vertex_idxs, local_triangles = np.unique(triangles, return_inverse=True)
+    triangle_vertices = local_triangles.reshape(-1, 3).tolist()
+    num_vertices = len(vertex_idxs)
+
+    # The triangles still to be drawn that use each vertex. Dicts keep the order the
+    # triangles were added in, and drawn triangles are removed from them in O(1).
+    vertex_triangles: List[Dict[int, None]] = [{} for _ in range(num_vertices)]
+    for triangle_idx, vertices in enumerate(triangle_vertices):
+        for vertex in vertices:
+            vertex_triangles[vertex][triangle_idx] = None
+
+    cache_positions = [-1] * num_vertices
+    vertex_scores = [_vertex_score(-1, len(x)) for x in vertex_triangles]
+    triangle_scores = [sum(vertex_scores[v] for v in vertices) for vertices in triangle_vertices]
+    is_drawn = [False] * num_triangles
+
+    order = []
+    cache: List[int] = []
+    best_triangle = max(range(num_triangles), key=triangle_scores.__getitem__)
+
+    # Where to look for the next triangle to draw when none of the cached vertices has
+    # any left. All triangles before it have been drawn.
+    cursor = 0
+
+    while True:
+        order.append(best_triangle)
+        is_drawn[best_triangle] = True
+        drawn_vertices = triangle_vertices[best_triangle]
+
+        for vertex in drawn_vertices:
+            vertex_triangles[vertex].pop(best_triangle, None)
+
+        cache = drawn_vertices + [v for v in cache if v not in drawn_vertices]
+        evicted = cache[_CACHE_SIZE:]
+        cache = cache[:_CACHE_SIZE]
+
+        for vertex in evicted:
+            cache_positions[vertex] = -1
+            vertex_scores[vertex] = _vertex_score(-1, len(vertex_triangles[vertex]))
+
+        for position, vertex in enumerate(cache):
+            cache_positions[vertex] = position
+            vertex_scores[vertex] = _vertex_score(position, len(vertex_triangles[vertex]))
+
+        if len(order) == num_triangles:
+            break
+
+        # Only triangles using a vertex whose score changed have a new score, and
+        # the next triangle is most likely one of the triangles using the cache.
+        best_triangle = -1
+        best_score = -1.0
+        best_evicted_triangle = -1
+        best_evicted_score = -1.0
+
+        for vertex in cache + evicted:
+            for triangle_idx in vertex_triangles[vertex]:
+                score = sum(vertex_scores[v] for v in triangle_vertices[triangle_idx])
+
+                if cache_positions[vertex] >= 0:
+                    if score > best_score:
+                        best_triangle, best_score = triangle_idx, score
+                elif score > best_evicted_score:
+                    best_evicted_triangle, best_evicted_score = triangle_idx, score
+
+        if best_triangle < 0:
+            # Carry on with a part of the mesh that was just left, or else
+            # start on the next one instead of searching all triangles.
+            best_triangle = best_evicted_triangle
+
+        if best_triangle < 0:
+            while is_drawn[cursor]:
+                cursor += 1
+
+            best_triangle = cursor
+
+    return np.array(order, dtype=int)
+
+
+def optimize_triangle_order(trackshape: Shape) -> TriangleOrderStats:
+    """
+    Reorders the triangles and vertices of a shape to make better use of the GPU vertex cache.
+
+    The triangles of each primitive are put in the order of `optimized_triangle_order`,
+    unless that would cause more cache misses than the original order. Then the vertices
+    of each vertex set are put in the order they are first used by the triangles, so
+    vertices that are drawn together are also stored together. Vertices no triangle uses
+    are moved to the end of their vertex set.
+
+    Args:
+        trackshape (Shape): The shape to reorder.
+
+    Returns:
+        TriangleOrderStats: The number of triangles, and their cache misses before and after.
+    """
+    stats = TriangleOrderStats()
+
+    for lod_control in trackshape.lod_controls:
+        for distance_level in lod_control.distance_levels:
+            for sub_object in distance_level.sub_objects:
+                for primitive in sub_object.primitives:
+                    stats = stats.plus(_reorder_triangles(primitive.indexed_trilist))
+
+                _reorder_vertices(sub_object)
+
+    return stats
+
+
+def _vertex_score(cache_position: int, num_remaining_triangles: int) -> float:
+    if num_remaining_triangles == 0:
+        return -1.0
+
+    score = 0.0
+
+    if cache_position >= 3:
+        scaler = 1.0 / (_CACHE_SIZE - 3)
+        score = (1.0 - (cache_position - 3) * scaler) ** _CACHE_DECAY_POWER
+    elif cache_position >= 0:
+        # The vertices of the last triangle get a fixed score, so the order in
+        # which it was drawn does not matter.
+        score = _LAST_TRIANGLE_SCORE
+
+    return score + _VALENCE_BOOST_SCALE * num_remaining_triangles ** -_VALENCE_BOOST_POWER
+
+
+def _trilist_triangles(indexed_trilist) -> np.ndarray:
+    return np.array([
+        (x.vertex1_index, x.vertex2_index, x.vertex3_index)
+        for x in indexed_trilist.vertex_idxs
+    ], dtype=int).reshape(-1, 3)
+
+
+def _reorder_triangles(indexed_trilist) -> TriangleOrderStats:
+    triangles = _trilist_triangles(indexed_trilist)
+    misses_before = cache_misses(triangles)
+
+    order = optimized_triangle_order(triangles)
+    misses_after = cache_misses(triangles[order])
+
+    if misses_after >= misses_before:
+        return TriangleOrderStats(len(triangles), misses_before, misses_before)
+
+    order = order.tolist()
+    indexed_trilist.vertex_idxs[:] = [indexed_trilist.vertex_idxs[idx] for idx in order]
+    indexed_trilist.normal_idxs[:] = [indexed_trilist.normal_idxs[idx] for idx in order]
+    indexed_trilist.flags[:] = [indexed_trilist.flags[idx] for idx in order]
+
+    return TriangleOrderStats(len(triangles), misses_before, misses_after)
+
+
+def _reorder_vertices(sub_object) -> None:
+    num_vertices = len(sub_object.vertices)
+    first_uses = np.full(num_vertices, np.iinfo(int).max, dtype=np.int64)
+
+    primitive_vertices = [_trilist_triangles(p.indexed_trilist).reshape(-1) for p in sub_object.primitives]
+    used_vertices = np.concatenate(primitive_vertices) if primitive_vertices else np.zeros(0, dtype=int)
+    unique_vertices, first_use = np.unique(used_vertices, return_index=True)
+    first_uses[unique_vertices] = first_use
+
+    # Vertices stay within their vertex set, ordered by first use. Unused vertices
+    # keep their order after the used ones.
+    new_order = np.arange(num_vertices)
+
+    for vertex_set in sub_object.vertex_sets:
+        start_idx = vertex_set.vtx_start_index
+        end_idx = min(start_idx + vertex_set.vtx_count, num_vertices)
+        set_vertices = np.arange(start_idx, end_idx)
+        new_order[start_idx:end_idx] = set_vertices[np.argsort(first_uses[start_idx:end_idx], kind="stable")]
+
+    if (new_order == np.arange(num_vertices)).all():
+        return
+
+    vertex_remap = np.empty(num_vertices, dtype=int)
+    vertex_remap[new_order] = np.arange(num_vertices)
+
+    for primitive in sub_object.primitives:
+        for x in primitive.indexed_trilist.vertex_idxs:
+            x.vertex1_index = int(vertex_remap[x.vertex1_index])
+            x.vertex2_index = int(vertex_remap[x.vertex2_index])
+            x.vertex3_index = int(vertex_remap[x.vertex3_index])
+
+    sub_object.vertices[:] = [sub_object.vertices[idx] for idx in new_order.tolist()]
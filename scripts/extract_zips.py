@@ -17,70 +17,395 @@ You should have received a copy of the GNU General Public License
 along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 
+import os
+import sys
 import shutil
 import zipfile
+import argparse
 import tempfile
 import configparser
-from unrar.cffi import rarfile
-from pathlib import Path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path, PurePosixPath, PureWindowsPath
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+from unrar.cffi.unrarlib import FLAGS_RHDF_DIRECTORY, RarArchive
 
+sys.path.append(str(Path(__file__).resolve().parent))
 
-def extract_from_rars(
-    rar_paths: list[Path],
+from common import manifest
+from common.jobs import SCRIPTS
+from common.inputs import InputSelection, script_inputs
+
+
+# Size of the blocks in which archive members are copied.
+CHUNK_SIZE = 1024 * 1024
+
+
+class ExtractedMember(NamedTuple):
+    """
+    An archive member that was extracted, or that did not have to be.
+
+    Attributes:
+        staged_path (Optional[Path]): The staging file holding the contents of the member,
+            or None if the destination already held them.
+        dest (Path): Path of the file to extract the member to.
+        member (str): Name of the member inside the archive.
+        crc (int): CRC-32 of the member.
+        size (int): Uncompressed size of the member.
+    """
+    staged_path: Optional[Path]
+    dest: Path
+    member: str
+    crc: int
+    size: int
+
+
+def target_folder(
+    member_name: str,
+    targets: Dict[str, Path],
+    selection: Optional[InputSelection] = None
+) -> Optional[Path]:
+    """
+    Finds the destination folder of an archive member by its file extension.
+
+    Args:
+        member_name (str): Name of the member inside the archive.
+        targets (Dict[str, Path]): File extensions (e.g. ".s", ".sd", ".ace") and their destination folders.
+        selection (Optional[InputSelection], optional): If given, only extract the members it selects. Defaults to None.
+
+    Returns:
+        Optional[Path]: The destination folder, or None if the member should not be extracted.
+    """
+    if selection is not None and not selection.selects(member_name):
+        return None
+
+    filename = member_name.lower()
+
+    for ext, dest_folder in targets.items():
+        if filename.endswith(ext):
+            return dest_folder
+
+    return None
+
+
+def stream_rars_from_zip(zip_path: Path, temp_path: Path) -> Iterator[Tuple[str, Path]]:
+    """
+    Copies the RAR members of a zip file to a temporary folder, one at a time.
+
+    Only the `.rar` members are read, and they are copied in chunks, so neither the
+    rest of the zip file nor a whole RAR archive is ever held in memory. The next
+    RAR is not copied until the caller asks for it, which lets the caller bound
+    how many of them are on disk at once.
+
+    Args:
+        zip_path (Path): Path of the zip file.
+        temp_path (Path): Folder to copy the RAR archives to.
+
+    Yields:
+        Tuple[str, Path]: The name of each RAR archive inside the zip file, and the path
+            it was copied to. The caller is responsible for removing the copy.
+
+    Raises:
+        FileNotFoundError: If the zip file does not exist.
+        zipfile.BadZipFile: If the zip file is corrupted.
+    """
+    with zipfile.ZipFile(zip_path, "r") as z:
+        for idx, info in enumerate(z.infolist()):
+            if info.is_dir() or not info.filename.lower().endswith(".rar"):
+                continue
+
+            rar_path = temp_path / f"{zip_path.stem}_{idx}_{PurePosixPath(info.filename).name}"
+
+            with z.open(info) as src, open(rar_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+            yield info.filename, rar_path
+
+
+def extract_from_rar(
+    rar_path: Path,
+    targets: Dict[str, Path],
+    staging_tag: str,
+    known_files: Dict[str, Tuple[int, int]],
+    only: Optional[Set[Path]] = None,
+    selection: Optional[InputSelection] = None
+) -> List[ExtractedMember]:
+    """
+    Extracts selected file types from a RAR archive into staging files next to their destinations.
+
+    The archive is read in a single pass, and each member is written to disk in the
+    chunks the decompressor produces, so memory use does not depend on the member size.
+    Members whose destination already holds a file with the same CRC and size are not
+    decompressed at all. Nested directories inside the RAR archive are flattened like
+    before. The staging files are renamed into place by `commit_members`, so that the
+    results of archives extracted in parallel can be applied in a fixed order.
+
+    Args:
+        rar_path (Path): Path of the RAR archive.
+        targets (Dict[str, Path]): File extensions (e.g. ".s", ".sd", ".ace") and their destination folders.
+        staging_tag (str): Tag for the names of the staging files, unique per archive.
+        known_files (Dict[str, Tuple[int, int]]): CRC and size of the files that are
+            already extracted, see `ExtractionManifest.known_files`.
+        only (Optional[Set[Path]], optional): If given, only extract members to these destinations. Defaults to None.
+        selection (Optional[InputSelection], optional): If given, only extract the members it selects. Defaults to None.
+
+    Returns:
+        List[ExtractedMember]: The extracted members, in archive order.
+
+    Raises:
+        BadRarFile: If the RAR archive is corrupted or cannot be opened.
+    """
+    extracted: Dict[Path, ExtractedMember] = {}
+
+    try:
+        with RarArchive.open_for_processing(str(rar_path)) as rar:
+            for header in rar.iterate_headers():
+                dest_folder = target_folder(header.FileNameW, targets, selection)
+
+                if dest_folder is None or header.Flags & FLAGS_RHDF_DIRECTORY:
+                    header.skip()
+                    continue
+
+                dest = dest_folder / PureWindowsPath(header.FileNameW).name
+                crc = header.FileCRC
+                size = header.UnpSize + (header.UnpSizeHigh << 32)
+
+                if only is not None and dest not in only:
+                    header.skip()
+                    continue
+
+                if only is None and known_files.get(str(dest)) == (crc, size):
+                    header.skip()
+                    extracted[dest] = ExtractedMember(None, dest, header.FileNameW, crc, size)
+                    continue
+
+                staged_path = dest_folder / f".{dest.name}.{staging_tag}.tmp"
+                dest_folder.mkdir(parents=True, exist_ok=True)
+
+                with open(staged_path, "wb") as f:
+                    header.test(f.write)
+
+                extracted[dest] = ExtractedMember(staged_path, dest, header.FileNameW, crc, size)
+    except BaseException:
+        discard_members(list(extracted.values()))
+        raise
+
+    return list(extracted.values())
+
+
+def commit_members(
+    members: List[ExtractedMember],
+    archive_path: Path,
+    member_prefix: str,
+    extraction_manifest: manifest.ExtractionManifest
+) -> List[Path]:
+    """
+    Renames the staging files of extracted members to their destinations, and records them in the manifest.
+
+    Members that are shadowed by a later archive that is skipped in this run are discarded.
+
+    Args:
+        members (List[ExtractedMember]): The extracted members, in archive order.
+        archive_path (Path): The zip file the members come from.
+        member_prefix (str): Prefix for the member names in the manifest, e.g. the name of the RAR archive.
+        extraction_manifest (manifest.ExtractionManifest): The extraction manifest.
+
+    Returns:
+        List[Path]: Destinations of members that were not extracted because they were
+            unchanged, but that have been overwritten since by an earlier member in this run.
+    """
+    stale = []
+
+    for member in members:
+        if extraction_manifest.is_shadowed(member.dest, archive_path):
+            discard_members([member])
+            continue
+
+        if member.staged_path is None:
+            if not extraction_manifest.file_matches(member.dest, member.crc, member.size):
+                stale.append(member.dest)
+                continue
+        else:
+            os.replace(member.staged_path, member.dest)
+            print(f"  Copied {member.dest.name} to {member.dest.parent}")
+
+        extraction_manifest.record_file(member.dest, archive_path, member_prefix + member.member, member.crc, member.size)
+
+    return stale
+
+
+def discard_members(members: List[ExtractedMember]) -> None:
+    """
+    Removes the staging files of extracted members that will not be renamed into place.
+
+    Args:
+        members (List[ExtractedMember]): The extracted members.
+
+    Returns:
+        None
+    """
+    for member in members:
+        if member.staged_path is not None and member.staged_path.exists():
+            member.staged_path.unlink()
+
+
+def extract_from_zips(
+    zip_paths: List[Path],
     temp_path: Path,
-    targets: dict[str, Path]
-):
+    targets: Dict[str, Path],
+    num_workers: int,
+    extraction_manifest: manifest.ExtractionManifest,
+    selection: Optional[InputSelection] = None
+) -> None:
+    """
+    Extracts selected file types from the RAR archives nested inside zip files.
+
+    The RAR archives are streamed out of the zip files one at a time and extracted on
+    a pool of worker processes. At most one more RAR archive than there are workers is
+    on disk at a time, so the temporary disk and memory use are bounded by the number
+    of workers rather than by the size of the zip files. Results are applied in the
+    order of the archives, so when several archives contain a file with the same
+    name, the last one wins like when extracting them one after another.
+
+    Files that are unchanged according to the extraction manifest are not written again.
+
+    Args:
+        zip_paths (List[Path]): The zip files to extract.
+        temp_path (Path): Temporary folder for the RAR archives.
+        targets (Dict[str, Path]): File extensions (e.g. ".s", ".sd", ".ace") and their destination folders.
+        num_workers (int): Number of worker processes.
+        extraction_manifest (manifest.ExtractionManifest): The extraction manifest.
+        selection (Optional[InputSelection], optional): If given, only extract the members it selects. Defaults to None.
+
+    Returns:
+        None
+
+    Raises:
+        FileNotFoundError: If one of the zip files does not exist.
+        BadRarFile: If a RAR archive is corrupted or cannot be opened.
+    """
+    targets = {ext: dest_folder.resolve() for ext, dest_folder in targets.items()}
+    known_files = extraction_manifest.known_files()
+    selection_key = selection.key() if selection is not None else None
+    pending: deque = deque()
+
+    def finish_oldest():
+        zip_path, rar_name, rar_path, future = pending.popleft()
+        stale = commit_members(future.result(), zip_path, rar_name + "/", extraction_manifest)
+
+        if stale:
+            members = extract_from_rar(rar_path, targets, rar_path.stem, {}, only=set(stale), selection=selection)
+            commit_members(members, zip_path, rar_name + "/", extraction_manifest)
+
+        rar_path.unlink()
+        print(f"Finished {rar_path.name}\n")
+
+        if not any(p[0] == zip_path for p in pending):
+            extraction_manifest.record_archive(zip_path, selection_key)
+
+    try:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            for zip_path in zip_paths:
+                print(f"Extracting ZIP: {zip_path}")
+
+                for rar_name, rar_path in stream_rars_from_zip(zip_path, temp_path):
+                    print(f"Processing RAR: {rar_path.name}")
+                    future = executor.submit(
+                        extract_from_rar, rar_path, targets, rar_path.stem, known_files, selection=selection
+                    )
+                    pending.append((zip_path, rar_name, rar_path, future))
+
+                    while len(pending) > num_workers:
+                        finish_oldest()
+
+                if not any(p[0] == zip_path for p in pending):
+                    # All RAR archives were already finished, or there were none.
+                    extraction_manifest.record_archive(zip_path, selection_key)
+
+            while pending:
+                finish_oldest()
+    finally:
+        # Only reached with pending archives if something failed.
+        for _, _, _, future in pending:
+            if not future.cancelled() and future.exception() is None:
+                discard_members(future.result())
+
+
+def extract_folders_from_zip(
+    zip_path: Path,
+    folders: Dict[str, Path],
+    extraction_manifest: manifest.ExtractionManifest,
+    selection: Optional[InputSelection] = None
+) -> None:
     """
-    Extract selected file types from a list of RAR archives into destination folders.
+    Extracts the files inside some folders of a zip file into destination folders.
 
-    This function scans each RAR archive for files matching specific extensions,
-    extracts matching files into a temporary directory, and copies the final
-    extracted files into the configured output folders. Nested directories inside
-    the RAR archives are fully supported.
+    Files are streamed from the zip file in chunks, and subfolders are flattened.
+    Files that are unchanged according to the extraction manifest are not written again.
 
     Args:
-        rar_paths (list[Path]):
-            A list of paths to RAR files that should be processed.
-        temp_path (Path):
-            A temporary directory where RAR members are extracted before final copy.
-        targets (dict[str, Path]):
-            A mapping where keys are file extensions (e.g., ".s", ".sd", ".ace")
-            and values are the destination folders where extracted files should
-            be copied.
+        zip_path (Path): Path of the zip file.
+        folders (Dict[str, Path]): Folders inside the zip file (e.g. "a/GLOBAL/shapes/")
+            and the destination folders for their files.
+        extraction_manifest (manifest.ExtractionManifest): The extraction manifest.
+        selection (Optional[InputSelection], optional): If given, only extract the files it selects. Defaults to None.
 
     Returns:
-        None: The function performs file extraction and copying as a side effect.
+        None
 
     Raises:
-        FileNotFoundError: If any of the provided RAR paths do not exist.
-        rarfile.Error: If a RAR archive is corrupted or cannot be opened.
-        shutil.Error: If copying extracted files fails.
+        FileNotFoundError: If the zip file does not exist.
+        zipfile.BadZipFile: If the zip file is corrupted.
     """
-    for rar_file in rar_paths:
-        print(f"Processing RAR: {rar_file}")
+    with zipfile.ZipFile(zip_path, "r") as z:
+        for info in z.infolist():
+            if info.is_dir():
+                continue
+
+            if selection is not None and not selection.selects(info.filename):
+                continue
 
-        rf = rarfile.RarFile(str(rar_file))
-        for member in rf.infolist():
-            filename = member.filename.lower()
+            for folder, dest_folder in folders.items():
+                if not info.filename.startswith(folder):
+                    continue
 
-            for ext, dest_folder in targets.items():
-                if filename.endswith(ext):
-                    if member.is_dir():
-                        continue
+                dest = dest_folder.resolve() / PurePosixPath(info.filename).name
 
-                    data = rf.read(member.filename)
-                    dest = dest_folder / Path(member.filename).name
-                    dest.parent.mkdir(parents=True, exist_ok=True)
+                if extraction_manifest.file_matches(dest, info.CRC, info.file_size):
+                    member = ExtractedMember(None, dest, info.filename, info.CRC, info.file_size)
+                else:
+                    staged_path = dest.parent / f".{dest.name}.tmp"
 
-                    with open(dest, "wb") as f:
-                        f.write(data)
-                    
-                    print(f"  Copied {member.filename} to {dest_folder}")
+                    with z.open(info) as src, open(staged_path, "wb") as dst:
+                        shutil.copyfileobj(src, dst, CHUNK_SIZE)
 
-        print(f"Finished {rar_file}\n")
+                    member = ExtractedMember(staged_path, dest, info.filename, info.CRC, info.file_size)
+
+                commit_members([member], zip_path, "", extraction_manifest)
+
+    extraction_manifest.record_archive(zip_path, selection.key() if selection is not None else None)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract the shapes and textures from the DBTracks and ATracks packages.")
+    parser.add_argument(
+        "--jobs", "-j",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes that extract RAR archives. Defaults to the number of CPUs."
+    )
+    parser.add_argument(
+        "--only-needed",
+        nargs="*",
+        metavar="SCRIPT",
+        default=None,
+        help="Only extract the shapes and textures that the given conversion scripts read. Defaults to the scripts run by run_all.py."
+    )
+    args = parser.parse_args()
+
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
     config = configparser.ConfigParser()
     config.read("scripts/config.ini")
 
@@ -101,6 +426,7 @@ if __name__ == "__main__":
         Path(config["dbtracks"]["dr2_zip_path"]),
         Path(config["dbtracks"]["nrzubehoer_zip_path"])
     ]
+    atracks_zip_path = Path(config["atracks"]["atracks_zip_path"])
 
     targets = {
         ".s": shape_input_path,
@@ -108,42 +434,37 @@ if __name__ == "__main__":
         ".ace": texture_input_path
     }
 
-    # DBTracks packages
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-
-        for zip_file in zipfile_paths:
-            print(f"Extracting ZIP: {zip_file}")
-            with zipfile.ZipFile(zip_file, 'r') as z:
-                z.extractall(temp_path)
-
-        rar_files = list(temp_path.rglob("*.rar"))
-        extract_from_rars(rar_files, temp_path, targets)
-
-    # ATracks package
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-        atracks_zip_path = Path(config["atracks"]["atracks_zip_path"])
-
-        print(f"Extracting ZIP: {atracks_zip_path}")
-        with zipfile.ZipFile(atracks_zip_path, 'r') as z:
-            z.extractall(temp_path)
-
-        shapes_src = temp_path / "default-track-ATrack" / "GLOBAL" / "shapes"
-        textures_src = temp_path / "default-track-ATrack" / "GLOBAL" / "textures"
-
-        if shapes_src.is_dir():
-            for file in shapes_src.rglob("*"):
-                if file.is_file():
-                    dest = shape_input_path / file.name
-                    shutil.copy(file, dest)
-                    print(f"Copied {file.name} into {shape_input_path}")
-
-        if textures_src.is_dir():
-            for file in textures_src.rglob("*"):
-                if file.is_file():
-                    dest = texture_input_path / file.name
-                    shutil.copy(file, dest)
-                    print(f"Copied {file.name} into {texture_input_path}")
+    selection = None
+    selection_key = None
+
+    if args.only_needed is not None:
+        selection = script_inputs(args.only_needed or SCRIPTS)
+        selection_key = selection.key()
+
+    with manifest.open_extraction_manifest(config) as extraction_manifest:
+        changed_zip_paths = extraction_manifest.plan(zipfile_paths + [atracks_zip_path], selection_key)
+
+        for zip_path in zipfile_paths + [atracks_zip_path]:
+            if zip_path not in changed_zip_paths:
+                print(f"Skipping ZIP: {zip_path}, unchanged since the last extraction")
+
+        # DBTracks packages
+        with tempfile.TemporaryDirectory() as temp_dir:
+            extract_from_zips(
+                [p for p in zipfile_paths if p in changed_zip_paths],
+                Path(temp_dir),
+                targets,
+                args.jobs,
+                extraction_manifest,
+                selection
+            )
+
+        # ATracks package
+        if atracks_zip_path in changed_zip_paths:
+            print(f"Extracting ZIP: {atracks_zip_path}")
+            extract_folders_from_zip(atracks_zip_path, {
+                "default-track-ATrack/GLOBAL/shapes/": shape_input_path,
+                "default-track-ATrack/GLOBAL/textures/": texture_input_path
+            }, extraction_manifest, selection)
 
     print("\nAll extraction complete!")
@@ -19,23 +19,74 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 
 import os
 import sys
+import argparse
 import subprocess
 
+from common import manifest, pipeline
+from common.jobs import SCRIPTS, load_config, load_script, run_jobs_parallel
+from common.fanout import group_jobs_by_source
+
+
 if __name__ == "__main__":
-    scripts = [
-        "scripts/DBxb/convert_db1s_to_db1b.py",
-        "scripts/DBxb/convert_db1s_to_db2b.py",
-        "scripts/DBxb/convert_db1s_to_db10b.py",
-        "scripts/DBxb/convert_db1s_to_db20b.py",
-        "scripts/DBxb/convert_db1s_to_db22b.py",
-        "scripts/DBxfb/convert_db1s_to_db1fb.py",
-        "scripts/DBxfb/convert_db1s_to_db2fb.py",
-        "scripts/DBxfb/convert_db1s_to_db10fb.py",
-        "scripts/DBxfb/convert_db1s_to_db20fb.py",
-        "scripts/DBxfb/convert_db1s_to_db22fb.py",
-        "scripts/V4hs1t_RKL/convert_db1z1t_to_v4hs1trkl.py",
-        "scripts/Xover7_5d/make_ohw_xover7_5d.py",
-    ]
+    parser = argparse.ArgumentParser(description="Run all conversion scripts.")
+    parser.add_argument(
+        "--jobs", "-j",
+        type=int,
+        default=None,
+        help="Create the shapes of all scripts on a pool of N worker processes instead of running the scripts one after another."
+    )
+    args = parser.parse_args()
+
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    scripts = SCRIPTS
+
+    if args.jobs is None:
+        for s in scripts:
+            subprocess.run([sys.executable, s], cwd=os.getcwd())
+        sys.exit(0)
+
+    config = load_config()
+    build_manifest = manifest.open_manifest(config)
+
+    script_jobs = []
+    records = {}
+    num_skipped = 0
 
     for s in scripts:
-        subprocess.run([sys.executable, s], cwd=os.getcwd())
\ No newline at end of file
+        print(f"Finding shapes for ./{s}")
+        module = load_script(s)
+
+        for job in module.make_jobs(config):
+            record = manifest.job_record(s, module.process_trackshape, job, config, getattr(module, "job_dependencies", None))
+
+            if build_manifest.is_up_to_date(record):
+                num_skipped += 1
+                continue
+
+            script_jobs.append((s, job))
+            records[(s, job)] = record
+
+    print(f"Skipping {num_skipped} shapes that are unchanged since the last run.")
+
+    # Variants of the same DB1s shape are created together from a single parse of the source.
+    job_groups = group_jobs_by_source(script_jobs)
+
+    print(f"Creating {len(script_jobs)} shapes in {len(job_groups)} groups using {args.jobs} worker processes...")
+    failures = run_jobs_parallel(job_groups, num_workers=args.jobs)
+
+    failed_jobs = set((script_path, job) for script_path, job, _ in failures)
+
+    with build_manifest:
+        for script_job, record in records.items():
+            if script_job not in failed_jobs:
+                build_manifest.update(record)
+
+    pipeline.print_stage_report()
+
+    for script_path, job, error in failures:
+        print(f"\nFailed to create {job.new_shape_path.name} with ./{script_path}:\n{error}")
+
+    print(f"\nCreated {len(script_jobs) - len(failures)} of {len(script_jobs)} shapes, {len(failures)} failed.")
+    sys.exit(1 if failures else 0)